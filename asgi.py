@@ -0,0 +1,20 @@
+"""
+ASGI config for demo project.
+
+It exposes the ASGI callable as a module-level variable named ``application``. The
+chart endpoints in silverstrike.api are async views and do not occupy a worker thread
+while their queries run. Serve it with any ASGI server, for example::
+
+    uvicorn asgi:application
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+
+application = get_asgi_application()
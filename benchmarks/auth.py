@@ -0,0 +1,85 @@
+"""
+Measures the authentication overhead per REST request with and without the cached
+authentication classes.
+
+Every measurement authenticates the same Authorization header repeatedly. The cached
+classes are measured after a first request that did the full check, like a client
+reusing its credentials within the cache timeout. The benchmark runs against a freshly
+created test database:
+
+    python -m benchmarks.auth --requests 20
+"""
+import argparse
+import base64
+import os
+import time
+
+
+def _per_request(authentication, request, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        authentication.authenticate(request)
+    return (time.perf_counter() - start) / count
+
+
+def benchmark(requests, password='benchmark'):
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+
+    from rest_framework import authentication
+    from rest_framework.authtoken.models import Token
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from silverstrike.rest import authentication as cached
+
+    user = User.objects.create_user(username='benchmark', password=password)
+    token = Token.objects.create(user=user)
+    basic = 'Basic ' + base64.b64encode('benchmark:{}'.format(password).encode()).decode()
+    cases = [
+        ('basic', basic, authentication.BasicAuthentication,
+         cached.CachedBasicAuthentication),
+        ('token', 'Token ' + token.key, authentication.TokenAuthentication,
+         cached.CachedTokenAuthentication),
+    ]
+    results = []
+    for name, header, uncached_class, cached_class in cases:
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=header))
+        cache.clear()
+        uncached = _per_request(uncached_class(), request, requests)
+        cached_authentication = cached_class()
+        cached_authentication.authenticate(request)
+        hits = _per_request(cached_authentication, request, requests)
+        results.append({
+            'scheme': name,
+            'uncached_us': round(uncached * 1e6, 1),
+            'cached_us': round(hits * 1e6, 1),
+            'speedup': round(uncached / hits, 1),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure REST authentication overhead')
+    parser.add_argument('--requests', type=int, default=20)
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    import django
+    django.setup()
+    from django.db import transaction
+    from django.test.utils import setup_databases, teardown_databases
+
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        with transaction.atomic():
+            for result in benchmark(options.requests):
+                print('{scheme:<6} {uncached_us:>10.1f}us {cached_us:>8.1f}us '
+                      '{speedup:>8.1f}x'.format(**result))
+            transaction.set_rollback(True)
+    finally:
+        teardown_databases(databases, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Load test of the chart endpoints served through WSGI and through ASGI.
+
+The WSGI handler is driven by a fixed pool of --threads threads like a uwsgi worker,
+so at most that many requests are in flight. The ASGI handler is driven by concurrent
+tasks in one event loop, every request runs its queries in a thread of its own. Both
+serve the same mix of chart requests in one process; every query is delayed by
+--latency milliseconds to model a database server reached over the network or a
+slow aggregate. ASGI only gets ahead once requests spend most of their time waiting for
+the database and there are more clients than threads, the Python work of a request
+costs the same either way. The benchmark runs against a freshly created test database:
+
+    python -m benchmarks.charts --transactions 10000 --concurrency 16 64 128
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DSTART = '2019-01-01'
+DEND = '2019-12-31'
+
+PATHS = [
+    '/api/accounts/all/',
+    '/api/balance/{}/{}/'.format(DSTART, DEND),
+    '/api/non_dashboard_balance/{}/{}/'.format(DSTART, DEND),
+    '/api/accounts_balance/{}/{}/'.format(DSTART, DEND),
+    '/api/category_spending/{}/{}/'.format(DSTART, DEND),
+]
+
+
+def _delay_queries(latency):
+    """
+    Returns a connection_created receiver that delays every query of the new connection.
+    """
+    def execute(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def connection_created(sender, connection, **kwargs):
+        connection.execute_wrappers.append(execute)
+
+    return connection_created
+
+
+def _session_cookie():
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    client = Client()
+    client.force_login(User.objects.get_or_create(username='benchmark')[0])
+    return '{}={}'.format(settings.SESSION_COOKIE_NAME,
+                          client.cookies[settings.SESSION_COOKIE_NAME].value)
+
+
+def _wsgi(paths, cookie, threads):
+    """
+    Returns the status codes of the paths requested through the WSGI handler.
+    """
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test import RequestFactory
+
+    handler = WSGIHandler()
+    factory = RequestFactory()
+
+    def request(path):
+        status = []
+        environ = factory._base_environ(PATH_INFO=path, REQUEST_METHOD='GET', HTTP_COOKIE=cookie)
+        response = handler(environ, lambda s, headers: status.append(int(s.split()[0])))
+        b''.join(response)
+        response.close()
+        return status[0]
+
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(request, paths))
+
+
+def _asgi(paths, cookie, concurrency):
+    """
+    Returns the status codes of the paths requested through the ASGI handler with at most
+    concurrency requests in flight.
+    """
+    from django.core.handlers.asgi import ASGIHandler
+
+    handler = ASGIHandler()
+
+    async def request(path, semaphore):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'root_path': '', 'query_string': b'', 'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        }
+        disconnect = asyncio.Event()
+        body = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        status = []
+
+        async def receive():
+            if body:
+                return body.pop()
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with semaphore:
+            await handler(scope, receive, send)
+        disconnect.set()
+        return status[0]
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(request(path, semaphore) for path in paths))
+
+    return asyncio.run(run())
+
+
+def _throughput(function, *args):
+    start = time.perf_counter()
+    status = function(*args)
+    seconds = time.perf_counter() - start
+    return len(status) / seconds, sum(1 for code in status if code != 200)
+
+
+def benchmark(count, concurrency, requests=200, threads=16, latency=0.05):
+    from django.db.backends.signals import connection_created
+
+    from silverstrike import models
+
+    from benchmarks.ledger import generate_ledger
+
+    generate_ledger(count)
+    models.Account.objects.filter(name='Checking').update(show_on_dashboard=True)
+    cookie = _session_cookie()
+    paths = [PATHS[i % len(PATHS)] for i in range(requests)]
+    receiver = _delay_queries(latency)
+    # connections opened by the threads of the handlers are delayed
+    connection_created.connect(receiver)
+    try:
+        results = []
+        for level in concurrency:
+            wsgi, wsgi_errors = _throughput(_wsgi, paths, cookie, min(level, threads))
+            asgi, asgi_errors = _throughput(_asgi, paths, cookie, level)
+            results.append({
+                'concurrency': level,
+                'requests': requests,
+                'wsgi_requests_per_second': round(wsgi, 1),
+                'asgi_requests_per_second': round(asgi, 1),
+                'speedup': round(asgi / wsgi, 1),
+                'errors': wsgi_errors + asgi_errors,
+            })
+        return results
+    finally:
+        connection_created.disconnect(receiver)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the chart endpoints')
+    parser.add_argument('--transactions', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 128])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=16,
+                        help='threads serving WSGI requests, uwsgi workers x threads')
+    parser.add_argument('--latency', type=float, default=50,
+                        help='milliseconds every query is delayed')
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    import django
+    django.setup()
+    from django.test.utils import (setup_databases, setup_test_environment,
+                                   teardown_databases, teardown_test_environment)
+
+    setup_test_environment(debug=False)
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        # the handlers run in other threads and only see committed rows
+        for result in benchmark(options.transactions, options.concurrency, options.requests,
+                                options.threads, options.latency / 1000):
+            print('{concurrency:>6} {wsgi_requests_per_second:>9.1f}/s '
+                  '{asgi_requests_per_second:>9.1f}/s {speedup:>6.1f}x '
+                  '{errors} errors'.format(**result))
+    finally:
+        teardown_databases(databases, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Measures how long the forecast takes to expand recurrences into daily balances.
+
+The recurrences are a fixed random mix of intervals, multipliers and weekend handling
+between a few personal accounts and a foreign one. Only the expansion is measured, it
+runs without a database:
+
+    python -m benchmarks.forecast --recurrences 200 --months 24
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+from decimal import Decimal
+
+
+def generate_recurrences(count, accounts, seed=0):
+    from silverstrike.models import RecurringTransaction
+
+    rng = random.Random(seed)
+    intervals = [RecurringTransaction.MONTHLY] * 6 + [
+        RecurringTransaction.WEEKLY, RecurringTransaction.DAILY, RecurringTransaction.QUARTERLY,
+        RecurringTransaction.BIANNUALLY, RecurringTransaction.ANNUALLY]
+    foreign = max(accounts) + 1
+    recurrences = []
+    for _ in range(count):
+        src, dst = rng.choice([(rng.choice(accounts), foreign), (foreign, rng.choice(accounts)),
+                               tuple(rng.sample(accounts, 2))])
+        recurrences.append(RecurringTransaction(
+            src_id=src, dst_id=dst, amount=Decimal(rng.randrange(100, 100000)) / 100,
+            date=datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(-60, 60)),
+            interval=rng.choice(intervals), multiplier=rng.choice([1, 1, 1, 2, 3]),
+            usual_month_day=rng.choice([0, 1, 15, 28, 31]),
+            weekend_handling=rng.choice([w for w, name in RecurringTransaction.WEEKEND_SKIPPING])))
+    return recurrences
+
+
+def benchmark(count, months, accounts=5, repeat=5):
+    from dateutil.relativedelta import relativedelta
+
+    from silverstrike.forecast import project
+
+    account_ids = list(range(1, accounts + 1))
+    recurrences = generate_recurrences(count, account_ids)
+    dstart = datetime.date(2024, 1, 15)
+    dend = dstart + relativedelta(months=months)
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        project(dstart, dend, {account_id: 0 for account_id in account_ids}, [], recurrences)
+        seconds.append(time.perf_counter() - start)
+    return {
+        'recurrences': count,
+        'months': months,
+        'days': (dend - dstart).days + 1,
+        'milliseconds': round(min(seconds) * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the forecast expansion')
+    parser.add_argument('--recurrences', type=int, nargs='+', default=[200])
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--accounts', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    import django
+    django.setup()
+
+    for count in options.recurrences:
+        result = benchmark(count, options.months, options.accounts, options.repeat)
+        print('{recurrences:>6} recurrences {months:>3} months '
+              '{milliseconds:>8.2f}ms'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""
+Measures importer throughput on synthetic bank statements.
+
+Every importer runs through three stages: parsing the file, building the
+import preview (ImportProcessView.get_context_data) and committing all rows
+with an import job. The Firefly importer parses and commits in one go, so
+only its commit stage is measured. Each stage records the rows per second of
+an untraced run and the peak memory of a second run under tracemalloc.
+Commits are rolled back, so every run starts with the same database.
+
+The benchmark runs against a freshly created test database:
+
+    python -m benchmarks.importers --rows 10000 100000 1000000 --output results.json
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+
+
+STAGES = ['parse', 'preview', 'commit']
+
+PAYEES = [('Payee {}'.format(i), 'DE{:020d}'.format(i)) for i in range(200)]
+CATEGORIES = ['Groceries', 'Rent', 'Insurance', 'Leisure', 'Travel', 'Income', '']
+
+# the statement field an importer stores the name of the other party in
+PAYEE_FIELD = {
+    'dkb': 'account',
+    'dkb_visa': 'notes',
+    'pc_mastercard': 'notes',
+    'volksbank': 'account',
+    'ofx': 'account',
+}
+
+
+def generate_rows(count, seed=0):
+    """
+    Returns (date, payee, iban, amount) tuples spread over the three years before 2020.
+    """
+    rng = random.Random(seed)
+    start = datetime.date(2017, 1, 1)
+    rows = []
+    for _ in range(count):
+        payee, iban = rng.choice(PAYEES)
+        amount = Decimal(rng.randrange(-250000, 100000)) / 100 or Decimal('0.01')
+        rows.append((start + datetime.timedelta(days=rng.randrange(3 * 365)), payee, iban, amount))
+    rows.sort()
+    return rows
+
+
+def _german(amount):
+    return '{:,.2f}'.format(amount).translate(str.maketrans(',.', '.,'))
+
+
+def write_dkb(path, rows):
+    with open(path, 'w', encoding='latin-1', newline='') as f:
+        writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_ALL)
+        writer.writerow(['Kontonummer:', 'DE12345678901234567890 / Girokonto'])
+        writer.writerow([])
+        writer.writerow(['Buchungstag', 'Wertstellung', 'Buchungstext',
+                         'Auftraggeber / Begünstigter', 'Verwendungszweck', 'Kontonummer',
+                         'BLZ', 'Betrag (EUR)', 'Gläubiger-ID', 'Mandatsreferenz',
+                         'Kundenreferenz'])
+        for day, payee, iban, amount in rows:
+            date = day.strftime('%d.%m.%Y')
+            writer.writerow([date, date, 'Lastschrift', payee, 'Invoice {}'.format(day),
+                             iban, 'BYLADEM1001', _german(amount), '', '', ''])
+
+
+def write_dkb_visa(path, rows):
+    with open(path, 'w', encoding='latin-1', newline='') as f:
+        writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_ALL)
+        writer.writerow(['Kreditkarte:', '1234********5678'])
+        writer.writerow([])
+        writer.writerow(['Umsatz abgerechnet und nicht im Saldo enthalten', 'Wertstellung',
+                         'Belegdatum', 'Beschreibung', 'Betrag (EUR)', 'Ursprünglicher Betrag'])
+        for day, payee, iban, amount in rows:
+            date = day.strftime('%d.%m.%Y')
+            writer.writerow(['Ja', date, date, payee, _german(amount), ''])
+
+
+def write_volksbank(path, rows):
+    with open(path, 'w', encoding='latin-1', newline='') as f:
+        writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_ALL)
+        first = rows[0][0].strftime('%d.%m.%Y') if rows else '01.01.2017'
+        last = rows[-1][0].strftime('%d.%m.%Y') if rows else '01.01.2017'
+        writer.writerow(['Buchungstag', 'Valuta', 'Auftraggeber/Zahlungsempfänger',
+                         'Empfänger/Zahlungspflichtiger', 'Konto-Nr.', 'IBAN', 'BLZ', 'BIC',
+                         'Vorgang/Verwendungszweck', 'Kundenreferenz', 'Währung', 'Umsatz', ' '])
+        # the importer drops the first and the last two parsed lines
+        writer.writerow([first, first, 'Umsatzanzeige', '', '', '', '', '', '', '', 'EUR',
+                         '0,00', 'H'])
+        for day, payee, iban, amount in rows:
+            date = day.strftime('%d.%m.%Y')
+            writer.writerow([date, date, 'Max Mustermann', payee, '', iban, '', 'GENODEF1',
+                             'Invoice {}'.format(day), '', 'EUR', _german(abs(amount)),
+                             'S' if amount < 0 else 'H'])
+        writer.writerow([first, first, '', '', '', '', '', '', 'Anfangssaldo', '', 'EUR', '0,00', 'H'])
+        writer.writerow([last, last, '', '', '', '', '', '', 'Endsaldo', '', 'EUR', '0,00', 'H'])
+
+
+def write_pc_mastercard(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(['Merchant Name', 'Card Used For Transaction', 'Date', 'Time', 'Amount'])
+        for day, payee, iban, amount in rows:
+            writer.writerow([payee, '**** ****', day.strftime('%m/%d/%Y'), '06:46 PM', -amount])
+
+
+def write_ofx(path, rows):
+    with open(path, 'w', encoding='cp1252') as f:
+        f.write('OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:USASCII\n'
+                'CHARSET:1252\nCOMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n'
+                '<OFX><BANKMSGSRSV1><STMTTRNRS><TRNUID>1<STMTRS><CURDEF>EUR'
+                '<BANKTRANLIST><DTSTART>20170101<DTEND>20200101\n')
+        for i, (day, payee, iban, amount) in enumerate(rows):
+            f.write('<STMTTRN><TRNTYPE>{}<DTPOSTED>{}120000.000[-5:EST]<TRNAMT>{}'
+                    '<FITID>{}<NAME>{}<MEMO>Invoice {}</STMTTRN>\n'.format(
+                        'DEBIT' if amount < 0 else 'CREDIT', day.strftime('%Y%m%d'), amount,
+                        i, payee, day))
+        f.write('</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+
+
+FIREFLY_COLUMNS = [
+    'journal_id', 'transaction_id', 'date', 'description', 'currency_code', 'amount',
+    'foreign_currency_code', 'foreign_amount', 'transaction_type', 'asset_account_id',
+    'asset_account_name', 'asset_account_iban', 'asset_account_bic', 'asset_account_number',
+    'asset_currency_code', 'opposing_account_id', 'opposing_account_name',
+    'opposing_account_iban', 'opposing_account_bic', 'opposing_account_number',
+    'opposing_currency_code', 'budget_id', 'budget_name', 'category_id', 'category_name',
+    'bill_id', 'bill_name', 'notes', 'tags',
+]
+
+
+def write_firefly(path, rows):
+    rng = random.Random(len(rows))
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, FIREFLY_COLUMNS, restval='')
+        writer.writeheader()
+        for i, (day, payee, iban, amount) in enumerate(rows):
+            writer.writerow({
+                'journal_id': i,
+                'transaction_id': i,
+                'date': day.strftime('%Y%m%d'),
+                'description': 'Invoice {}'.format(day),
+                'currency_code': 'EUR',
+                'amount': amount,
+                'transaction_type': 'Withdrawal' if amount < 0 else 'Deposit',
+                'asset_account_name': 'Checking Account',
+                'opposing_account_name': payee,
+                'opposing_account_iban': iban,
+                'category_name': rng.choice(CATEGORIES),
+            })
+
+
+WRITERS = {
+    'dkb': write_dkb,
+    'dkb_visa': write_dkb_visa,
+    'pc_mastercard': write_pc_mastercard,
+    'volksbank': write_volksbank,
+    'ofx': write_ofx,
+    'firefly': write_firefly,
+}
+
+
+def _measure(function):
+    """
+    Runs function twice, once for the timing and once under tracemalloc for the peak memory.
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _commit(**kwargs):
+    """
+    Returns a function that runs an import job and rolls back everything it wrote.
+    """
+    from django.db import transaction
+
+    from silverstrike import jobs, models
+
+    def run():
+        with transaction.atomic():
+            job = jobs.run_job(models.ImportJob.objects.create(**kwargs))
+            transaction.set_rollback(True)
+        if job.status != models.ImportJob.DONE:
+            raise RuntimeError(job.error)
+        return job
+    return run
+
+
+def benchmark(name, rows, directory, stages=STAGES):
+    """
+    Runs the stages for one importer and file size and returns a list of result dictionaries.
+    """
+    from django.test import RequestFactory
+
+    from silverstrike import importers, models
+    from silverstrike.views.imports import ImportProcessView
+
+    path = os.path.join(directory, '{}-{}.csv'.format(name, rows))
+    WRITERS[name](path, generate_rows(rows))
+    account, _ = models.Account.objects.get_or_create(name='Benchmark')
+    results = []
+
+    def record(stage, count, seconds, peak):
+        results.append({
+            'importer': name,
+            'rows': rows,
+            'stage': stage,
+            'parsed_rows': count,
+            'seconds': round(seconds, 4),
+            'rows_per_second': round(count / seconds) if seconds else None,
+            'peak_memory': peak,
+        })
+
+    if name == 'firefly':
+        import_file = models.ImportFile.objects.create(file=os.path.basename(path))
+        if 'commit' in stages:
+            job, seconds, peak = _measure(
+                _commit(file=import_file, kind=models.ImportJob.FIREFLY))
+            record('commit', job.rows_parsed, seconds, peak)
+        return results
+
+    import_file = models.ImportFile.objects.create(
+        file=os.path.basename(path), account=account, importer=name)
+
+    data, seconds, peak = _measure(lambda: importers.get(name).import_transactions(path))
+    if 'parse' in stages:
+        record('parse', len(data), seconds, peak)
+
+    if 'preview' in stages:
+        view = ImportProcessView()
+        view.request = RequestFactory().get('/')
+        view.kwargs = {'uuid': import_file.pk}
+        context, seconds, peak = _measure(view.get_context_data)
+        record('preview', len(context['data']), seconds, peak)
+
+    if 'commit' in stages:
+        selection = []
+        for i, datum in enumerate(data):
+            selection.append({'file': str(import_file.pk), 'row': i,
+                              'title': datum.notes[:64] or 'Benchmark',
+                              'account': getattr(datum, PAYEE_FIELD[name]) or 'Unknown',
+                              'recurrence': -1})
+        job, seconds, peak = _measure(_commit(
+            file=import_file, kind=models.ImportJob.STATEMENTS, data=json.dumps(selection)))
+        record('commit', job.rows_parsed, seconds, peak)
+    return results
+
+
+def run(names, sizes, stages=STAGES):
+    from django.test.utils import override_settings
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory, override_settings(MEDIA_ROOT=directory):
+        for name in names:
+            for rows in sizes:
+                results.extend(benchmark(name, rows, directory, stages))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure importer throughput')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000],
+                        help='Number of rows of the generated statements')
+    parser.add_argument('--importers', nargs='+', choices=list(WRITERS), default=list(WRITERS))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--output', default='importer-benchmark.json',
+                        help='JSON file the results are written to')
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_databases, teardown_databases
+
+    import silverstrike
+
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        results = run(options.importers, options.rows, options.stages)
+    finally:
+        teardown_databases(databases, verbosity=0)
+
+    for result in results:
+        print('{importer:<14} {rows:>8} {stage:<8} {seconds:>9.3f}s {rows_per_second:>9} rows/s '
+              '{peak_memory:>12} bytes'.format(**result))
+    with open(options.output, 'w') as f:
+        json.dump({
+            'version': silverstrike.__version__,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'results': results,
+        }, f, indent=2)
+    print('Results written to {}'.format(options.output), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
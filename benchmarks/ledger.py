@@ -0,0 +1,122 @@
+"""
+Compares dumpledger/loadledger with Django's dumpdata/loaddata on a generated ledger.
+
+The benchmark runs against a freshly created test database:
+
+    python -m benchmarks.ledger --transactions 10000 100000
+"""
+import argparse
+import datetime
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+
+
+def generate_ledger(count, seed=0):
+    from silverstrike import models
+
+    rng = random.Random(seed)
+    checking = models.Account.objects.create(name='Checking')
+    foreign = [models.Account(name='Payee {}'.format(i), account_type=models.AccountType.FOREIGN)
+               for i in range(200)]
+    foreign = models.Account.objects.bulk_create(foreign)
+    categories = models.Category.objects.bulk_create(
+        [models.Category(name='Category {}'.format(i)) for i in range(20)])
+    start = datetime.date(2010, 1, 1)
+    for offset in range(0, count, 5000):
+        transactions = []
+        for _ in range(min(5000, count - offset)):
+            transactions.append(models.Transaction(
+                title='Transaction', date=start + datetime.timedelta(days=rng.randrange(3650)),
+                transaction_type=models.Transaction.WITHDRAW, src=checking,
+                dst=rng.choice(foreign), amount=Decimal(rng.randrange(1, 100000)) / 100))
+        transactions = models.Transaction.objects.bulk_create(transactions)
+        splits = []
+        for t in transactions:
+            category = rng.choice(categories)
+            splits.append(models.Split(title=t.title, account=checking, opposing_account=t.dst,
+                                       amount=-t.amount, date=t.date, transaction=t,
+                                       category=category))
+            splits.append(models.Split(title=t.title, account=t.dst, opposing_account=checking,
+                                       amount=t.amount, date=t.date, transaction=t,
+                                       category=category))
+        models.Split.objects.bulk_create(splits)
+
+
+def _clear(system_account=True):
+    """
+    Empties the ledger, leaving the system account a new database starts with.
+    """
+    from silverstrike import ledger, models
+
+    for model in reversed(ledger.LEDGER_MODELS):
+        model.objects.all()._raw_delete(model.objects.db)
+    if system_account:
+        models.Account.objects.create(name='System Account',
+                                      account_type=models.AccountType.SYSTEM)
+
+
+def _measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        function()
+        return time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(count, directory):
+    from django.core.management import call_command
+
+    generate_ledger(count)
+    results = []
+    ledger_path = os.path.join(directory, 'ledger.jsonl')
+    fixture_path = os.path.join(directory, 'ledger.json')
+    labels = ['account', 'accountalias', 'category', 'recurringtransaction', 'budget',
+              'transaction', 'split']
+    fixture_labels = ['silverstrike.{}'.format(label) for label in labels]
+
+    results.append(('dumpledger',) + _measure(lambda: call_command(
+        'dumpledger', ledger_path, stdout=io.StringIO())))
+    results.append(('dumpdata',) + _measure(lambda: call_command(
+        'dumpdata', *fixture_labels, output=fixture_path, verbosity=0)))
+    _clear()
+    results.append(('loadledger',) + _measure(lambda: call_command(
+        'loadledger', ledger_path, stdout=io.StringIO())))
+    # the fixture contains the system account itself
+    _clear(system_account=False)
+    results.append(('loaddata',) + _measure(lambda: call_command(
+        'loaddata', fixture_path, verbosity=0)))
+    _clear()
+    return [{'transactions': count, 'command': command, 'seconds': round(seconds, 3),
+             'peak_memory': peak} for command, seconds, peak in results]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure ledger dump and restore')
+    parser.add_argument('--transactions', type=int, nargs='+', default=[10000])
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    import django
+    django.setup()
+    from django.test.utils import setup_databases, teardown_databases
+
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        for count in options.transactions:
+            with tempfile.TemporaryDirectory() as directory:
+                for result in benchmark(count, directory):
+                    print('{transactions:>8} {command:<10} {seconds:>9.3f}s '
+                          '{peak_memory:>12} bytes'.format(**result))
+    finally:
+        teardown_databases(databases, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Compares the per row cost of the shared importer parsing helpers against the
+expressions the importers used before.
+
+    python -m benchmarks.parsing
+"""
+import datetime
+import random
+import timeit
+
+from silverstrike.importers.parsing import parse_date, parse_german_amount
+
+ROWS = 100000
+
+
+def legacy_row(date, amount):
+    return (datetime.datetime.strptime(date, '%d.%m.%Y').date(),
+            float(amount.replace('.', '').replace(',', '.')))
+
+
+def current_row(date, amount):
+    return parse_date(date, '%d.%m.%Y'), parse_german_amount(amount)
+
+
+def generate_rows(count):
+    # a year worth of booking dates, like a large statement
+    start = datetime.date(2018, 1, 1)
+    rows = []
+    for _ in range(count):
+        day = start + datetime.timedelta(days=random.randrange(365))
+        cents = random.randrange(-500000, 500000)
+        amount = '{:,.2f}'.format(cents / 100).replace(',', ' ').replace('.', ',').replace(' ', '.')
+        rows.append((day.strftime('%d.%m.%Y'), amount))
+    return rows
+
+
+def run(rows):
+    results = {}
+    for name, function in (('legacy', legacy_row), ('current', current_row)):
+        seconds = min(timeit.repeat(lambda: [function(*row) for row in rows],
+                                    setup=parse_date.cache_clear, number=1, repeat=5))
+        results[name] = seconds / len(rows) * 1e9
+    return results
+
+
+if __name__ == '__main__':
+    results = run(generate_rows(ROWS))
+    for name, nanoseconds in results.items():
+        print('{:<8} {:>8.0f} ns/row'.format(name, nanoseconds))
+    print('speedup  {:>8.1f}x'.format(results['legacy'] / results['current']))
@@ -0,0 +1,80 @@
+"""
+Compares the per row cost of the REST serializers with the ValuesReader read path.
+
+Both paths include their queries: the serializers read model instances with the
+splits prefetched, the readers read .values() rows. Every measurement is the best of
+a few runs. The benchmark runs against a freshly created test database:
+
+    python -m benchmarks.rest --transactions 1000 10000
+"""
+import argparse
+import os
+import time
+
+
+def _best(function, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+
+def benchmark(count, repeat=3):
+    from silverstrike import models
+    from silverstrike.rest import serializers
+    from silverstrike.rest.readers import ValuesReader
+    from silverstrike.rest.views import TransactionViewSet
+
+    from benchmarks.ledger import generate_ledger
+
+    generate_ledger(count)
+    cases = [
+        ('transaction', serializers.TransactionSerializer, TransactionViewSet.queryset),
+        ('split', serializers.SplitSerializer, models.Split.objects.order_by('id')),
+        ('account', serializers.AccountSerializer, models.Account.objects.order_by('id')),
+    ]
+    results = []
+    for name, serializer_class, queryset in cases:
+        reader = ValuesReader(serializer_class)
+        columns = reader.columns(reader.names)
+        rows = queryset.count()
+        serializer = _best(lambda: serializer_class(queryset.all(), many=True).data, repeat)
+        values = _best(lambda: reader.read(queryset.values(*columns), reader.names), repeat)
+        results.append({
+            'serializer': name,
+            'rows': rows,
+            'serializer_us_per_row': round(serializer / rows * 1e6, 2),
+            'reader_us_per_row': round(values / rows * 1e6, 2),
+            'speedup': round(serializer / values, 1),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure REST serialization cost')
+    parser.add_argument('--transactions', type=int, nargs='+', default=[10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    import django
+    django.setup()
+    from django.db import transaction
+    from django.test.utils import setup_databases, teardown_databases
+
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        for count in options.transactions:
+            with transaction.atomic():
+                for result in benchmark(count, options.repeat):
+                    print('{rows:>8} {serializer:<12} {serializer_us_per_row:>9.2f}us '
+                          '{reader_us_per_row:>9.2f}us {speedup:>6.1f}x'.format(**result))
+                transaction.set_rollback(True)
+    finally:
+        teardown_databases(databases, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
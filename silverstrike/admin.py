@@ -1,5 +1,6 @@
 from django.contrib import admin, messages
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.translation import gettext as _
 
@@ -11,6 +12,15 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name']
 
 
+@admin.register(models.CategoryRule)
+class CategoryRuleAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'min_amount', 'max_amount', 'category', 'recurrence', 'priority',
+                    'active')
+    list_editable = ('priority', 'active')
+    list_filter = ('active', 'category')
+    search_fields = ['payee', 'iban', 'pattern']
+
+
 @admin.register(models.RecurringTransaction)
 class RecurringTransactionAdmin(admin.ModelAdmin):
     search_fields = ['title']
@@ -18,11 +28,17 @@ class RecurringTransactionAdmin(admin.ModelAdmin):
     list_filter = ('interval',)
 
 
+class AccountAliasInline(admin.TabularInline):
+    model = models.AccountAlias
+    extra = 0
+
+
 @admin.register(models.Account)
 class AccountAdmin(admin.ModelAdmin):
     list_display = ('name',)
     list_filter = ('account_type',)
     actions = ['merge_accounts']
+    inlines = [AccountAliasInline]
     search_fields = ['name']
 
     @admin.action(description=_('Merges all selected accounts into the last instance provided'))
@@ -42,17 +58,27 @@ class AccountAdmin(admin.ModelAdmin):
         if failure:
             return
         base = accounts.pop()
+        now = timezone.now()
         for account in accounts:
             # update transactions
-            models.Transaction.objects.filter(src_id=account.id).update(src_id=base.id)
-            models.Transaction.objects.filter(dst_id=account.id).update(dst_id=base.id)
+            models.Transaction.objects.filter(src_id=account.id).update(
+                src_id=base.id, last_modified=now)
+            models.Transaction.objects.filter(dst_id=account.id).update(
+                dst_id=base.id, last_modified=now)
             # update splits
-            models.Split.objects.filter(account_id=account.id).update(account_id=base.id)
+            models.Split.objects.filter(account_id=account.id).update(
+                account_id=base.id, last_modified=now)
             models.Split.objects.filter(opposing_account_id=account.id).update(
-                opposing_account_id=base.id)
+                opposing_account_id=base.id, last_modified=now)
             # update recurrences
-            models.RecurringTransaction.objects.filter(src_id=account.id).update(src_id=base.id)
-            models.RecurringTransaction.objects.filter(dst_id=account.id).update(dst_id=base.id)
+            models.RecurringTransaction.objects.filter(src_id=account.id).update(
+                src_id=base.id, last_modified=now)
+            models.RecurringTransaction.objects.filter(dst_id=account.id).update(
+                dst_id=base.id, last_modified=now)
+            # keep the import aliases
+            models.AccountAlias.objects.bulk_create(
+                [models.AccountAlias(kind=alias.kind, value=alias.value, account_id=base.id)
+                 for alias in account.aliases.all()], ignore_conflicts=True)
             account.delete()
         if len(accounts) == 1:
             self.message_user(request, format_html(
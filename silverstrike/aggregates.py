@@ -0,0 +1,78 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, Count, F, Max, Min, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from silverstrike import models
+
+
+# expressions the splits can be grouped by, None for columns of the split itself
+GROUPS = {
+    'month': TruncMonth('date'),
+    'week': TruncWeek('date'),
+    'category': None,
+    'account': None,
+    'opposing_account': None,
+    'transaction_type': F('transaction__transaction_type'),
+}
+
+METRICS = {
+    'sum': lambda: Sum('amount'),
+    'count': lambda: Count('id'),
+    'avg': lambda: Avg('amount'),
+    'min': lambda: Min('amount'),
+    'max': lambda: Max('amount'),
+}
+
+# seconds an aggregate stays cached, changes to the data invalidate it earlier
+CACHE_TIMEOUT = 3600
+
+# tables and columns that tell when anything an aggregate depends on last changed
+VERSION_COLUMNS = [
+    (models.Split, 'last_modified'),
+    (models.Transaction, 'last_modified'),
+    (models.Account, 'last_modified'),
+    (models.Deletion, 'deleted_at'),
+]
+
+
+def data_version(columns=VERSION_COLUMNS):
+    """
+    Returns the latest change to splits, transactions and accounts, or the models of the
+    given (model, column) pairs, read from their indexed timestamps with a single query.
+    """
+    quote = connection.ops.quote_name
+    sql = 'SELECT {}'.format(', '.join(
+        '(SELECT MAX({}) FROM {})'.format(quote(column), quote(model._meta.db_table))
+        for model, column in columns))
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchone()
+
+
+def aggregate(splits, group_by, metric):
+    """
+    Returns one dictionary per group of splits with the values of the group_by keys and
+    the metric of the amounts as 'value', computed with a single GROUP BY query.
+    """
+    if not group_by:
+        return [splits.aggregate(value=METRICS[metric]())]
+    annotations = {name: GROUPS[name] for name in group_by if GROUPS[name] is not None}
+    return list(splits.annotate(**annotations).values(*group_by)
+                .annotate(value=METRICS[metric]()).order_by(*group_by))
+
+
+def cached_aggregate(splits, group_by, metric, key):
+    """
+    Like aggregate, but reuses the result for the same key as long as the data is unchanged.
+    key has to identify the filters applied to splits.
+    """
+    digest = hashlib.sha1(repr((key, group_by, metric, data_version())).encode('utf-8'))
+    cache_key = 'silverstrike.aggregate.{}'.format(digest.hexdigest())
+    result = cache.get(cache_key)
+    if result is None:
+        result = aggregate(splits, group_by, metric)
+        cache.set(cache_key, result, CACHE_TIMEOUT)
+    return result
@@ -3,32 +3,35 @@ import datetime
 from django.contrib.auth.decorators import login_required
 from django.db import models
 from django.http import HttpResponseBadRequest, JsonResponse
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.utils.translation import gettext as _
 
-from .models import Account, AccountType, Split
+from . import forecast
+from .charts import ChartRange, balance_data
+from .models import Account, AccountType, ImportJob, Split
 
 
 @login_required
-def get_accounts(request, account_type):
+async def get_accounts(request, account_type):
     accounts = Account.objects.exclude(account_type=AccountType.SYSTEM)
     if account_type != 'all':
         account_type = getattr(AccountType, account_type)
         accounts = accounts.filter(account_type=account_type)
 
-    return JsonResponse(list(accounts.values_list('name', flat=True)), safe=False)
+    return JsonResponse([name async for name in accounts.values_list('name', flat=True)],
+                        safe=False)
 
 
 @login_required
-def get_accounts_balance(request, dstart, dend):
+async def get_accounts_balance(request, dstart, dend):
     try:
         dstart = datetime.datetime.strptime(dstart, '%Y-%m-%d').date()
         dend = datetime.datetime.strptime(dend, '%Y-%m-%d').date()
     except ValueError:
         return HttpResponseBadRequest(_('Invalid date format, expected yyyy-mm-dd'))
     dataset = []
-    for account in Account.objects.personal().active():
-        data = list(zip(*account.get_data_points(dstart, dend)))
+    async for account in Account.objects.personal().active():
+        data = list(zip(*await account.aget_data_points(dstart, dend)))
         dataset.append({'name': account.name, 'data': data[1]})
     if dataset:
         labels = [datetime.datetime.strftime(x, '%d %b %Y') for x in data[0]]
@@ -38,28 +41,28 @@ def get_accounts_balance(request, dstart, dend):
 
 
 @login_required
-def get_account_balance(request, account_id, dstart, dend):
-    account = get_object_or_404(Account, pk=account_id)
+async def get_account_balance(request, account_id, dstart, dend):
+    account = await aget_object_or_404(Account, pk=account_id)
     try:
         dstart = datetime.datetime.strptime(dstart, '%Y-%m-%d').date()
         dend = datetime.datetime.strptime(dend, '%Y-%m-%d').date()
     except ValueError:
         return HttpResponseBadRequest(_('Invalid date format, expected yyyy-mm-dd'))
-    labels, data = zip(*account.get_data_points(dstart, dend))
+    labels, data = zip(*await account.aget_data_points(dstart, dend))
     return JsonResponse({'data': data, 'labels': labels})
 
 
 @login_required
-def get_balances(request, dstart, dend, include_non_dashboard_accounts=False):
-    return _get_balances(request, dstart, dend, False)
+async def get_balances(request, dstart, dend, include_non_dashboard_accounts=False):
+    return await _get_balances(request, dstart, dend, False)
 
 
 @login_required
-def get_non_dashboard_balances(request, dstart, dend, include_non_dashboard_accounts=False):
-    return _get_balances(request, dstart, dend, True)
+async def get_non_dashboard_balances(request, dstart, dend, include_non_dashboard_accounts=False):
+    return await _get_balances(request, dstart, dend, True)
 
 
-def _get_balances(request, dstart, dend, include_non_dashboard_accounts=False):
+async def _get_balances(request, dstart, dend, include_non_dashboard_accounts=False):
     try:
         dstart = datetime.datetime.strptime(dstart, '%Y-%m-%d').date()
         dend = datetime.datetime.strptime(dend, '%Y-%m-%d').date()
@@ -69,39 +72,91 @@ def _get_balances(request, dstart, dend, include_non_dashboard_accounts=False):
         account_objects = Split.objects.personal()
     else:
         account_objects = Split.objects.personal_dashboard()
-    balance = account_objects.exclude_transfers().filter(date__lt=dstart).aggregate(
-        models.Sum('amount'))['amount__sum'] or 0
-    splits = account_objects.exclude_transfers().date_range(dstart, dend).order_by('date')
-    data_points = []
-    labels = []
-    days = (dend - dstart).days
-    if days > 50:
-        step = days / 50 + 1
-    else:
-        step = 1
-    for split in splits:
-        while split.date > dstart:
-            data_points.append(balance)
-            labels.append(datetime.datetime.strftime(dstart, '%Y-%m-%d'))
-            dstart += datetime.timedelta(days=step)
-        balance += split.amount
-    data_points.append(balance)
-    labels.append(datetime.datetime.strftime(dend, '%Y-%m-%d'))
-    return JsonResponse({'labels': labels, 'data': data_points})
+    balance = (await account_objects.exclude_transfers().filter(date__lt=dstart).aaggregate(
+        models.Sum('amount')))['amount__sum'] or 0
+    splits = account_objects.exclude_transfers().date_range(dstart, dend).order_by(
+        'date').values_list('date', 'amount')
+    return JsonResponse(balance_data(balance, [s async for s in splits], dstart, dend))
 
 
 @login_required
-def category_spending(request, dstart, dend):
+async def category_spending(request, dstart, dend):
     try:
         dstart = datetime.datetime.strptime(dstart, '%Y-%m-%d')
         dend = datetime.datetime.strptime(dend, '%Y-%m-%d')
     except ValueError:
         return HttpResponseBadRequest(_('Invalid date format, expected yyyy-mm-dd'))
-    res = Split.objects.expense().past().date_range(dstart, dend).order_by('category').values(
-        'category__name').annotate(spent=models.Sum('amount'))
+    res = [e async for e in Split.objects.expense().past().date_range(dstart, dend).order_by(
+        'category').values('category__name').annotate(spent=models.Sum('amount'))]
     if res:
         res = [(e['category__name'] or 'No category', abs(e['spent'])) for e in res if e['spent']]
         categories, spent = zip(*res)
     else:
         categories, spent = [], []
     return JsonResponse({'categories': categories, 'spent': spent})
+
+
+CHART_DATASETS = {
+    'accounts_balance': lambda chart: chart.accounts_balance(),
+    'balance': lambda chart: chart.balance(),
+    'non_dashboard_balance': lambda chart: chart.balance(include_non_dashboard_accounts=True),
+    'category_spending': lambda chart: chart.category_spending(),
+}
+
+
+@login_required
+def get_charts(request):
+    """
+    Returns several chart datasets with one request. Each ?dataset=name,yyyy-mm-dd,yyyy-mm-dd
+    yields the response of the chart endpoint of that name for the range, in the order
+    requested. Datasets of the same range share their queries.
+    """
+    specs = request.GET.getlist('dataset')
+    if not specs:
+        return HttpResponseBadRequest(_('No dataset requested'))
+    charts = {}
+    results = []
+    for spec in specs:
+        try:
+            name, dstart, dend = spec.split(',')
+        except ValueError:
+            return HttpResponseBadRequest(_('Invalid dataset, expected name,start,end'))
+        if name not in CHART_DATASETS:
+            return HttpResponseBadRequest(_('Unknown dataset %(name)s') % {'name': name})
+        try:
+            dstart = datetime.datetime.strptime(dstart, '%Y-%m-%d').date()
+            dend = datetime.datetime.strptime(dend, '%Y-%m-%d').date()
+        except ValueError:
+            return HttpResponseBadRequest(_('Invalid date format, expected yyyy-mm-dd'))
+        if (dstart, dend) not in charts:
+            charts[dstart, dend] = ChartRange(dstart, dend)
+        results.append(CHART_DATASETS[name](charts[dstart, dend]))
+    return JsonResponse({'results': results})
+
+
+@login_required
+def get_forecast(request, months):
+    """
+    Returns the projected daily balances of the personal accounts for the next months.
+    """
+    if not 1 <= months <= forecast.MAX_MONTHS:
+        return HttpResponseBadRequest(
+            _('Forecasts reach 1 to %(months)s months ahead') % {'months': forecast.MAX_MONTHS})
+    result = forecast.cached_forecast(months)
+    return JsonResponse({
+        'labels': [datetime.datetime.strftime(x, '%Y-%m-%d') for x in result['dates']],
+        'dataset': [{'name': name, 'data': data} for name, data in result['accounts']],
+    })
+
+
+@login_required
+def get_import_progress(request, uuid):
+    job = get_object_or_404(ImportJob, pk=uuid)
+    return JsonResponse({
+        'status': job.get_status_display(),
+        'finished': job.is_finished,
+        'rows_parsed': job.rows_parsed,
+        'rows_committed': job.rows_committed,
+        'rows_skipped': job.rows_skipped,
+        'error': job.error,
+    })
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SilverStrikeConfig(AppConfig):
     name = 'silverstrike'
     default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from silverstrike import signals  # noqa: F401
@@ -0,0 +1,121 @@
+"""
+Chart datasets computed from one scan of the splits of personal accounts.
+
+The datasets match the responses of api_accounts_balance, api_balance,
+api_non_dashboard_balance and category_spending. All datasets of a ChartRange share
+three queries: the personal accounts, their balances before the range and the splits
+within it.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import models
+from django.utils.functional import cached_property
+
+from .models import Account, AccountType, Split
+from .models.account import _data_points
+
+
+def balance_data(balance, splits, dstart, dend):
+    """
+    Returns the labels and balances of the balance charts, starting with balance and adding
+    the (date, amount) pairs of splits, sorted by date, at up to about 50 points in time.
+    """
+    data_points = []
+    labels = []
+    days = (dend - dstart).days
+    if days > 50:
+        step = days / 50 + 1
+    else:
+        step = 1
+    for split_date, amount in splits:
+        while split_date > dstart:
+            data_points.append(balance)
+            labels.append(datetime.datetime.strftime(dstart, '%Y-%m-%d'))
+            dstart += datetime.timedelta(days=step)
+        balance += amount
+    data_points.append(balance)
+    labels.append(datetime.datetime.strftime(dend, '%Y-%m-%d'))
+    return {'labels': labels, 'data': data_points}
+
+
+class ChartRange(object):
+    def __init__(self, dstart, dend):
+        self.dstart = dstart
+        self.dend = dend
+
+    @cached_property
+    def accounts(self):
+        return list(Account.objects.personal().values_list(
+            'id', 'name', 'active', 'show_on_dashboard'))
+
+    @cached_property
+    def opening(self):
+        """
+        Sums of the amounts before the range per account and whether they are transfers.
+        """
+        sums = Split.objects.personal().filter(date__lt=self.dstart).values_list(
+            'account_id', 'opposing_account__account_type').annotate(
+            models.Sum('amount')).order_by()
+        return [(account_id, opposing_type == AccountType.PERSONAL, amount)
+                for account_id, opposing_type, amount in sums]
+
+    @cached_property
+    def splits(self):
+        return list(Split.objects.personal().date_range(self.dstart, self.dend).values_list(
+            'account_id', 'date', 'transaction__date', 'amount',
+            'opposing_account__account_type', 'category__name').order_by())
+
+    def accounts_balance(self, steps=30):
+        """
+        Returns the data points of Account.get_data_points of every active personal account.
+        """
+        opening = defaultdict(lambda: 0)
+        for account_id, transfer, amount in self.opening:
+            opening[account_id] += amount
+        splits = defaultdict(list)
+        for account_id, split_date, transaction_date, amount, _, _ in self.splits:
+            splits[account_id].append((transaction_date, amount))
+        dataset = []
+        for account_id, name, active, _ in sorted(self.accounts, key=lambda a: a[1]):
+            if not active:
+                continue
+            transactions = sorted(splits[account_id], key=lambda s: s[0], reverse=True)
+            data_points = _data_points(round(opening[account_id], 2), transactions,
+                                       self.dstart, self.dend, steps)
+            dataset.append({'name': name, 'data': tuple(point[1] for point in data_points)})
+        if dataset:
+            labels = [datetime.datetime.strftime(point[0], '%d %b %Y') for point in data_points]
+        else:
+            labels = []
+        return {'labels': labels, 'dataset': dataset}
+
+    def balance(self, include_non_dashboard_accounts=False):
+        """
+        Returns the balance over time of the personal accounts without transfers between them.
+        """
+        accounts = {account_id for account_id, _, _, show_on_dashboard in self.accounts
+                    if include_non_dashboard_accounts or show_on_dashboard}
+        balance = sum((amount for account_id, transfer, amount in self.opening
+                       if account_id in accounts and not transfer), 0)
+        splits = sorted((split_date, amount)
+                        for account_id, split_date, _, amount, opposing_type, _ in self.splits
+                        if account_id in accounts and opposing_type != AccountType.PERSONAL)
+        return balance_data(balance, splits, self.dstart, self.dend)
+
+    def category_spending(self):
+        """
+        Returns the expenses up to today per category.
+        """
+        today = datetime.date.today()
+        spent = defaultdict(lambda: 0)
+        for _, split_date, _, amount, opposing_type, category in self.splits:
+            if opposing_type == AccountType.FOREIGN and amount < 0 and split_date <= today:
+                spent[category] += amount
+        res = [(category or 'No category', abs(spent[category]))
+               for category in sorted(spent, key=lambda c: (c is not None, c)) if spent[category]]
+        if res:
+            categories, spent = zip(*res)
+        else:
+            categories, spent = [], []
+        return {'categories': categories, 'spent': spent}
@@ -0,0 +1,177 @@
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from silverstrike import models
+
+
+HEADERS = [
+    'account',
+    'opposing_account',
+    'date',
+    'amount',
+    'category'
+    ]
+
+# number of rows fetched from the database and written out at once
+CHUNK_SIZE = 2000
+
+
+def split_rows(splits, chunk_size=CHUNK_SIZE):
+    return splits.values_list('account__name', 'opposing_account__name', 'date', 'amount',
+                              'category__name').iterator(chunk_size=chunk_size)
+
+
+def csv_chunks(splits, chunk_size=CHUNK_SIZE):
+    """
+    Yields the export of splits as csv text, one chunk per chunk_size rows.
+    Only one chunk of rows is held in memory at a time.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(HEADERS)
+    for i, row in enumerate(split_rows(splits, chunk_size), 1):
+        writer.writerow(row)
+        if i % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """
+    Compresses text chunks to a gzip stream on the fly.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+DELTA_FIELDS = [
+    (models.Deletion.TRANSACTION, models.Transaction,
+     ['id', 'title', 'date', 'notes', 'transaction_type', 'src_id', 'dst_id', 'amount',
+      'recurrence_id', 'last_modified']),
+    (models.Deletion.SPLIT, models.Split,
+     ['id', 'transaction_id', 'account_id', 'opposing_account_id', 'title', 'amount', 'date',
+      'category_id', 'last_modified']),
+]
+
+
+# how far a cursor lies before the time it was taken. Rows saved inside a database
+# transaction carry the time of the save but only become visible once it commits, so the
+# changes of a transaction that was still open when the cursor was taken can be older
+# than the cursor. Reading from an earlier point picks them up, at the price of
+# delivering the changes of the overlap again.
+CURSOR_OVERLAP = datetime.timedelta(minutes=5)
+
+
+def next_cursor(now):
+    """
+    Returns the cursor to continue after changes read up to now. Changes in the last
+    CURSOR_OVERLAP are delivered again next time, clients have to apply them idempotently.
+    """
+    return now - CURSOR_OVERLAP
+
+
+def format_cursor(cursor):
+    # 'Z' instead of '+00:00' keeps the cursor safe to paste into a query string
+    return cursor.isoformat().replace('+00:00', 'Z')
+
+
+def tombstones(since, until=None, names=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields {model, id} of the rows deleted after since and up to until, of the models with
+    the given Deletion names or of all of them.
+    """
+    deletions = models.Deletion.objects.order_by('deleted_at', 'id')
+    if since:
+        deletions = deletions.filter(deleted_at__gt=since)
+    if until:
+        deletions = deletions.filter(deleted_at__lte=until)
+    if names is not None:
+        deletions = deletions.filter(model__in=names)
+    for model, object_id in deletions.values_list('model', 'object_id').iterator(chunk_size):
+        yield {'model': model, 'id': object_id}
+
+
+def parse_watermark(value):
+    """
+    Returns the timezone aware datetime of an ISO 8601 timestamp or None if value isn't one.
+    Raises ValueError for timestamps with invalid values like a 13th month.
+    """
+    watermark = parse_datetime(value.strip())
+    if watermark is not None and timezone.is_naive(watermark):
+        watermark = timezone.make_aware(watermark, datetime.timezone.utc)
+    return watermark
+
+
+def read_watermark(path):
+    """
+    Returns the watermark stored in path or None if there is no watermark yet.
+    """
+    try:
+        with open(path) as f:
+            value = f.read()
+    except FileNotFoundError:
+        return None
+    watermark = parse_watermark(value)
+    if watermark is None:
+        raise ValueError('{} does not contain a timestamp'.format(path))
+    return watermark
+
+
+def write_watermark(path, watermark):
+    """
+    Replaces the watermark file atomically, so an interrupted export never leaves a
+    truncated or half written watermark behind.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+        f.write(watermark.isoformat())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f.name, path)
+
+
+def delta_records(since, until, chunk_size=CHUNK_SIZE):
+    """
+    Yields tombstones of the transactions and splits deleted and the values of those
+    created or changed after since and up to until. since=None exports everything.
+    Tombstones come first, so applying the records in order always gives the current state.
+    """
+    names = [name for name, model, fields in DELTA_FIELDS]
+    for tombstone in tombstones(since, until, names, chunk_size):
+        yield dict(tombstone, deleted=True)
+    for name, model, fields in DELTA_FIELDS:
+        queryset = model.objects.filter(last_modified__lte=until)
+        if since:
+            queryset = queryset.filter(last_modified__gt=since)
+        for values in queryset.order_by().values(*fields).iterator(chunk_size):
+            values['model'] = name
+            yield values
+
+
+def delta_chunks(since, until, chunk_size=CHUNK_SIZE):
+    """
+    Yields the delta export as JSON lines, one chunk per chunk_size records.
+    """
+    lines = []
+    for record in delta_records(since, until, chunk_size):
+        lines.append(json.dumps(record, cls=DjangoJSONEncoder))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
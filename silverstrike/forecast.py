@@ -0,0 +1,123 @@
+"""
+Daily cash-flow forecast of the personal accounts.
+
+A forecast starts with the balances of today and adds the splits entered for later
+dates and the occurrences of all enabled recurrences up to the end of the horizon.
+Recurrences that are due but not entered yet count on the first day, once each, like
+the expected balance of the dashboard. Amounts are summed up as integer cents.
+"""
+import datetime
+import hashlib
+import operator
+from collections import defaultdict
+from decimal import Decimal
+from itertools import accumulate
+
+from dateutil.relativedelta import relativedelta
+
+from django.core.cache import cache
+from django.db import models
+
+from .aggregates import VERSION_COLUMNS, data_version
+from .models import Account, RecurringTransaction, Split
+
+MAX_MONTHS = 24
+
+# seconds a forecast stays cached, changes to the data or a new day invalidate it earlier
+CACHE_TIMEOUT = 3600
+
+_FORECAST_VERSION_COLUMNS = VERSION_COLUMNS + [(RecurringTransaction, 'last_modified')]
+
+
+def _cents(amount):
+    return int(amount * 100)
+
+
+def project(dstart, dend, balances, splits, recurrences):
+    """
+    Returns the balance in cents of every account in balances for each day from dstart
+    to dend. balances maps account ids to their balance in cents on dstart, splits are
+    (account id, date, cents) after dstart and recurrences RecurringTransactions.
+    """
+    days = (dend - dstart).days + 1
+    changes = {account_id: [0] * days for account_id in balances}
+    # daily and weekly recurrences per number of days between their dates, each list
+    # holds the cents of the first date the recurrence changes an account on
+    strided = defaultdict(lambda: defaultdict(lambda: [0] * days))
+    for account_id, date, cents in splits:
+        if account_id in changes:
+            changes[account_id][(date - dstart).days] += cents
+    first = dstart + datetime.timedelta(days=1)
+    for recurrence in recurrences:
+        cents = _cents(recurrence.amount)
+        accounts = [(account_id, sign * cents)
+                    for account_id, sign in ((recurrence.src_id, -1), (recurrence.dst_id, 1))
+                    if account_id in changes]
+        if not accounts:
+            continue
+        if recurrence.date <= dstart:
+            for account_id, amount in accounts:
+                changes[account_id][0] += amount
+        step = recurrence.days_between
+        if step is not None:
+            date = next(recurrence.occurrences(first, dend), None)
+            if date is not None:
+                for account_id, amount in accounts:
+                    strided[step][account_id][(date - dstart).days] += amount
+            continue
+        for date in recurrence.occurrences(first, dend):
+            index = (date - dstart).days
+            for account_id, amount in accounts:
+                changes[account_id][index] += amount
+    for step, accounts in strided.items():
+        for account_id, occurrences in accounts.items():
+            # every step days the recurrences repeat the amounts of their earlier dates
+            for offset in range(step):
+                occurrences[offset::step] = list(accumulate(occurrences[offset::step]))
+            changes[account_id] = list(map(operator.add, changes[account_id], occurrences))
+    projection = {}
+    for account_id, account_changes in changes.items():
+        projection[account_id] = list(accumulate(account_changes, initial=balances[account_id]))[1:]
+    return projection
+
+
+def forecast(months, today=None):
+    """
+    Returns the dates of the next months and for every active personal account its name
+    and projected balance on each of them.
+    """
+    dstart = today or datetime.date.today()
+    dend = dstart + relativedelta(months=months)
+    accounts = list(Account.objects.personal().active().order_by('name').values_list(
+        'id', 'name'))
+    balances = {account_id: 0 for account_id, name in accounts}
+    for account_id, amount in Split.objects.filter(
+            account_id__in=list(balances), date__lte=dstart).values_list('account_id').annotate(
+            models.Sum('amount')).order_by():
+        balances[account_id] = _cents(amount)
+    splits = [(account_id, date, _cents(amount)) for account_id, date, amount in
+              Split.objects.filter(account_id__in=list(balances), date__gt=dstart, date__lte=dend)
+              .values_list('account_id', 'date', 'amount')]
+    recurrences = RecurringTransaction.objects.exclude(
+        interval=RecurringTransaction.DISABLED).filter(date__lte=dend).order_by()
+    projection = project(dstart, dend, balances, splits, recurrences)
+    return {
+        'dates': [dstart + datetime.timedelta(days=i) for i in range((dend - dstart).days + 1)],
+        'accounts': [(name, [Decimal(cents).scaleb(-2) for cents in projection[account_id]])
+                     for account_id, name in accounts],
+    }
+
+
+def cached_forecast(months, today=None):
+    """
+    Like forecast, but reuses the result for the same day as long as the data is unchanged.
+    """
+    today = today or datetime.date.today()
+    digest = hashlib.sha1(repr((
+        months, today, data_version(_FORECAST_VERSION_COLUMNS))).encode('utf-8'))
+    cache_key = 'silverstrike.forecast.{}'.format(digest.hexdigest())
+    result = cache.get(cache_key)
+    if result is None:
+        result = forecast(months, today)
+        cache.set(cache_key, result, CACHE_TIMEOUT)
+    return result
@@ -10,7 +10,16 @@ class ImportUploadForm(forms.ModelForm):
         model = models.ImportFile
         fields = ['file', 'account', 'importer']
     account = forms.ModelChoiceField(queryset=models.Account.objects.personal().active())
-    importer = forms.ChoiceField(choices=enumerate(importers.IMPORTER_NAMES))
+    importer = forms.ChoiceField(choices=importers.choices)
+
+
+class ImportBatchUploadForm(ImportUploadForm):
+    importer = forms.ChoiceField(
+        choices=lambda: [('', '---------')] + importers.choices())
+
+
+ImportBatchUploadFormSet = forms.formset_factory(
+    ImportBatchUploadForm, extra=4, min_num=1, validate_min=True)
 
 
 class ForeignAccountForm(forms.ModelForm):
@@ -263,6 +272,7 @@ class ExportForm(forms.Form):
     end = forms.DateField()
     accounts = forms.ModelMultipleChoiceField(
         queryset=models.Account.objects.personal())
+    compress = forms.BooleanField(required=False, label=_('Compress (gzip)'))
 
 
 CategoryAssignFormset = forms.modelformset_factory(models.Split, fields=('category',), extra=0)
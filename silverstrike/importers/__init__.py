@@ -1,22 +1,94 @@
-from . import dkb, dkb_visa, pc_mastercard, volksbank
-
-IMPORTERS = [
-    dkb,
-    dkb_visa,
-    pc_mastercard,
-    volksbank,
-]
-
-IMPORTER_NAMES = [
-    'DKB Giro',
-    'DKB Visa',
-    'PC MasterCard',
-    'Volksbank',
-]
-
-try:
-    from . import ofx
-    IMPORTERS.append(ofx)
-    IMPORTER_NAMES.append('OFX Importer')
-except ImportError:
-    pass
+"""
+Registry of the statement importers.
+
+Importers are registered under a stable id which is stored in ImportFile.importer.
+The module doing the actual parsing is only imported when an importer is first used,
+so processes that never import statements do not pay for loading them.
+
+Other packages can provide importers through the ``silverstrike.importers`` entry point
+group. An entry point has to resolve to an Importer instance, for example::
+
+    [project.entry-points."silverstrike.importers"]
+    mybank = "silverstrike_mybank:importer"
+"""
+import importlib
+import logging
+from importlib.metadata import entry_points
+
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = 'silverstrike.importers'
+
+
+class Importer(object):
+    def __init__(self, id, name, module, streaming=False, iban=False, encoding='utf-8'):
+        self.id = id
+        self.name = name
+        # dotted path of a module with an import_transactions(path) function
+        self.module = module
+        # whether the file is read incrementally instead of being loaded at once
+        self.streaming = streaming
+        # whether the statements carry the IBAN of the other party
+        self.iban = iban
+        # None if the encoding is read from the file itself
+        self.encoding = encoding
+
+    def __repr__(self):
+        return '<Importer {}>'.format(self.id)
+
+    def load(self):
+        return importlib.import_module(self.module)
+
+    def import_transactions(self, path):
+        return self.load().import_transactions(path)
+
+
+_registry = {}
+_entry_points_loaded = False
+
+
+def register(importer):
+    if importer.id in _registry:
+        raise ValueError('An importer with id {} is already registered'.format(importer.id))
+    _registry[importer.id] = importer
+    return importer
+
+
+def _load_entry_points():
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            register(entry_point.load())
+        except Exception:
+            logger.exception('Cannot load importer %s', entry_point.name)
+
+
+def registered():
+    _load_entry_points()
+    return list(_registry.values())
+
+
+def get(id):
+    """
+    Returns the importer registered as id, raises KeyError for unknown ids.
+    """
+    if id not in _registry:
+        _load_entry_points()
+    return _registry[id]
+
+
+def choices():
+    return [(importer.id, importer.name) for importer in registered()]
+
+
+register(Importer('dkb', 'DKB Giro', 'silverstrike.importers.dkb', iban=True, encoding='latin-1'))
+register(Importer('dkb_visa', 'DKB Visa', 'silverstrike.importers.dkb_visa', encoding='latin-1'))
+register(Importer('pc_mastercard', 'PC MasterCard', 'silverstrike.importers.pc_mastercard'))
+register(Importer('volksbank', 'Volksbank', 'silverstrike.importers.volksbank', iban=True,
+                  encoding='latin-1'))
+register(Importer('ofx', 'OFX Importer', 'silverstrike.importers.ofx', streaming=True,
+                  encoding=None))
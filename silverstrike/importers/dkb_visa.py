@@ -1,7 +1,7 @@
 import csv
-import datetime
 
 from silverstrike.importers.import_statement import ImportStatement
+from silverstrike.importers.parsing import parse_date, parse_german_amount
 
 
 def import_transactions(csv_path):
@@ -12,10 +12,10 @@ def import_transactions(csv_path):
                 continue
             try:
                 lines.append(ImportStatement(
-                    book_date=datetime.datetime.strptime(line[1], '%d.%m.%Y').date(),
-                    transaction_date=datetime.datetime.strptime(line[2], '%d.%m.%Y').date(),
+                    book_date=parse_date(line[1], '%d.%m.%Y'),
+                    transaction_date=parse_date(line[2], '%d.%m.%Y'),
                     notes=line[3],
-                    amount=float(line[4].replace('.', '').replace(',', '.'))
+                    amount=parse_german_amount(line[4])
                     ))
             except ValueError:
                 # first line contains headers
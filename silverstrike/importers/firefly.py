@@ -1,10 +1,10 @@
 import csv
-import datetime
 
 from silverstrike import models
+from silverstrike.importers.parsing import parse_amount, parse_date
 
 
-def import_firefly(csv_path):
+def import_firefly(csv_path, progress=None):
     date = 'date'
     title = 'description'
     amount = 'amount'
@@ -30,6 +30,7 @@ def import_firefly(csv_path):
     for name, id in models.Category.objects.all().values_list('name', 'id'):
         categories[name] = id
 
+    parsed = committed = skipped = 0
     first_time = True
     with open(csv_path) as csv_file:
         for line in csv.reader(csv_file):
@@ -45,6 +46,9 @@ def import_firefly(csv_path):
                 category = line[category]
                 notes = line[notes]
                 continue
+            parsed += 1
+            if progress and parsed % 100 == 0:
+                progress(parsed, committed, skipped)
             if line[source] in personal_accounts:
                 line[source] = personal_accounts[line[source]]
             else:
@@ -53,7 +57,7 @@ def import_firefly(csv_path):
                 personal_accounts[a.name] = a.id
                 line[source] = a.id
 
-            line[amount] = float(line[amount])
+            line[amount] = parse_amount(line[amount])
 
             if line[transaction_type] == 'Withdrawal':
                 t_type = models.Transaction.WITHDRAW
@@ -69,6 +73,7 @@ def import_firefly(csv_path):
             elif line[transaction_type] == 'Transfer':
                 # positive transfers are wrong
                 if line[amount] > 0:
+                    skipped += 1
                     continue
                 t_type = models.Transaction.TRANSFER
                 if line[destination] in personal_accounts:
@@ -101,7 +106,7 @@ def import_firefly(csv_path):
                 line[category] = c.id
             else:
                 line[category] = None
-            line[date] = datetime.datetime.strptime(line[date], '%Y%m%d')
+            line[date] = parse_date(line[date], '%Y%m%d')
 
             transaction = models.Transaction.objects.create(
                 title=line[title], date=line[date],
@@ -120,3 +125,6 @@ def import_firefly(csv_path):
                     date=line[date],
                     opposing_account_id=line[source], amount=-line[amount],
                     transaction_id=transaction.id, category_id=line[category])])
+            committed += 1
+    if progress:
+        progress(parsed, committed, skipped)
@@ -1,33 +1,92 @@
-
+import codecs
+import html
 import logging
-
-from ofxparse import OfxParser
+import re
 
 from silverstrike.importers.import_statement import ImportStatement
+from silverstrike.importers.parsing import parse_amount, parse_date
 
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 64 * 1024
 
-def import_transactions(ofx_path):
-    transactions = []
-    with open(ofx_path) as ofx_file:
+# a transaction ends with its closing tag, or, in sloppy SGML files, where the next one starts
+_TRANSACTION = re.compile(r'<STMTTRN>(.*?)(?=</STMTTRN>|<STMTTRN>|</BANKTRANLIST>)',
+                          re.IGNORECASE | re.DOTALL)
+_TRANSACTION_START = re.compile(r'<STMTTRN>', re.IGNORECASE)
+# SGML leaf elements are not closed, so a value runs until the next tag
+_FIELD = re.compile(r'<([A-Z0-9_.]+)>([^<]*)', re.IGNORECASE)
+_CHARSET = re.compile(rb'CHARSET:\s*(\S+)|encoding="([^"]+)"', re.IGNORECASE)
+
+
+def _encoding(ofx_path):
+    with open(ofx_path, 'rb') as ofx_file:
+        match = _CHARSET.search(ofx_file.read(1024))
+    if not match:
+        return 'utf-8'
+    charset = (match.group(1) or match.group(2)).decode('ascii').upper()
+    if charset == '1252':
+        return 'cp1252'
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return 'latin-1'
+
+
+def read_transactions(ofx_file, chunk_size=CHUNK_SIZE):
+    """
+    Yields the fields of every STMTTRN record as a dictionary.
+    The file is read in chunks and only the current record is kept in memory.
+    """
+    buffer = ''
+    while True:
+        chunk = ofx_file.read(chunk_size)
+        buffer += chunk
+        position = 0
+        for match in _TRANSACTION.finditer(buffer):
+            yield {tag.upper(): html.unescape(value.strip()) if '&' in value else value.strip()
+                   for tag, value in _FIELD.findall(match.group(1))}
+            position = match.end()
+        buffer = buffer[position:]
+        if not chunk:
+            return
+        start = _TRANSACTION_START.search(buffer)
+        if start:
+            buffer = buffer[start.start():]
+        else:
+            # keep what could be the beginning of a split up tag
+            buffer = buffer[-len('<STMTTRN>'):]
+
+
+def _statement(fields):
+    name = fields.get('NAME', '')
+    amount = fields['TRNAMT']
+    if '.' not in amount:
+        amount = amount.replace(',', '.')
+    book_date = parse_date(fields['DTPOSTED'][:8], '%Y%m%d')
+    transaction_date = book_date
+    if fields.get('DTUSER'):
+        transaction_date = parse_date(fields['DTUSER'][:8], '%Y%m%d')
+    return ImportStatement(
+        account=name,
+        notes=name or fields.get('MEMO', ''),
+        book_date=book_date,
+        transaction_date=transaction_date,
+        amount=parse_amount(amount)
+        )
+
+
+def iter_transactions(ofx_path):
+    with open(ofx_path, encoding=_encoding(ofx_path), errors='replace') as ofx_file:
         logger.info('Opening ofx file %s', ofx_path)
-        try:
-            ofx = OfxParser.parse(ofx_file)
-            for transaction in ofx.account.statement.transactions:
-                try:
-                    transaction_time = transaction.date
-                    transactions.append(ImportStatement(
-                        notes=transaction.payee,
-                        book_date=transaction_time.date(),
-                        transaction_date=transaction_time.date(),
-                        amount=transaction.amount
-                        ))
-                except ValueError:
-                    logger.error('Cannot import transaction: {}'.format(transaction))
-                    pass
-        except ValueError:
-            logger.error('Failed to import all transactions! Wrong file format?')
-
-    return transactions
+        for index, fields in enumerate(read_transactions(ofx_file)):
+            try:
+                yield _statement(fields)
+            except (KeyError, ValueError) as e:
+                logger.error('Cannot import transaction %s (%s): %s',
+                             index, fields.get('FITID', ''), e)
+
+
+def import_transactions(ofx_path):
+    return list(iter_transactions(ofx_path))
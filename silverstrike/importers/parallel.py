@@ -0,0 +1,37 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from silverstrike import importers
+
+
+logger = logging.getLogger(__name__)
+
+
+def _parse(importer, path):
+    return importers.get(importer).import_transactions(path)
+
+
+def _context():
+    # forking a multi-threaded process, such as a web server handling a request, can
+    # leave locks of the other threads held in the child
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def parse_files(files, max_workers=None):
+    """
+    Parses (importer id, path) pairs and returns the statements of each file in the same order.
+    Several files are parsed in parallel in a process pool. A single file, or any file inside
+    a daemonic process that may not start children, is parsed in process.
+    This module must not import any django models as it is loaded by the pool workers.
+    """
+    files = list(files)
+    if len(files) < 2 or multiprocessing.current_process().daemon:
+        return [_parse(importer, path) for importer, path in files]
+    max_workers = min(len(files), max_workers or os.cpu_count() or 1)
+    logger.info('Parsing %s files with %s processes', len(files), max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_context()) as executor:
+        futures = [executor.submit(_parse, importer, path) for importer, path in files]
+        return [future.result() for future in futures]
@@ -0,0 +1,34 @@
+import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+
+# 1.234,56 -> 1234.56
+_GERMAN_AMOUNT = str.maketrans({'.': None, ',': '.'})
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value, format):
+    """
+    Statements only contain a few hundred distinct dates, so the result of
+    strptime is memoized instead of being recomputed for every row.
+    """
+    return datetime.datetime.strptime(value, format).date()
+
+
+def parse_amount(value):
+    """
+    Converts amounts like 1234.56 or -1234.56 to a Decimal.
+    Raises ValueError for anything that is not a number, like header lines.
+    """
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError('Invalid amount: {!r}'.format(value))
+
+
+def parse_german_amount(value):
+    """
+    Converts amounts like 1.234,56 or -1.234,56 to a Decimal without going through float.
+    """
+    return parse_amount(value.translate(_GERMAN_AMOUNT))
@@ -1,8 +1,8 @@
 import csv
-import datetime
 import logging
 
 from silverstrike.importers.import_statement import ImportStatement
+from silverstrike.importers.parsing import parse_amount, parse_date
 
 
 logger = logging.getLogger(__name__)
@@ -17,16 +17,16 @@ def import_transactions(csv_path):
         for line in csviter:
             logger.info('Line %s', line)
             try:
-                transaction_time = datetime.datetime.strptime(line[2], '%m/%d/%Y').date()
+                transaction_time = parse_date(line[2], '%m/%d/%Y')
                 lines.append(ImportStatement(
                     notes=line[0],
                     account=line[1],
                     book_date=transaction_time,
                     transaction_date=transaction_time,
-                    amount=-float(line[4])
+                    amount=-parse_amount(line[4])
                     ))
             except ValueError as e:
-                logger.error('Error' + e)
+                logger.error('Error %s', e)
                 pass
 
     return lines
@@ -1,7 +1,7 @@
 import csv
-import datetime
 
 from silverstrike.importers.import_statement import ImportStatement
+from silverstrike.importers.parsing import parse_date, parse_german_amount
 
 
 def import_transactions(csv_path):
@@ -11,12 +11,12 @@ def import_transactions(csv_path):
             if len(line) < 7:
                 continue
             try:
-                amount = float(line[11].replace('.', '').replace(',', '.'))
+                amount = parse_german_amount(line[11])
                 if line[12] == 'S':
                     amount = -amount
                 lines.append(ImportStatement(
-                    book_date=datetime.datetime.strptime(line[1], '%d.%m.%Y').date(),
-                    transaction_date=datetime.datetime.strptime(line[0], '%d.%m.%Y').date(),
+                    book_date=parse_date(line[1], '%d.%m.%Y'),
+                    transaction_date=parse_date(line[0], '%d.%m.%Y'),
                     account=line[3],
                     notes=line[8],
                     iban=line[5],
@@ -0,0 +1,178 @@
+import json
+import logging
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from silverstrike import models
+from silverstrike.importers import firefly, parallel
+
+
+logger = logging.getLogger(__name__)
+
+# number of rows committed in one database transaction before progress is reported
+CHUNK_SIZE = 100
+
+
+def _aliases(account, data):
+    aliases = []
+    if data.iban:
+        aliases.append(models.AccountAlias(
+            kind=models.AccountAlias.IBAN, value=data.iban, account=account))
+    if data.account:
+        aliases.append(models.AccountAlias(
+            kind=models.AccountAlias.NAME, value=data.account, account=account))
+    return aliases
+
+
+def _import_statement(file, datum, title, account, recurrence, category, aliases):
+    amount = datum.amount
+    if amount == 0:
+        return False
+    account, _ = models.Account.objects.get_or_create(
+        name=account,
+        defaults={'account_type': models.AccountType.FOREIGN})
+    aliases.extend(_aliases(account, datum))
+    if not account.iban and hasattr(datum, 'iban'):
+        account.iban = datum.iban
+        account.save()
+    transaction = models.Transaction()
+    if account.account_type == models.AccountType.PERSONAL:
+        transaction.transaction_type = models.Transaction.TRANSFER
+        if amount < 0:
+            transaction.src_id = file.account_id
+            transaction.dst = account
+        else:
+            transaction.src = account
+            transaction.dst_id = file.account_id
+    elif account.account_type == models.AccountType.FOREIGN:
+        if amount < 0:
+            transaction.transaction_type = models.Transaction.WITHDRAW
+            transaction.src_id = file.account_id
+            transaction.dst = account
+        else:
+            transaction.transaction_type = models.Transaction.DEPOSIT
+            transaction.dst_id = file.account_id
+            transaction.src = account
+    transaction.title = title
+    transaction.date = datum.transaction_date
+    transaction.amount = abs(amount)
+
+    if recurrence > 0:
+        transaction.recurrence_id = recurrence
+    transaction.save()
+    category_id = category if category > 0 else None
+
+    models.Split.objects.create(
+        title=title,
+        amount=amount,
+        date=datum.book_date,
+        transaction=transaction,
+        account_id=file.account_id,
+        opposing_account=account,
+        category_id=category_id
+        )
+    models.Split.objects.create(
+        title=title,
+        amount=-amount,
+        date=datum.transaction_date,
+        transaction=transaction,
+        account=account,
+        opposing_account_id=file.account_id,
+        category_id=category_id
+        )
+    return True
+
+
+def _link_statement(file, datum, split_id, aliases):
+    """
+    Links a statement to a transaction that was entered before: the split on the imported
+    account takes the booking date of the bank and the other party is remembered for
+    future imports.
+    """
+    split = models.Split.objects.select_related('opposing_account').filter(
+        id=split_id, account_id=file.account_id).first()
+    if split is None:
+        return False
+    if split.date != datum.book_date:
+        split.date = datum.book_date
+        split.save(update_fields=['date', 'last_modified'])
+    if split.opposing_account.account_type == models.AccountType.FOREIGN:
+        aliases.extend(_aliases(split.opposing_account, datum))
+    return True
+
+
+def import_statements(job):
+    """
+    Commits the rows selected on the import preview page.
+    job.data holds a list of {file, row, title, account, recurrence, category} entries, rows that
+    are not part of it were ignored by the user. Rows with a {file, row, match} entry are
+    linked to the existing split with the id match instead.
+    """
+    files = job.files
+    parsed = parallel.parse_files((f.importer, f.file.path) for f in files)
+    selected = dict()
+    for entry in json.loads(job.data):
+        selected[(entry.get('file', str(job.file_id)), entry['row'])] = entry
+    rows = []
+    for file, statements in zip(files, parsed):
+        for i, datum in enumerate(statements):
+            rows.append((file, datum, selected.get((str(file.pk), i))))
+    # a resumed job starts after the chunks that were committed before
+    committed = job.rows_committed
+    job.report_progress(len(rows), committed, job.rows_done - committed)
+    for start in range(job.rows_done, len(rows), CHUNK_SIZE):
+        aliases = []
+        with db_transaction.atomic():
+            for file, datum, entry in rows[start:start + CHUNK_SIZE]:
+                if not entry:
+                    continue
+                if 'match' in entry:
+                    if _link_statement(file, datum, entry['match'], aliases):
+                        committed += 1
+                elif _import_statement(file, datum, entry['title'], entry['account'],
+                                       entry['recurrence'], entry.get('category', -1), aliases):
+                    committed += 1
+            models.AccountAlias.objects.bulk_create(aliases, ignore_conflicts=True)
+            done = min(start + CHUNK_SIZE, len(rows))
+            job.report_progress(len(rows), committed, done - committed, done)
+
+
+def import_firefly(job):
+    firefly.import_firefly(job.file.file.path, progress=job.report_progress)
+
+
+def run_job(job):
+    resumed = job.started_at is not None
+    job.started_at = timezone.now()
+    job.save(update_fields=['started_at'])
+    try:
+        if resumed and job.kind == models.ImportJob.FIREFLY:
+            # the import cannot continue where it stopped, running it again duplicates rows
+            raise RuntimeError('The import was interrupted, check the imported transactions')
+        if job.kind == models.ImportJob.STATEMENTS:
+            import_statements(job)
+        elif job.kind == models.ImportJob.FIREFLY:
+            import_firefly(job)
+    except Exception as e:
+        logger.exception('Import job %s failed', job.pk)
+        job.status = models.ImportJob.FAILED
+        job.error = str(e)
+    else:
+        job.status = models.ImportJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def run_pending_jobs():
+    """
+    Processes jobs until the queue is empty and returns the number of jobs run.
+    """
+    count = 0
+    while True:
+        job = models.ImportJob.objects.claim()
+        if job is None:
+            return count
+        run_job(job)
+        count += 1
@@ -0,0 +1,160 @@
+"""
+Dumps and restores the whole ledger as JSON lines.
+
+The first line identifies the format. Every model starts with a line naming the model
+and its columns, followed by one JSON array of values per row. Models are written in
+an order in which every foreign key points to a row that was restored before it.
+"""
+import datetime
+import gzip
+import json
+from contextlib import contextmanager
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from silverstrike import models
+
+
+FORMAT = 'silverstrike-ledger'
+VERSION = 1
+
+# number of rows read from the database or inserted at once
+CHUNK_SIZE = 2000
+
+LEDGER_MODELS = [
+    models.Account,
+    models.AccountAlias,
+    models.Category,
+    models.RecurringTransaction,
+    models.Budget,
+    models.Transaction,
+    models.Split,
+]
+
+
+class _Encoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder drops the microseconds
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super(_Encoder, self).default(o)
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def dump_lines(chunk_size=CHUNK_SIZE):
+    """
+    Yields the ledger in chunks of lines, reading chunk_size rows from the database at a time.
+    """
+    encoder = _Encoder(separators=(',', ':'))
+    yield encoder.encode({'format': FORMAT, 'version': VERSION}) + '\n'
+    for model in LEDGER_MODELS:
+        columns = _columns(model)
+        yield encoder.encode({'model': model._meta.model_name, 'columns': columns}) + '\n'
+        lines = []
+        rows = model.objects.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+        for row in rows:
+            lines.append(encoder.encode(row))
+            if len(lines) == chunk_size:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+
+def dump(path, chunk_size=CHUNK_SIZE):
+    with _open(path, 'w') as f:
+        for chunk in dump_lines(chunk_size):
+            f.write(chunk)
+
+
+def _check_empty():
+    """
+    Raises ValueError if the database contains ledger data other than the system account
+    every new database starts with.
+    """
+    for model in LEDGER_MODELS:
+        queryset = model.objects.all()
+        if model is models.Account:
+            queryset = queryset.exclude(account_type=models.AccountType.SYSTEM)
+        if queryset.exists():
+            raise ValueError('The database already contains {}'.format(
+                model._meta.verbose_name_plural))
+
+
+@contextmanager
+def _keep_timestamps():
+    """
+    Stops auto_now fields from replacing the restored last_modified timestamps.
+    """
+    fields = [field for model in LEDGER_MODELS for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)]
+    for field in fields:
+        field.auto_now = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now = True
+
+
+def _reset_sequences():
+    statements = connection.ops.sequence_reset_sql(no_style(), LEDGER_MODELS)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def load_lines(lines, chunk_size=CHUNK_SIZE):
+    """
+    Restores the ledger from lines written by dump_lines into an empty database.
+    Rows are inserted with bulk_create in batches of chunk_size inside one transaction,
+    so a failing restore leaves the database untouched.
+    Returns a dictionary with the number of rows restored per model.
+    """
+    lines = iter(lines)
+    header = json.loads(next(lines, '{}'))
+    if header.get('format') != FORMAT or header.get('version') != VERSION:
+        raise ValueError('Not a ledger dump')
+    model_names = {model._meta.model_name: model for model in LEDGER_MODELS}
+    counts = {}
+    with transaction.atomic(), _keep_timestamps():
+        _check_empty()
+        models.Account.objects.filter(account_type=models.AccountType.SYSTEM).delete()
+        model = fields = None
+        batch = []
+        for line in lines:
+            values = json.loads(line)
+            if isinstance(values, dict):
+                if batch:
+                    model.objects.bulk_create(batch)
+                    batch = []
+                model = model_names[values['model']]
+                fields = [model._meta.get_field(column) for column in values['columns']]
+                counts[model._meta.model_name] = 0
+                continue
+            batch.append(model(**{field.attname: field.to_python(value)
+                                  for field, value in zip(fields, values)}))
+            counts[model._meta.model_name] += 1
+            if len(batch) == chunk_size:
+                model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+        _reset_sequences()
+    return counts
+
+
+def load(path, chunk_size=CHUNK_SIZE):
+    with _open(path, 'r') as f:
+        return load_lines(f, chunk_size)
@@ -1,5 +1,9 @@
 import datetime
 
+# number of values passed to one IN query, stays well below the number of parameters
+# sqlite allows per query
+BATCH_SIZE = 500
+
 
 def last_day_of_month(any_day):
     next_month = any_day.replace(day=28) + datetime.timedelta(days=4)
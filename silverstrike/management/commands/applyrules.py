@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from silverstrike.rules import RuleSet, apply_to_splits
+
+
+class Command(BaseCommand):
+    help = 'Assigns categories and recurrences to existing transactions using the category rules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true',
+                            help='Replace categories and recurrences that are already set')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many transactions would change')
+
+    def handle(self, *args, **options):
+        rules = RuleSet.load()
+        if not rules:
+            self.stdout.write('There are no active category rules')
+            return
+        categorised, recurrences = apply_to_splits(
+            rules, overwrite=options['overwrite'], dry_run=options['dry_run'])
+        self.stdout.write('{} {} split(s) and linked {} transaction(s) to a recurrence'.format(
+            'Would categorise' if options['dry_run'] else 'Categorised', categorised, recurrences))
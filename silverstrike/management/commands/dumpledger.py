@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from silverstrike import ledger
+
+
+class Command(BaseCommand):
+    help = 'Writes all accounts, categories, recurrences, budgets and transactions to a file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=str,
+                            help='File to write to, it is compressed if the name ends with .gz')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            ledger.dump(options['file'])
+        except FileNotFoundError:
+            raise CommandError('Could not open {} for writing'.format(options['file']))
+        self.stdout.write('Dumped the ledger to {} in {:.1f}s'.format(
+            options['file'], time.perf_counter() - start))
@@ -1,8 +1,9 @@
-import csv
 import sys
 
 from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 
+from silverstrike import export
 from silverstrike.models import Split
 
 
@@ -13,28 +14,49 @@ class Command(BaseCommand):
             dest='file',
             type=str,
             help='File to write to')
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output with gzip')
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only export changes after this timestamp, as JSON lines. If a file is '
+                 'given, the timestamp is read from it and replaced by the new one afterwards. '
+                 'Changes of the last minutes before it are exported again next time')
 
     def handle(self, *args, **options):
-        output = sys.stdout
+        watermark_file = None
+        if options['since']:
+            try:
+                since = export.parse_watermark(options['since'])
+                if since is None:
+                    watermark_file = options['since']
+                    since = export.read_watermark(watermark_file)
+            except ValueError as e:
+                raise CommandError(str(e))
+            until = timezone.now()
+            chunks = export.delta_chunks(since, until)
+        else:
+            splits = Split.objects.transfers_once().personal()
+            chunks = export.csv_chunks(splits)
+
+        binary = options['gzip']
+        output = sys.stdout.buffer if binary else sys.stdout
         if options['file']:
             try:
-                output = open(options['file'], 'w')
+                output = open(options['file'], 'wb') if binary else open(options['file'], 'w', newline='')
             except FileNotFoundError:
                 raise CommandError('Could not open {} for writing'.format(options['file']))
 
-        splits = Split.objects.transfers_once().personal()
-        csv_writer = csv.writer(output, delimiter=';')
-        headers = [
-            'account',
-            'opposing_account',
-            'date',
-            'amount',
-            'category'
-            ]
-        csv_writer.writerow(headers)
-        for split in splits.values_list('account__name', 'opposing_account__name',
-                                        'date', 'amount', 'category'):
-            csv_writer.writerow(split)
+        if binary:
+            chunks = export.gzip_chunks(chunks)
+        for chunk in chunks:
+            output.write(chunk)
         if options['file']:
             output.close()
             print('Exported transactions to {}'.format(options['file']))
+        else:
+            output.flush()
+        if watermark_file:
+            export.write_watermark(watermark_file, export.next_cursor(until))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from silverstrike import ledger
+
+
+class Command(BaseCommand):
+    help = 'Restores a file written by dumpledger into an empty database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=str, help='File to restore')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            counts = ledger.load(options['file'])
+        except FileNotFoundError:
+            raise CommandError('Could not open {}'.format(options['file']))
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write('Restored {} rows in {:.1f}s'.format(
+            sum(counts.values()), time.perf_counter() - start))
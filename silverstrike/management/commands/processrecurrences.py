@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from silverstrike.recurrences import process_due_recurrences
+
+
+class Command(BaseCommand):
+    help = 'Enters all due occurrences of the recurrences as transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', type=str,
+                            help='Enter the occurrences up to this date (YYYY-MM-DD), '
+                                 'defaults to today')
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            try:
+                until = parse_date(options['until'])
+            except ValueError:
+                pass
+            if until is None:
+                raise CommandError('Invalid date: {}'.format(options['until']))
+        created, advanced = process_due_recurrences(until)
+        self.stdout.write('Created {} transaction(s) and advanced {} recurrence(s)'.format(
+            created, advanced))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from silverstrike.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of waiting for new jobs')
+        parser.add_argument('--sleep', type=float, default=2,
+                            help='Seconds to wait between polls of an empty queue')
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending_jobs()
+            if count:
+                self.stdout.write('Processed {} import job(s)'.format(count))
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,92 @@
+import bisect
+import datetime
+from collections import defaultdict
+
+from silverstrike import models
+
+
+# days the date of a statement and the date of a booked split may differ
+DEFAULT_WINDOW = 3
+
+
+def _join_group(statements, splits, window):
+    """
+    Pairs statements and splits of the same amount.
+    Statements are handled in the order their window closes and take the earliest unmatched
+    split inside of it, which pairs up as many of them as possible.
+    """
+    dates = [date for _, date, _ in splits]
+    # next_free[k] leads to the first unmatched split at or after k
+    next_free = list(range(len(splits) + 1))
+
+    def find(k):
+        root = k
+        while next_free[root] != root:
+            root = next_free[root]
+        while next_free[k] != root:
+            next_free[k], k = root, next_free[k]
+        return root
+
+    pairs = []
+    for _, first, last, statement in statements:
+        k = find(bisect.bisect_left(dates, first - window))
+        if k < len(splits) and dates[k] <= last + window:
+            pairs.append((statement, splits[k][2]))
+            next_free[k] = k + 1
+    return pairs
+
+
+def merge_join(statements, splits, window=DEFAULT_WINDOW):
+    """
+    Pairs statements with splits of the same amount that were booked within window days.
+
+    statements are (amount, first date, last date, item) tuples, the dates being the
+    booking and value date of the statement. splits are (amount, date, item) tuples.
+    Both lists are sorted by amount and date and joined in a single pass, so the whole
+    match takes O(n log n). Returns a list of (statement item, split item) pairs.
+    """
+    window = datetime.timedelta(days=window)
+    statements = sorted(statements, key=lambda s: (s[0], s[2]))
+    splits = sorted(splits, key=lambda s: (s[0], s[1]))
+    pairs = []
+    i = j = 0
+    while i < len(statements) and j < len(splits):
+        amount = statements[i][0]
+        if splits[j][0] < amount:
+            j += 1
+        elif splits[j][0] > amount:
+            i += 1
+        else:
+            i_end, j_end = i, j
+            while i_end < len(statements) and statements[i_end][0] == amount:
+                i_end += 1
+            while j_end < len(splits) and splits[j_end][0] == amount:
+                j_end += 1
+            pairs.extend(_join_group(statements[i:i_end], splits[j:j_end], window))
+            i, j = i_end, j_end
+    return pairs
+
+
+def find_matches(data, window=DEFAULT_WINDOW):
+    """
+    Sets datum.match to the existing split of the account a statement is imported into
+    that books the same amount within window days.
+    """
+    statements = defaultdict(list)
+    for datum in data:
+        if not getattr(datum, 'ignore', False) and datum.import_file.account_id:
+            statements[datum.import_file.account_id].append(datum)
+    delta = datetime.timedelta(days=window)
+    for account_id, account_statements in statements.items():
+        dates = [d for datum in account_statements for d in (datum.book_date, datum.transaction_date)]
+        splits = models.Split.objects.filter(
+            account_id=account_id, date__gte=min(dates) - delta, date__lte=max(dates) + delta
+            ).exclude(transaction__transaction_type=models.Transaction.SYSTEM).select_related(
+            'transaction', 'opposing_account')
+        pairs = merge_join(
+            [(datum.amount, min(datum.book_date, datum.transaction_date),
+              max(datum.book_date, datum.transaction_date), datum)
+             for datum in account_statements],
+            [(split.amount, split.date, split) for split in splits], window)
+        for datum, split in pairs:
+            datum.match = split
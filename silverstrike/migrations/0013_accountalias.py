@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:02
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+IBAN = 1
+NAME = 2
+
+
+def _load(value):
+    try:
+        return json.loads(value)
+    except json.decoder.JSONDecodeError:
+        return []
+
+
+def forwards(apps, schema_editor):
+    Account = apps.get_model('silverstrike', 'Account')
+    AccountAlias = apps.get_model('silverstrike', 'AccountAlias')
+    aliases = []
+    for id, ibans, names in Account.objects.values_list('id', 'import_ibans', 'import_names'):
+        for iban in set(_load(ibans)):
+            aliases.append(AccountAlias(kind=IBAN, value=iban, account_id=id))
+        for name in set(_load(names)):
+            aliases.append(AccountAlias(kind=NAME, value=name, account_id=id))
+    AccountAlias.objects.bulk_create(aliases, batch_size=500)
+
+
+def backwards(apps, schema_editor):
+    Account = apps.get_model('silverstrike', 'Account')
+    AccountAlias = apps.get_model('silverstrike', 'AccountAlias')
+    values = {}
+    for account_id, kind, value in AccountAlias.objects.values_list('account_id', 'kind', 'value'):
+        ibans, names = values.setdefault(account_id, ([], []))
+        (ibans if kind == IBAN else names).append(value)
+    for account_id, (ibans, names) in values.items():
+        Account.objects.filter(id=account_id).update(
+            import_ibans=json.dumps(ibans), import_names=json.dumps(names))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silverstrike', '0012_importbatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountAlias',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.IntegerField(choices=[(1, 'IBAN'), (2, 'Name')])),
+                ('value', models.CharField(max_length=255)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='silverstrike.account')),
+            ],
+            options={
+                'verbose_name_plural': 'account aliases',
+                'unique_together': {('kind', 'value', 'account')},
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.RemoveField(
+            model_name='account',
+            name='import_ibans',
+        ),
+        migrations.RemoveField(
+            model_name='account',
+            name='import_names',
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+# position of each importer in the list the upload form used to offer
+IMPORTER_IDS = ['dkb', 'dkb_visa', 'pc_mastercard', 'volksbank', 'ofx']
+
+
+def forwards(apps, schema_editor):
+    ImportFile = apps.get_model('silverstrike', 'ImportFile')
+    for index, importer in enumerate(IMPORTER_IDS):
+        ImportFile.objects.filter(importer=str(index)).update(importer=importer)
+
+
+def backwards(apps, schema_editor):
+    ImportFile = apps.get_model('silverstrike', 'ImportFile')
+    ImportFile.objects.exclude(importer__in=IMPORTER_IDS).update(importer=None)
+    for index, importer in enumerate(IMPORTER_IDS):
+        ImportFile.objects.filter(importer=importer).update(importer=str(index))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silverstrike', '0013_accountalias'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importfile',
+            name='importer',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silverstrike', '0014_importfile_importer_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryRule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payee', models.CharField(blank=True, help_text='Name of the other party, case is ignored', max_length=255)),
+                ('iban', models.CharField(blank=True, max_length=64)),
+                ('pattern', models.CharField(blank=True, help_text='Regular expression searched in the title and notes', max_length=255)),
+                ('min_amount', models.DecimalField(blank=True, decimal_places=2, help_text='Expenses have negative amounts', max_digits=10, null=True)),
+                ('max_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('priority', models.PositiveIntegerField(default=0)),
+                ('active', models.BooleanField(default=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='silverstrike.category')),
+                ('recurrence', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='silverstrike.recurringtransaction')),
+            ],
+            options={
+                'ordering': ['priority', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silverstrike', '0016_deletion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='split',
+            index=models.Index(fields=['account', 'date'], name='silverstrik_account_bc7acc_idx'),
+        ),
+    ]
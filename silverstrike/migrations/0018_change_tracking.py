@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silverstrike', '0017_split_account_date_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='account',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='deletion',
+            name='model',
+            field=models.CharField(choices=[('transaction', 'Transaction'), ('split', 'Split'), ('account', 'Account'), ('category', 'Category'), ('recurringtransaction', 'Recurring transaction')], max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='recurringtransaction',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:48
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silverstrike', '0018_change_tracking'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='date',
+            field=models.DateField(db_index=True, default=datetime.date.today),
+        ),
+    ]
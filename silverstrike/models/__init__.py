@@ -1,8 +1,11 @@
 # flake8: noqa
 from .account import Account
+from .account_alias import AccountAlias
 from .recurrence import RecurringTransaction
 from .transaction import Transaction, Split
 from .category import Category
 from .budget import Budget
-from .imports import ImportFile
+from .imports import ImportBatch, ImportFile, ImportJob
 from .account_type import AccountType
+from .category_rule import CategoryRule
+from .deletion import Deletion
@@ -5,10 +5,32 @@ from django.urls import reverse
 from django.utils.translation import gettext as _
 
 from .account_type import AccountType
+from .deletion import DeletionModel, DeletionQuerySet
 from .transaction import Split, Transaction
 
 
-class AccountQuerySet(models.QuerySet):
+def _data_points(balance, transactions, dstart, dend, steps):
+    """
+    Returns the balance at steps points in time from dstart to dend, starting with balance
+    and adding the (date, amount) pairs of transactions, sorted by descending date.
+    """
+    step = (dend - dstart) / steps
+    if step < timedelta(days=1):
+        step = timedelta(days=1)
+        steps = int((dend - dstart) / step)
+    data_points = []
+    for i in range(steps):
+        while len(transactions) > 0 and transactions[-1][0] <= dstart:
+            balance += transactions.pop()[1]
+        data_points.append((dstart, balance))
+        dstart += step
+    for t in transactions:
+        balance += t[1]
+    data_points.append((dend, balance))
+    return data_points
+
+
+class AccountQuerySet(DeletionQuerySet):
     def personal(self):
         return self.filter(account_type=AccountType.PERSONAL)
 
@@ -25,16 +47,14 @@ class AccountQuerySet(models.QuerySet):
         return self.filter(show_on_dashboard=True)
 
 
-class Account(models.Model):
+class Account(DeletionModel):
 
     name = models.CharField(max_length=64)
     account_type = models.IntegerField(choices=AccountType.choices, default=AccountType.PERSONAL)
     active = models.BooleanField(default=True)
-    last_modified = models.DateTimeField(auto_now=True)
+    last_modified = models.DateTimeField(auto_now=True, db_index=True)
     show_on_dashboard = models.BooleanField(default=False)
     iban = models.CharField(max_length=34, blank=True, null=True)
-    import_ibans = models.TextField(default='[]')
-    import_names = models.TextField(default='[]')
 
     objects = AccountQuerySet.as_manager()
 
@@ -68,30 +88,29 @@ class Account(models.Model):
         return round(Split.objects.filter(account=self, date__lte=date).aggregate(
             models.Sum('amount'))['amount__sum'] or 0, 2)
 
+    async def abalance_on(self, date):
+        balance = await Split.objects.filter(account=self, date__lte=date).aaggregate(
+            models.Sum('amount'))
+        return round(balance['amount__sum'] or 0, 2)
+
     def get_absolute_url(self):
         return reverse('account_view', args=[self.pk])
 
+    def _data_point_splits(self, dstart, dend):
+        return Split.objects.filter(account_id=self.pk).date_range(dstart, dend).order_by(
+            '-transaction__date').values_list('transaction__date', 'amount')
+
     def get_data_points(self, dstart=date.today() - timedelta(days=365),
                         dend=date.today(), steps=30):
-        step = (dend - dstart) / steps
-        if step < timedelta(days=1):
-            step = timedelta(days=1)
-            steps = int((dend - dstart) / step)
-        data_points = []
         balance = self.balance_on(dstart - timedelta(days=1))
-        transactions = list(Split.objects.prefetch_related('transaction').filter(
-            account_id=self.pk).date_range(dstart, dend).order_by(
-            '-transaction__date'))
-        for i in range(steps):
-            while len(transactions) > 0 and transactions[-1].transaction.date <= dstart:
-                t = transactions.pop()
-                balance += t.amount
-            data_points.append((dstart, balance))
-            dstart += step
-        for t in transactions:
-            balance += t.amount
-        data_points.append((dend, balance))
-        return data_points
+        transactions = list(self._data_point_splits(dstart, dend))
+        return _data_points(balance, transactions, dstart, dend, steps)
+
+    async def aget_data_points(self, dstart=date.today() - timedelta(days=365),
+                               dend=date.today(), steps=30):
+        balance = await self.abalance_on(dstart - timedelta(days=1))
+        transactions = [t async for t in self._data_point_splits(dstart, dend)]
+        return _data_points(balance, transactions, dstart, dend, steps)
 
     def set_initial_balance(self, amount):
         system = Account.objects.get(account_type=AccountType.SYSTEM)
@@ -0,0 +1,57 @@
+from django.db import models
+from django.db.models import Q
+from django.utils.translation import gettext as _
+
+from .account import Account
+from ..lib import BATCH_SIZE
+
+
+class AccountAliasQuerySet(models.QuerySet):
+    def suggestions(self, ibans, names):
+        """
+        Returns dictionaries mapping the given ibans and names to accounts.
+        Names that are used by more than one account are left out as they are ambiguous.
+        """
+        ibans = list(set(ibans))
+        names = list(set(names))
+        iban_accounts = dict()
+        name_accounts = dict()
+        ambiguous = set()
+        for start in range(0, max(len(ibans), len(names)), BATCH_SIZE):
+            aliases = self.filter(
+                Q(kind=AccountAlias.IBAN, value__in=ibans[start:start + BATCH_SIZE]) |
+                Q(kind=AccountAlias.NAME, value__in=names[start:start + BATCH_SIZE]))
+            for alias in aliases.select_related('account'):
+                if alias.kind == AccountAlias.IBAN:
+                    iban_accounts[alias.value] = alias.account
+                elif alias.value in name_accounts and name_accounts[alias.value] != alias.account:
+                    ambiguous.add(alias.value)
+                else:
+                    name_accounts[alias.value] = alias.account
+        for name in ambiguous:
+            del name_accounts[name]
+        return iban_accounts, name_accounts
+
+
+class AccountAlias(models.Model):
+    IBAN = 1
+    NAME = 2
+
+    KIND_OPTIONS = (
+        (IBAN, _('IBAN')),
+        (NAME, _('Name')),
+    )
+
+    kind = models.IntegerField(choices=KIND_OPTIONS)
+    value = models.CharField(max_length=255)
+    account = models.ForeignKey(Account, models.CASCADE, related_name='aliases')
+
+    objects = AccountAliasQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'account aliases'
+        # the unique index also serves lookups by (kind, value)
+        unique_together = (('kind', 'value', 'account'),)
+
+    def __str__(self):
+        return self.value
@@ -2,13 +2,16 @@ from django.db import models
 from django.urls import reverse
 
 from .account_type import AccountType
+from .deletion import DeletionModel, DeletionQuerySet
 from .transaction import Split, Transaction
 
 
-class Category(models.Model):
+class Category(DeletionModel):
     name = models.CharField(max_length=64)
     active = models.BooleanField(default=True)
-    last_modified = models.DateTimeField(auto_now=True)
+    last_modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = DeletionQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = 'categories'
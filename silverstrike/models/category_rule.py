@@ -0,0 +1,53 @@
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.translation import gettext as _
+
+
+class CategoryRuleQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(active=True)
+
+
+class CategoryRule(models.Model):
+    """
+    Assigns a category and/or a recurrence to imported and existing transactions.
+    A rule matches if all of its conditions that are set match. If several rules match,
+    the one with the lowest priority wins.
+    """
+    payee = models.CharField(max_length=255, blank=True,
+                             help_text=_('Name of the other party, case is ignored'))
+    iban = models.CharField(max_length=64, blank=True)
+    pattern = models.CharField(max_length=255, blank=True,
+                               help_text=_('Regular expression searched in the title and notes'))
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True,
+                                     help_text=_('Expenses have negative amounts'))
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    category = models.ForeignKey('Category', models.CASCADE, blank=True, null=True,
+                                 related_name='rules')
+    recurrence = models.ForeignKey('RecurringTransaction', models.CASCADE, blank=True,
+                                   null=True, related_name='rules')
+    priority = models.PositiveIntegerField(default=0)
+    active = models.BooleanField(default=True)
+
+    objects = CategoryRuleQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['priority', 'id']
+
+    def __str__(self):
+        conditions = [self.payee, self.iban, self.pattern]
+        return ' / '.join(c for c in conditions if c) or _('Amount rule')
+
+    def clean(self):
+        if self.pattern:
+            try:
+                re.compile(self.pattern)
+            except re.error as e:
+                raise ValidationError({'pattern': _('Invalid regular expression: {}').format(e)})
+        if not self.category_id and not self.recurrence_id:
+            raise ValidationError(_('A rule needs a category or a recurrence'))
+        if self.min_amount is not None and self.max_amount is not None and \
+                self.min_amount > self.max_amount:
+            raise ValidationError(_('The minimum amount has to be smaller than the maximum'))
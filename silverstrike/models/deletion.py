@@ -0,0 +1,104 @@
+from django.db import models, router, transaction
+from django.db.models.deletion import Collector
+
+
+class Deletion(models.Model):
+    """
+    Tombstone of a deleted row, used by incremental exports and the delta sync
+    to tell downstream copies which rows to remove.
+    """
+    TRANSACTION = 'transaction'
+    SPLIT = 'split'
+    ACCOUNT = 'account'
+    CATEGORY = 'category'
+    RECURRENCE = 'recurringtransaction'
+
+    MODEL_OPTIONS = (
+        (TRANSACTION, 'Transaction'),
+        (SPLIT, 'Split'),
+        (ACCOUNT, 'Account'),
+        (CATEGORY, 'Category'),
+        (RECURRENCE, 'Recurring transaction'),
+    )
+
+    model = models.CharField(max_length=32, choices=MODEL_OPTIONS)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['deleted_at']
+
+    def __str__(self):
+        return '{} {}'.format(self.model, self.object_id)
+
+
+def _delete_collected(collector):
+    """
+    Runs the delete of collector and records the tombstones of all deleted rows of tracked
+    models with one bulk insert. Rows the collector deletes without loading them, like the
+    splits of deleted transactions, are looked up with one query per fast delete, so no
+    delete signal is needed and Django keeps its fast path.
+    """
+    tracked = dict(Deletion.MODEL_OPTIONS)
+    deleted = set()
+    for model, instances in collector.data.items():
+        if model._meta.model_name in tracked:
+            deleted.update((model._meta.model_name, instance.pk) for instance in instances)
+    for queryset in collector.fast_deletes:
+        if queryset.model._meta.model_name in tracked:
+            deleted.update((queryset.model._meta.model_name, pk)
+                           for pk in queryset.values_list('pk', flat=True))
+    with transaction.atomic(using=collector.using, savepoint=False):
+        result = collector.delete()
+        Deletion.objects.using(collector.using).bulk_create(
+            [Deletion(model=model, object_id=object_id) for model, object_id in sorted(deleted)])
+    return result
+
+
+class DeletionQuerySet(models.QuerySet):
+    """
+    QuerySet of a model whose deletions are recorded, see DeletionModel.
+    """
+    def delete(self):
+        # same as QuerySet.delete, apart from recording the tombstones
+        self._not_support_combined_queries('delete')
+        if self.query.is_sliced:
+            raise TypeError("Cannot use 'limit' or 'offset' with delete().")
+        if self.query.distinct_fields:
+            raise TypeError('Cannot call delete() after .distinct(*fields).')
+        if self._fields is not None:
+            raise TypeError('Cannot call delete() after .values() or .values_list()')
+        del_query = self._chain()
+        del_query._for_write = True
+        del_query.query.select_for_update = False
+        del_query.query.select_related = False
+        del_query.query.clear_ordering(force=True)
+        collector = Collector(using=del_query.db, origin=self)
+        collector.collect(del_query)
+        result = _delete_collected(collector)
+        self._result_cache = None
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class DeletionModel(models.Model):
+    """
+    Base of the models whose deletions are recorded as Deletion tombstones, including the
+    rows removed by cascades. Their managers need to use a DeletionQuerySet.
+    """
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        # same as Model.delete, apart from recording the tombstones
+        if not self._is_pk_set():
+            raise ValueError("{} object can't be deleted because its {} attribute is set to "
+                             "None.".format(self._meta.object_name, self._meta.pk.attname))
+        using = using or router.db_for_write(self.__class__, instance=self)
+        collector = Collector(using=using, origin=self)
+        collector.collect([self], keep_parents=keep_parents)
+        return _delete_collected(collector)
+
+    delete.alters_data = True
@@ -1,14 +1,153 @@
-
+import datetime
 import uuid
 
-from django.db import models
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext as _
 
 from .account import Account
 
+# a running job whose worker has not reported progress for this long was abandoned,
+# for example because the worker was killed
+STALE_TIMEOUT = datetime.timedelta(minutes=10)
+
+
+class ImportBatch(models.Model):
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
 
 class ImportFile(models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     file = models.FileField(upload_to='imports')
     created_at = models.DateTimeField(auto_now_add=True)
     account = models.ForeignKey(Account, models.SET_NULL, null=True)
-    importer = models.PositiveIntegerField(null=True)
+    importer = models.CharField(max_length=64, null=True)
+    batch = models.ForeignKey(ImportBatch, models.CASCADE, null=True, blank=True,
+                              related_name='files')
+
+
+class ImportJobQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(status=ImportJob.PENDING)
+
+    def stale(self, now=None):
+        deadline = (now or timezone.now()) - STALE_TIMEOUT
+        return self.filter(models.Q(heartbeat_at__lt=deadline) | models.Q(heartbeat_at=None),
+                           status=ImportJob.RUNNING)
+
+    def claim(self):
+        """
+        Marks the oldest pending or stale job as running and returns it.
+        The conditional update makes sure two workers never pick up the same job.
+        """
+        now = timezone.now()
+        for job in (self.pending() | self.stale(now)).order_by('created_at'):
+            if self.filter(pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at).update(
+                    status=ImportJob.RUNNING, heartbeat_at=now):
+                job.status = ImportJob.RUNNING
+                job.heartbeat_at = now
+                return job
+        return None
+
+    def queue_statements(self, data, file_id=None, batch_id=None):
+        """
+        Returns the statements job of the file or batch and creates it if there is none
+        yet. Posting an import again leaves a pending, running or finished job alone, a
+        failed one is queued again with the new selection and continues after the rows it
+        already committed.
+        """
+        if file_id:
+            source, sources = {'file_id': file_id}, ImportFile.objects.filter(pk=file_id)
+        else:
+            source, sources = {'batch_id': batch_id}, ImportBatch.objects.filter(pk=batch_id)
+        with transaction.atomic():
+            # concurrent posts of the same import wait for each other here
+            list(sources.select_for_update())
+            job = self.filter(kind=ImportJob.STATEMENTS, **source).order_by('-created_at').first()
+            if job is None:
+                return self.create(kind=ImportJob.STATEMENTS, data=data, **source)
+            if job.status == ImportJob.FAILED:
+                job.status = ImportJob.PENDING
+                job.data = data
+                job.error = ''
+                job.finished_at = None
+                job.save(update_fields=['status', 'data', 'error', 'finished_at'])
+            return job
+
+
+class ImportJob(models.Model):
+    PENDING = 0
+    RUNNING = 1
+    DONE = 2
+    FAILED = 3
+
+    STATUS_OPTIONS = (
+        (PENDING, _('Pending')),
+        (RUNNING, _('Running')),
+        (DONE, _('Done')),
+        (FAILED, _('Failed')),
+    )
+
+    STATEMENTS = 0
+    FIREFLY = 1
+
+    KIND_OPTIONS = (
+        (STATEMENTS, _('Bank statements')),
+        (FIREFLY, _('Firefly III')),
+    )
+
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.ForeignKey(ImportFile, models.CASCADE, null=True, related_name='jobs')
+    batch = models.ForeignKey(ImportBatch, models.CASCADE, null=True, related_name='jobs')
+    kind = models.IntegerField(choices=KIND_OPTIONS)
+    status = models.IntegerField(choices=STATUS_OPTIONS, default=PENDING, db_index=True)
+    data = models.TextField(default='[]')
+    rows_parsed = models.PositiveIntegerField(default=0)
+    rows_committed = models.PositiveIntegerField(default=0)
+    rows_skipped = models.PositiveIntegerField(default=0)
+    # rows of a statements job whose chunk was committed, a resumed job continues after them
+    rows_done = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ImportJobQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return '{} {}'.format(self.get_kind_display(), self.created_at)
+
+    def get_absolute_url(self):
+        return reverse('import_job', args=[self.pk])
+
+    @property
+    def files(self):
+        if self.batch_id:
+            return list(self.batch.files.order_by('created_at'))
+        return [self.file]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def report_progress(self, parsed, committed, skipped, done=None):
+        """
+        Writes the counters with a single UPDATE so that polling clients
+        see the progress without the worker saving the whole row. It also tells
+        claim() that the worker is still alive.
+        """
+        self.rows_parsed = parsed
+        self.rows_committed = committed
+        self.rows_skipped = skipped
+        self.heartbeat_at = timezone.now()
+        fields = {'rows_parsed': parsed, 'rows_committed': committed, 'rows_skipped': skipped,
+                  'heartbeat_at': self.heartbeat_at}
+        if done is not None:
+            self.rows_done = fields['rows_done'] = done
+        ImportJob.objects.filter(pk=self.pk).update(**fields)
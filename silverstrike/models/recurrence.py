@@ -1,4 +1,6 @@
-from datetime import date
+import calendar
+from datetime import date, timedelta
+from itertools import islice
 
 from dateutil.relativedelta import relativedelta
 
@@ -8,11 +10,12 @@ from django.utils.translation import gettext as _
 
 from .account import Account
 from .category import Category
+from .deletion import DeletionModel, DeletionQuerySet
 from .transaction import Split, Transaction
 from ..lib import last_day_of_month
 
 
-class RecurringTransactionManager(models.Manager):
+class RecurringTransactionManager(models.Manager.from_queryset(DeletionQuerySet)):
     def due_in_month(self, month=None):
         if not month:
             month = date.today()
@@ -21,7 +24,7 @@ class RecurringTransactionManager(models.Manager):
         return queryset.exclude(interval=RecurringTransaction.DISABLED)
 
 
-class RecurringTransaction(models.Model):
+class RecurringTransaction(DeletionModel):
     DISABLED = 0
     MONTHLY = 1
     QUARTERLY = 2
@@ -30,6 +33,14 @@ class RecurringTransaction(models.Model):
     WEEKLY = 5
     DAILY = 6
 
+    # months between two dates of the recurrences on a day of the month
+    INTERVAL_MONTHS = {
+        MONTHLY: 1,
+        QUARTERLY: 3,
+        BIANNUALLY: 6,
+        ANNUALLY: 12,
+    }
+
     RECCURENCE_OPTIONS = (
         (DISABLED, _('Disabled')),
         (DAILY, _('Daily')),
@@ -67,7 +78,7 @@ class RecurringTransaction(models.Model):
     interval = models.IntegerField(choices=RECCURENCE_OPTIONS)
     transaction_type = models.IntegerField(choices=Transaction.TRANSACTION_TYPES[:3])
     category = models.ForeignKey(Category, models.SET_NULL, null=True, blank=True)
-    last_modified = models.DateTimeField(auto_now=True)
+    last_modified = models.DateTimeField(auto_now=True, db_index=True)
 
     multiplier = models.PositiveIntegerField(default=1)
     weekend_handling = models.IntegerField(default=SAME_DAY, choices=WEEKEND_SKIPPING)
@@ -87,24 +98,21 @@ class RecurringTransaction(models.Model):
         Calculates the date to the next occurence and optionally saves it.
         It uses the usual_month_day if set for setting the correct day in a monthly recurrence
         """
-        delta = None
         if not date:
             date = self.date
-        if self.interval == self.MONTHLY:
-            delta = relativedelta(months=1)
-        elif self.interval == self.QUARTERLY:
-            delta = relativedelta(months=3)
-        elif self.interval == self.BIANNUALLY:
-            delta = relativedelta(months=6)
-        elif self.interval == self.ANNUALLY:
-            delta = relativedelta(years=1)
-        elif self.interval == self.WEEKLY:
-            delta = relativedelta(weeks=1)
-        elif self.interval == self.DAILY:
-            delta = relativedelta(days=1)
-        else:
+        date = self._next_date(date)
+        if date is None:
+            return
+        if save:
+            self.date = date
+            self.save()
+        return date
+
+    def _next_date(self, date, delta=None):
+        if delta is None:
+            delta = self._delta()
+        if delta is None:
             return
-        delta *= self.multiplier
         while True:
             date += delta
             if self.usual_month_day > 0 and self.interval not in [self.WEEKLY, self.DAILY]:
@@ -120,14 +128,168 @@ class RecurringTransaction(models.Model):
                 if self.weekend_handling == self.SKIP:
                     continue
                 elif self.weekend_handling == self.NEXT_WEEKDAY:
-                    date += relativedelta(days=7 - date.weekday())
+                    date += timedelta(days=7 - date.weekday())
                 elif self.weekend_handling == self.PREVIOUS_WEEKDAY:
-                    date -= relativedelta(days=date.weekday() - 4)
-            if save:
-                self.date = date
-                self.save()
+                    date -= timedelta(days=date.weekday() - 4)
             return date
 
+    def _delta(self):
+        if self.interval == self.MONTHLY:
+            delta = relativedelta(months=1)
+        elif self.interval == self.QUARTERLY:
+            delta = relativedelta(months=3)
+        elif self.interval == self.BIANNUALLY:
+            delta = relativedelta(months=6)
+        elif self.interval == self.ANNUALLY:
+            delta = relativedelta(years=1)
+        elif self.interval == self.WEEKLY:
+            delta = relativedelta(weeks=1)
+        elif self.interval == self.DAILY:
+            delta = relativedelta(days=1)
+        else:
+            return
+        return delta * self.multiplier
+
+    def occurrences(self, dstart=None, dend=None):
+        """
+        Lazily yields the dates from the current one on that successive calls of update_date
+        reach, limited to dstart and dend. Recurrences whose dates follow from the number
+        of steps jump straight to dstart, others step through the dates before it. Stops if
+        a date does not advance, which weekend handling can cause.
+        """
+        if self.interval in (self.DAILY, self.WEEKLY):
+            dates = self._day_occurrences(dstart)
+        elif self._follows_months():
+            dates = self._month_occurrences(dstart)
+        else:
+            dates = self._stepped_occurrences()
+        for occurrence in dates:
+            if dend is not None and occurrence > dend:
+                return
+            if dstart is None or occurrence >= dstart:
+                yield occurrence
+
+    def occurrence(self, k):
+        """
+        Returns the date k calls of update_date reach, None if there is none.
+        """
+        if self.interval in (self.DAILY, self.WEEKLY):
+            return self.date + timedelta(days=k * self.days_between)
+        if k > 0 and self._follows_months() and self.weekend_handling != self.SKIP:
+            return self._month_date(k)
+        return next(islice(self.occurrences(), k, None), None)
+
+    @property
+    def days_between(self):
+        """
+        Days between two dates of a daily or weekly recurrence, None for other intervals.
+        """
+        if self.interval == self.DAILY:
+            return self.multiplier
+        if self.interval == self.WEEKLY:
+            return self.multiplier * 7
+
+    def _step_months(self):
+        return self.multiplier * self.INTERVAL_MONTHS[self.interval]
+
+    def _month_index(self, date):
+        return date.year * 12 + date.month - 1
+
+    def _follows_months(self):
+        """
+        Whether the dates of a recurrence with an interval of months only depend on the
+        number of steps taken: moving a date off the weekend neither leaves its month nor,
+        without a usual_month_day, changes the day the next date starts from.
+        """
+        if self.interval not in self.INTERVAL_MONTHS:
+            return False
+        if self.usual_month_day == 0:
+            return self.weekend_handling in (self.SAME_DAY, self.SKIP)
+        if self.weekend_handling == self.NEXT_WEEKDAY:
+            return self.usual_month_day <= 26
+        if self.weekend_handling == self.PREVIOUS_WEEKDAY:
+            return self.usual_month_day >= 3
+        return True
+
+    def _month_day(self, k):
+        """
+        Returns the day of the month of the k-th date before weekend handling: the
+        usual_month_day, or the day of the current date cut to the shortest month since.
+        """
+        first = self._month_index(self.date)
+        step = self._step_months()
+        if self.usual_month_day > 0:
+            year, month = divmod(first + k * step, 12)
+            return min(self.usual_month_day, calendar.monthrange(year, month + 1)[1])
+        day = self.date.day
+        for j in range(1, k + 1):
+            if day <= 28:
+                break
+            year, month = divmod(first + j * step, 12)
+            day = min(day, calendar.monthrange(year, month + 1)[1])
+        return day
+
+    def _month_date(self, k):
+        """
+        Returns the k-th date of a recurrence that follows the months, None if it is skipped.
+        """
+        year, month = divmod(self._month_index(self.date) + k * self._step_months(), 12)
+        return self._off_weekend(date(year, month + 1, self._month_day(k)))
+
+    def _off_weekend(self, occurrence):
+        if occurrence.weekday() > 4:
+            if self.weekend_handling == self.SKIP:
+                return None
+            elif self.weekend_handling == self.NEXT_WEEKDAY:
+                occurrence += timedelta(days=7 - occurrence.weekday())
+            elif self.weekend_handling == self.PREVIOUS_WEEKDAY:
+                occurrence -= timedelta(days=occurrence.weekday() - 4)
+        return occurrence
+
+    def _day_occurrences(self, dstart):
+        step = self.days_between
+        k = 0
+        if dstart is not None and dstart > self.date:
+            k = -(-(dstart - self.date).days // step)
+        while True:
+            yield self.date + timedelta(days=k * step)
+            k += 1
+
+    def _month_occurrences(self, dstart):
+        step = self._step_months()
+        first = self._month_index(self.date)
+        k = 1
+        if dstart is not None and dstart > self.date:
+            # the k-th date lies in the month first + k * step
+            k = max(1, -(-(self._month_index(dstart) - first) // step))
+        else:
+            yield self.date
+        # from here on each month only needs the day before it, see _month_day
+        day = self._month_day(k - 1)
+        index = first + k * step
+        while True:
+            year, month = divmod(index, 12)
+            length = calendar.monthrange(year, month + 1)[1]
+            if self.usual_month_day > 0:
+                occurrence = date(year, month + 1, min(self.usual_month_day, length))
+            else:
+                day = min(day, length)
+                occurrence = date(year, month + 1, day)
+            occurrence = self._off_weekend(occurrence)
+            if occurrence is not None:
+                yield occurrence
+            index += step
+
+    def _stepped_occurrences(self):
+        delta = self._delta()
+        occurrence = self.date
+        while True:
+            yield occurrence
+            following = self._next_date(occurrence, delta)
+            if following is None or following <= occurrence:
+                return
+            occurrence = following
+
     @property
     def is_disabled(self):
         return self.interval == self.DISABLED
@@ -163,16 +325,10 @@ class RecurringTransaction(models.Model):
 
     @classmethod
     def outstanding_transaction_sum(cls):
-        from .lib import last_day_of_month
         outstanding = 0
         dend = last_day_of_month(date.today())
         transactions = cls.objects.due_in_month().exclude(
             transaction_type=Transaction.TRANSFER)
         for t in transactions:
-            while t.date <= dend:
-                if t.transaction_type == Transaction.WITHDRAW:
-                    outstanding -= t.amount
-                else:
-                    outstanding += t.amount
-                t.update_date()
+            outstanding += t.signed_amount * sum(1 for _date in t.occurrences(dend=dend))
         return outstanding
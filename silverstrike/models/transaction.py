@@ -5,9 +5,10 @@ from django.db import models
 from django.urls import reverse
 
 from .account_type import AccountType
+from .deletion import DeletionModel, DeletionQuerySet
 
 
-class TransactionQuerySet(models.QuerySet):
+class TransactionQuerySet(DeletionQuerySet):
     def last_10(self):
         return self.order_by('-date')[:10]
 
@@ -15,7 +16,7 @@ class TransactionQuerySet(models.QuerySet):
         return self.filter(date__gte=dstart, date__lte=dend)
 
 
-class Transaction(models.Model):
+class Transaction(DeletionModel):
     DEPOSIT = 1
     WITHDRAW = 2
     TRANSFER = 3
@@ -31,13 +32,13 @@ class Transaction(models.Model):
         ordering = ['-date', 'title']
 
     title = models.CharField(max_length=64)
-    date = models.DateField(default=date.today)
+    date = models.DateField(default=date.today, db_index=True)
     notes = models.TextField(blank=True, null=True)
     transaction_type = models.IntegerField(choices=TRANSACTION_TYPES)
     src = models.ForeignKey('Account', models.CASCADE, 'debits')
     dst = models.ForeignKey('Account', models.CASCADE, 'credits')
     amount = models.DecimalField(default=0, max_digits=10, decimal_places=2)
-    last_modified = models.DateTimeField(auto_now=True)
+    last_modified = models.DateTimeField(auto_now=True, db_index=True)
     recurrence = models.ForeignKey('RecurringTransaction', models.SET_NULL,
                                    related_name='recurrences', blank=True, null=True)
 
@@ -75,7 +76,7 @@ class Transaction(models.Model):
         return self.transaction_type == self.DEPOSIT
 
 
-class SplitQuerySet(models.QuerySet):
+class SplitQuerySet(DeletionQuerySet):
     def personal(self):
         return self.filter(account__account_type=AccountType.PERSONAL)
 
@@ -114,7 +115,7 @@ class SplitQuerySet(models.QuerySet):
         return self.filter(transaction__recurrence_id=recurrence_id)
 
 
-class Split(models.Model):
+class Split(DeletionModel):
     account = models.ForeignKey('Account', models.CASCADE, related_name='incoming_transactions')
     opposing_account = models.ForeignKey('Account', models.CASCADE,
                                          related_name='outgoing_transactions')
@@ -125,12 +126,13 @@ class Split(models.Model):
                                  related_name='splits')
     transaction = models.ForeignKey(Transaction, models.CASCADE, related_name='splits',
                                     blank=True, null=True)
-    last_modified = models.DateTimeField(auto_now=True)
+    last_modified = models.DateTimeField(auto_now=True, db_index=True)
 
     objects = SplitQuerySet.as_manager()
 
     class Meta:
         ordering = ['-date', 'title']
+        indexes = [models.Index(fields=['account', 'date'])]
 
     def __str__(self):
         return self.title
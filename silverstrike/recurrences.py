@@ -0,0 +1,57 @@
+"""
+Enters the due occurrences of all recurrences as transactions in one batch.
+
+Every enabled recurrence whose date is not after the given day gets one transaction
+with two splits per occurrence up to that day, and its date is moved to the first
+occurrence after it. Occurrences that already have a transaction of the recurrence on
+their date are left out, so running the job again, or after entering some occurrences
+by hand, does not duplicate anything.
+"""
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from silverstrike.models import RecurringTransaction, Split, Transaction
+
+
+def process_due_recurrences(until=None):
+    """
+    Materializes all occurrences due on or before until, today by default. Returns the
+    number of created transactions and of recurrences whose date was moved.
+    """
+    until = until or datetime.date.today()
+    with transaction.atomic():
+        # a concurrent run waits here and then only sees the recurrences this one left due
+        recurrences = list(RecurringTransaction.objects.select_for_update().exclude(
+            interval=RecurringTransaction.DISABLED).filter(date__lte=until).order_by('id'))
+        entered = set(Transaction.objects.filter(recurrence__in=recurrences, date__lte=until)
+                      .order_by().values_list('recurrence_id', 'date'))
+        transactions = []
+        advanced = []
+        now = timezone.now()
+        for recurrence in recurrences:
+            following = None
+            for occurrence in recurrence.occurrences():
+                if occurrence > until:
+                    following = occurrence
+                    break
+                if (recurrence.id, occurrence) not in entered:
+                    transactions.append(Transaction(
+                        title=recurrence.title, date=occurrence, src_id=recurrence.src_id,
+                        dst_id=recurrence.dst_id, amount=recurrence.amount,
+                        transaction_type=recurrence.transaction_type, recurrence=recurrence))
+            if following is not None:
+                recurrence.date = following
+                # bulk_update does not touch auto_now fields, delta syncs rely on them
+                recurrence.last_modified = now
+                advanced.append(recurrence)
+        transactions = Transaction.objects.bulk_create(transactions)
+        Split.objects.bulk_create([
+            Split(title=t.title, date=t.date, transaction=t, category_id=t.recurrence.category_id,
+                  account_id=account_id, opposing_account_id=opposing_id, amount=amount)
+            for t in transactions
+            for account_id, opposing_id, amount in ((t.src_id, t.dst_id, -t.amount),
+                                                    (t.dst_id, t.src_id, t.amount))])
+        RecurringTransaction.objects.bulk_update(advanced, ['date', 'last_modified'])
+    return len(transactions), len(advanced)
@@ -0,0 +1,78 @@
+import uuid
+
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+from rest_framework import authentication
+
+# seconds a successful credential check is reused, saving a user or changing a token
+# invalidates it earlier in every process that shares the cache
+CACHE_TIMEOUT = 60
+
+GENERATION_KEY = 'silverstrike.auth.generation'
+
+
+def _generation():
+    """
+    Returns the current generation of all cached credential checks, entries of other
+    generations are stale.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not cache.add(GENERATION_KEY, generation, None):
+            generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate_credentials():
+    """
+    Drops all cached credential checks. The user of an Authorization header is only known
+    after checking it, so a change to any user's credentials starts a new generation.
+    """
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+class CachedAuthenticationMixin(object):
+    """
+    Reuses the result of a successful authenticate for the same Authorization header.
+    Entries are keyed by an HMAC of the header, so the cache never holds credentials.
+    """
+    keyword = None
+
+    def _cache_key(self, header):
+        digest = salted_hmac('silverstrike.rest.authentication.' + type(self).__name__, header,
+                             algorithm='sha256')
+        return 'silverstrike.auth.{}'.format(digest.hexdigest())
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request)
+        parts = header.split()
+        if not parts or parts[0].lower() != self.keyword.lower().encode():
+            return None
+        key = self._cache_key(header)
+        # taken before the check, a change to the credentials during it must not be cached
+        generation = _generation()
+        cached = cache.get(key)
+        if cached is not None:
+            user, auth, cached_generation = cached
+            if cached_generation == generation:
+                return user, auth
+        result = super(CachedAuthenticationMixin, self).authenticate(request)
+        if result is not None and cache.get(GENERATION_KEY) == generation:
+            cache.set(key, result + (generation,), CACHE_TIMEOUT)
+        return result
+
+
+class CachedBasicAuthentication(CachedAuthenticationMixin, authentication.BasicAuthentication):
+    """
+    BasicAuthentication that hashes the password only once per CACHE_TIMEOUT.
+    """
+    keyword = 'Basic'
+
+
+class CachedTokenAuthentication(CachedAuthenticationMixin, authentication.TokenAuthentication):
+    """
+    TokenAuthentication that looks up the token only once per CACHE_TIMEOUT.
+    """
+    keyword = 'Token'
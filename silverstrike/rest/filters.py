@@ -0,0 +1,113 @@
+from rest_framework import filters, serializers
+
+from silverstrike.models import Split, Transaction
+
+
+def _lookups(request, params):
+    """
+    Returns the queryset lookups for the query parameters of request named in params,
+    a dictionary of parameter names to a lookup and the field parsing the value.
+    """
+    lookups = {}
+    for name, (lookup, field) in params.items():
+        value = request.query_params.get(name)
+        if value in (None, ''):
+            continue
+        try:
+            lookups[lookup] = field.run_validation(value)
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({name: e.detail})
+    return lookups
+
+
+def _ordering(request, fields, default):
+    """
+    Returns the ordering given by the ordering parameter, ending with the primary key so
+    that pages stay stable.
+    """
+    value = request.query_params.get('ordering')
+    if not value:
+        return default
+    ordering = [term.strip() for term in value.split(',') if term.strip()]
+    if any(term.lstrip('-') not in fields for term in ordering):
+        raise serializers.ValidationError(
+            {'ordering': ['Can only order by {}'.format(', '.join(fields))]})
+    return ordering + ['id']
+
+
+def _date():
+    return serializers.DateField()
+
+
+def _id():
+    return serializers.IntegerField(min_value=1)
+
+
+def _amount():
+    return serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+def _transaction_type():
+    return serializers.ChoiceField(Transaction.TRANSACTION_TYPES)
+
+
+class TransactionFilter(filters.BaseFilterBackend):
+    """
+    Filters transactions by their own columns and by the columns of their splits.
+    """
+    params = {
+        'date_from': ('date__gte', _date()),
+        'date_to': ('date__lte', _date()),
+        'transaction_type': ('transaction_type', _transaction_type()),
+        'recurrence': ('recurrence_id', _id()),
+        'amount_min': ('amount__gte', _amount()),
+        'amount_max': ('amount__lte', _amount()),
+    }
+    split_params = {
+        'account': ('account_id', _id()),
+        'opposing_account': ('opposing_account_id', _id()),
+        'category': ('category_id', _id()),
+    }
+    ordering_fields = ('date', 'title', 'amount', 'id')
+    ordering = ['-date', 'title', 'id']
+
+    def filter_queryset(self, request, queryset, view):
+        queryset = queryset.filter(**_lookups(request, self.params))
+        split_lookups = _lookups(request, self.split_params)
+        if split_lookups:
+            queryset = queryset.filter(id__in=Split.objects.filter(
+                **split_lookups).values('transaction_id'))
+        return queryset.order_by(*_ordering(request, self.ordering_fields, self.ordering))
+
+
+class SplitFilter(filters.BaseFilterBackend):
+    """
+    Filters the splits of an account.
+    """
+    params = {
+        'date_from': ('date__gte', _date()),
+        'date_to': ('date__lte', _date()),
+        'opposing_account': ('opposing_account_id', _id()),
+        'category': ('category_id', _id()),
+        'transaction_type': ('transaction__transaction_type', _transaction_type()),
+        'recurrence': ('transaction__recurrence_id', _id()),
+        'amount_min': ('amount__gte', _amount()),
+        'amount_max': ('amount__lte', _amount()),
+    }
+    ordering_fields = ('date', 'title', 'amount', 'id')
+    # served by the index on account and date
+    ordering = ['-date', '-id']
+
+    def filter_queryset(self, request, queryset, view):
+        queryset = queryset.filter(**_lookups(request, self.params))
+        return queryset.order_by(*_ordering(request, self.ordering_fields, self.ordering))
+
+
+class AggregateFilter(object):
+    """
+    Parses the filters of aggregates over the splits of personal accounts.
+    """
+    params = dict(SplitFilter.params, account=('account_id', _id()))
+
+    def lookups(self, request):
+        return _lookups(request, self.params)
@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+from django.core.paginator import Paginator
+from django.db.models import Count, Sum
+from django.utils.functional import cached_property
+
+from rest_framework import pagination, serializers
+
+
+class AmountPaginator(Paginator):
+    """
+    Counts the rows and sums up their amounts with a single query.
+    """
+    @cached_property
+    def count(self):
+        totals = self.object_list.aggregate(count=Count('pk'), total=Sum('amount'))
+        self.total = totals['total'] or Decimal(0)
+        return totals['count']
+
+
+class AmountPagination(pagination.PageNumberPagination):
+    """
+    Pages of at most max_page_size rows, chosen with the page_size parameter. Next to the
+    count, responses carry the total amount of all matching rows and of the current page.
+    """
+    django_paginator_class = AmountPaginator
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_paginated_response(self, data):
+        response = super(AmountPagination, self).get_paginated_response(data)
+        amount = serializers.DecimalField(max_digits=None, decimal_places=2)
+        response.data['total'] = amount.to_representation(self.page.paginator.total)
+        # pages hold .values() rows
+        response.data['page_total'] = amount.to_representation(
+            sum((row['amount'] for row in self.page), Decimal(0)))
+        return response
@@ -0,0 +1,126 @@
+import datetime
+import functools
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+
+from rest_framework import ISO_8601, fields, relations, serializers
+from rest_framework.settings import api_settings
+
+
+# fields whose database values already are their representation
+PLAIN_FIELDS = (fields.BooleanField, fields.CharField, fields.ChoiceField, fields.IntegerField,
+                relations.PrimaryKeyRelatedField)
+
+
+def _iso_datetime(value, tz):
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _converter(field):
+    """
+    Returns the function turning a database value into the representation of field, None
+    if the value is its own representation or datetime.datetime for datetimes, which
+    depend on the current timezone. Configurations not handled here use DRF's
+    to_representation.
+    """
+    if isinstance(field, PLAIN_FIELDS):
+        return None
+    if isinstance(field, fields.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if settings.USE_TZ and output_format and output_format.lower() == ISO_8601:
+            return datetime.datetime
+    elif isinstance(field, fields.DateField):
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format and output_format.lower() == ISO_8601:
+            return datetime.date.isoformat
+    elif isinstance(field, fields.DecimalField):
+        # the database returns values with decimal_places digits already
+        coerce = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if coerce and not field.localize and field.decimal_places is not None:
+            return '{{:.{}f}}'.format(field.decimal_places).format
+    return field.to_representation
+
+
+class ValuesReader(object):
+    """
+    Builds the representation a ModelSerializer gives for a list from .values() rows.
+
+    The column and the conversion of every field are worked out once, so reading a row
+    costs a dictionary lookup per field instead of a model instance and a walk over the
+    serializer fields. Nested list serializers are read with one query per page.
+    """
+    def __init__(self, serializer_class):
+        self.model = serializer_class.Meta.model
+        self.names = []
+        self.fields = {}
+        self.children = {}
+        for name, field in serializer_class().fields.items():
+            self.names.append(name)
+            if isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(field.source)
+                self.children[name] = (ValuesReader(type(field.child)), relation.field.attname)
+                continue
+            column = self.model._meta.get_field(field.source).attname
+            self.fields[name] = (column, _converter(field))
+
+    def parse_fields(self, value):
+        """
+        Returns the names listed in a ?fields= parameter or all names if it is empty.
+        """
+        if not value:
+            return self.names
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.names]
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': ['Unknown fields {}'.format(', '.join(unknown))]})
+        return names
+
+    def columns(self, names):
+        """
+        Returns the columns rows need to contain to read the fields names.
+        """
+        return ['id'] + [self.fields[name][0] for name in names
+                         if name in self.fields and self.fields[name][0] != 'id']
+
+    def _read_children(self, name, rows):
+        reader, column = self.children[name]
+        children = reader.model.objects.filter(**{column + '__in': [row['id'] for row in rows]})
+        columns = dict.fromkeys(reader.columns(reader.names) + [column])
+        children = list(children.order_by('id').values(*columns))
+        grouped = defaultdict(list)
+        for child, item in zip(children, reader.read(children, reader.names)):
+            grouped[child[column]].append(item)
+        return grouped
+
+    def read(self, rows, names):
+        """
+        Returns the representation of the fields names of rows, which contain the columns
+        returned by columns(names).
+        """
+        rows = list(rows)
+        children = {name: self._read_children(name, rows)
+                    for name in names if name in self.children}
+        tz = timezone.get_current_timezone()
+        specs = []
+        for name in names:
+            column, convert = self.fields.get(name, (None, None))
+            if convert is datetime.datetime:
+                convert = functools.partial(_iso_datetime, tz=tz)
+            specs.append((name, column, convert))
+        items = []
+        for row in rows:
+            item = {}
+            for name, column, convert in specs:
+                if column is None:
+                    item[name] = children[name][row['id']]
+                    continue
+                value = row[column]
+                item[name] = value if convert is None or value is None else convert(value)
+            items.append(item)
+        return items
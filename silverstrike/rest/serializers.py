@@ -1,3 +1,6 @@
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
 from rest_framework import serializers
 
 from silverstrike.models import (Account, AccountType, Category,
@@ -28,7 +31,22 @@ class RecurrenceNameSerializer(serializers.ModelSerializer):
         fields = ('id', 'title')
 
 
+class PrefetchedRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Takes related objects from the dictionaries in context['related'] when a view loaded
+    them upfront and falls back to a query for everything else.
+    """
+    def to_internal_value(self, data):
+        objects = self.context.get('related', {}).get(self.get_queryset().model, {})
+        try:
+            return objects[int(data)]
+        except (KeyError, TypeError, ValueError):
+            return super(PrefetchedRelatedField, self).to_internal_value(data)
+
+
 class SplitSerializer(serializers.ModelSerializer):
+    serializer_related_field = PrefetchedRelatedField
+
     class Meta:
         model = Split
         fields = ('id', 'title', 'date', 'account', 'opposing_account',
@@ -39,49 +57,135 @@ class SplitSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(required=False)
 
 
+def _transaction_fields(validated_data):
+    """
+    Fills in src, dst and amount of a transaction from its splits. The money leaves the
+    account of the first negative split towards that split's opposing account.
+    """
+    outgoing = [split for split in validated_data['splits'] if split['amount'] < 0]
+    src = outgoing[0]['account']
+    fields = {key: value for key, value in validated_data.items() if key != 'splits'}
+    fields['src'] = src
+    fields['dst'] = outgoing[0]['opposing_account']
+    fields['amount'] = -sum(split['amount'] for split in outgoing if split['account'] == src)
+    return fields
+
+
+# fields of a split that can be changed through a transaction
+SPLIT_FIELDS = ('title', 'date', 'account', 'opposing_account', 'amount', 'category')
+
+
+def _check_amounts(amounts):
+    if sum(amounts) != 0:
+        raise serializers.ValidationError("The sum of splits does not balance")
+    if not any(amount < 0 for amount in amounts):
+        raise serializers.ValidationError("A transaction needs a split with a negative amount")
+
+
+def _split_fields(split, transaction):
+    fields = {key: value for key, value in split.items() if key != 'id'}
+    fields['transaction'] = transaction
+    return fields
+
+
+class TransactionListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        """
+        Inserts all transactions with a single bulk_create and then all of their splits
+        with another one. Callers should wrap this in a database transaction.
+        """
+        transactions = Transaction.objects.bulk_create(
+            [Transaction(**_transaction_fields(data)) for data in validated_data])
+        Split.objects.bulk_create(
+            [Split(**_split_fields(split, transaction))
+             for transaction, data in zip(transactions, validated_data)
+             for split in data['splits']])
+        return transactions
+
+
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = ('id', 'title', 'date', 'transaction_type', 'splits', 'last_modified')
         read_only_fields = ('last_modified',)
+        list_serializer_class = TransactionListSerializer
 
     splits = SplitSerializer(many=True)
 
     def validate(self, data):
-        split_sum = sum([split['amount'] for split in data['splits']])
-        if split_sum != 0:
-            raise serializers.ValidationError("The sum of splits does not balance")
+        # a partial update may leave amounts out, update checks those against the stored splits
+        if 'splits' in data and all('amount' in split for split in data['splits']):
+            _check_amounts([split['amount'] for split in data['splits']])
         return data
 
     def create(self, validated_data):
-        split_data = validated_data.pop('splits')
-        transaction = Transaction.objects.create(**validated_data)
+        transaction = Transaction.objects.create(**_transaction_fields(validated_data))
 
-        for split in split_data:
-            Split.objects.create(transaction=transaction, **split)
+        for split in validated_data['splits']:
+            Split.objects.create(**_split_fields(split, transaction))
         return transaction
 
     def update(self, instance, validated_data):
-        # update transaction
-        instance.title = validated_data.get('title', instance.title)
-        instance.date = validated_data.get('date', instance.date)
-        instance.transaction_type = validated_data.get('transaction_type',
-                                                       instance.transaction_type)
-        instance.save()
-        # update splits
-        for split in validated_data.get('splits'):
-            split_object = Split.objects.get(id=split.get('id'))
-
-            split_object.title = split.get('title', split_object.title)
-            split_object.date = split.get('date', split_object.date)
-            split_object.account = split.get('account', split_object.account)
-            split_object.opposing_account = split.get('opposing_account',
-                                                      split_object.opposing_account)
-            split_object.amount = split.get('amount', split_object.amount)
-            split_object.category = split.get('category', split_object.category)
-            split_object.save()
+        split_data = validated_data.get('splits')
+        if split_data is not None:
+            ids = [split['id'] for split in split_data if 'id' in split]
+            splits = instance.splits.in_bulk(ids)
+            unknown = sorted(set(ids) - set(splits))
+            if unknown:
+                raise serializers.ValidationError({'splits': [
+                    'Splits {} do not belong to this transaction'.format(unknown)]})
+            incomplete = [split for split in split_data if 'id' not in split and
+                          not {'account', 'opposing_account', 'amount'} <= set(split)]
+            if incomplete:
+                raise serializers.ValidationError({'splits': [
+                    'New splits need an account, an opposing account and an amount']})
+            # a partial update only sends the changed fields of a split
+            _check_amounts([split['amount'] if 'amount' in split else splits[split['id']].amount
+                            for split in split_data])
+        with db_transaction.atomic():
+            # update transaction
+            instance.title = validated_data.get('title', instance.title)
+            instance.date = validated_data.get('date', instance.date)
+            instance.transaction_type = validated_data.get('transaction_type',
+                                                           instance.transaction_type)
+            if split_data is not None:
+                split_objects = self._update_splits(instance, split_data, splits)
+                # computed from the updated splits, the payload may leave accounts out
+                outgoing = [split for split in split_objects if split.amount < 0]
+                instance.src_id = outgoing[0].account_id
+                instance.dst_id = outgoing[0].opposing_account_id
+                instance.amount = -sum(split.amount for split in outgoing
+                                       if split.account_id == instance.src_id)
+            instance.save()
         return instance
 
+    def _update_splits(self, instance, split_data, splits):
+        """
+        Makes the splits of instance match split_data: splits with an id are changed with
+        one bulk_update, splits without one are created and splits missing from the
+        payload are deleted. Returns the resulting splits in payload order.
+        """
+        now = timezone.now()
+        changed = []
+        created = []
+        split_objects = []
+        for split in split_data:
+            if 'id' not in split:
+                split_object = Split(**_split_fields(split, instance))
+                created.append(split_object)
+            else:
+                split_object = splits[split['id']]
+                for field in SPLIT_FIELDS:
+                    if field in split:
+                        setattr(split_object, field, split[field])
+                split_object.last_modified = now
+                changed.append(split_object)
+            split_objects.append(split_object)
+        instance.splits.exclude(id__in=list(splits)).delete()
+        Split.objects.bulk_update(changed, SPLIT_FIELDS + ('last_modified',))
+        Split.objects.bulk_create(created)
+        return split_objects
+
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -93,6 +197,6 @@ class CategorySerializer(serializers.ModelSerializer):
 class RecurringTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecurringTransaction
-        fields = ('id', 'title', 'src', 'dst', 'amount', 'date',
-                  'recurrence', 'category', 'transaction_type', 'last_modified')
+        fields = ('id', 'title', 'src', 'dst', 'amount', 'date', 'interval', 'multiplier',
+                  'weekend_handling', 'category', 'transaction_type', 'last_modified')
         read_only_fields = ('last_modified',)
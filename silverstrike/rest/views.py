@@ -1,36 +1,139 @@
-from rest_framework import views, viewsets
+from collections import defaultdict
+
+from django.db import transaction as db_transaction
+from django.db.models import Prefetch, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from rest_framework import status, views, viewsets
 from rest_framework.decorators import action
+from rest_framework.fields import DecimalField
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from silverstrike.models import (Account, AccountType, Category,
+from silverstrike import aggregates, export
+from silverstrike.models import (Account, AccountType, Category, Deletion,
                                  RecurringTransaction, Split, Transaction)
-from silverstrike.rest import serializers
+from silverstrike.recurrences import process_due_recurrences
+from silverstrike.rest import filters, serializers
+from silverstrike.rest.pagination import AmountPagination
 from silverstrike.rest.permissions import ProtectSystemAccount
+from silverstrike.rest.readers import ValuesReader
 from silverstrike.rest.serializers import (AccountSerializer, CategorySerializer,
                                            RecurringTransactionSerializer,
                                            SplitSerializer, TransactionSerializer)
 
 
-class AccountViewSet(viewsets.ModelViewSet):
-    queryset = Account.objects.all()
+# most transactions accepted by a single bulk request
+BULK_LIMIT = 1000
+
+
+def _ids(values):
+    return {int(value) for value in values
+            if isinstance(value, int) or (isinstance(value, str) and value.isdigit())}
+
+
+def _related_objects(data):
+    """
+    Loads the accounts, categories and transactions referenced by the splits of one or more
+    transactions with one query each, instead of one query per value during validation.
+    """
+    if not isinstance(data, list):
+        data = [data]
+    splits = [split for item in data if isinstance(item, dict)
+              and isinstance(item.get('splits'), list)
+              for split in item['splits'] if isinstance(split, dict)]
+    account_ids = _ids([split.get(key) for split in splits
+                        for key in ('account', 'opposing_account')])
+    category_ids = _ids([split.get('category') for split in splits])
+    transaction_ids = _ids([split.get('transaction') for split in splits])
+    return {
+        Account: Account.objects.in_bulk(account_ids),
+        Category: Category.objects.in_bulk(category_ids),
+        Transaction: Transaction.objects.in_bulk(transaction_ids),
+    }
+
+
+class ValuesListMixin(object):
+    """
+    Lists rows with a ValuesReader instead of the serializer. The fields parameter
+    limits the response to a comma separated list of fields.
+    """
+    reader = None
+    # columns fetched for every row, e.g. for the page totals
+    values_columns = ['id']
+
+    def list(self, request, *args, **kwargs):
+        names = self.reader.parse_fields(request.query_params.get('fields'))
+        columns = dict.fromkeys(self.reader.columns(names) + self.values_columns)
+        rows = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*columns)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.reader.read(page, names))
+        return Response(self.reader.read(rows, names))
+
+
+class AccountViewSet(ValuesListMixin, viewsets.ModelViewSet):
+    queryset = Account.objects.order_by('-active', 'name', 'id')
     serializer_class = AccountSerializer
     permission_classes = (ProtectSystemAccount,)
+    reader = ValuesReader(AccountSerializer)
+    split_reader = ValuesReader(SplitSerializer)
 
     @action(detail=True)
     def transactions(self, request, pk=None):
         account = self.get_object()
-        transactions = Split.objects.filter(account=account)
-        page = self.paginate_queryset(transactions)
-        if page is not None:
-            serializer = SplitSerializer(page, many=True, context={'request': request})
-            return Response(serializer.data)
-        serializer = SplitSerializer(transactions, many=True, context={'request': request})
-        return Response(serializer.data)
+        names = self.split_reader.parse_fields(request.query_params.get('fields'))
+        transactions = filters.SplitFilter().filter_queryset(
+            request, Split.objects.filter(account=account), self)
+        columns = dict.fromkeys(self.split_reader.columns(names) + ['amount'])
+        paginator = AmountPagination()
+        page = paginator.paginate_queryset(transactions.values(*columns), request, view=self)
+        return paginator.get_paginated_response(self.split_reader.read(page, names))
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
-    queryset = Transaction.objects.all()
+class TransactionViewSet(ValuesListMixin, viewsets.ModelViewSet):
+    # the splits of a whole page are fetched with one query
+    queryset = Transaction.objects.order_by('-date', 'title', 'id').prefetch_related(
+        Prefetch('splits', queryset=Split.objects.order_by('id')))
     serializer_class = TransactionSerializer
+    filter_backends = (filters.TransactionFilter,)
+    pagination_class = AmountPagination
+    reader = ValuesReader(TransactionSerializer)
+    values_columns = ['id', 'amount']
+
+    def get_serializer_context(self):
+        context = super(TransactionViewSet, self).get_serializer_context()
+        if self.request is not None and self.request.method in ('POST', 'PUT', 'PATCH'):
+            context['related'] = _related_objects(self.request.data)
+        return context
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Creates a list of transactions at once. Either all of them are created or, if any
+        is invalid, none is and the errors are returned per item.
+        """
+        serializer = self.get_serializer(data=request.data, many=True, max_length=BULK_LIMIT)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, list):
+                errors = dict(enumerate(errors))
+            if api_settings.NON_FIELD_ERRORS_KEY in errors:
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'results': [{'errors': errors.get(i, {})}
+                                         for i in range(len(request.data))]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        with db_transaction.atomic():
+            transactions = serializer.save()
+        splits = defaultdict(list)
+        for transaction_id, split_id in Split.objects.filter(
+                transaction__in=transactions).order_by('id').values_list('transaction_id', 'id'):
+            splits[transaction_id].append(split_id)
+        return Response({'results': [{'id': transaction.id, 'splits': splits[transaction.id]}
+                                     for transaction in transactions]},
+                        status=status.HTTP_201_CREATED)
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -40,9 +143,27 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 
 class RecurringTransactionsViewset(viewsets.ModelViewSet):
-    queryset = RecurringTransaction.objects.all()
+    queryset = RecurringTransaction.objects.order_by('date', 'id')
     serializer_class = RecurringTransactionSerializer
 
+    @action(detail=False, methods=['post'])
+    def process(self, request):
+        """
+        Enters all occurrences due up to the optional until date, today by default, as
+        transactions and moves the recurrences to their next occurrence.
+        """
+        until = None
+        if request.data.get('until'):
+            try:
+                until = parse_date(str(request.data['until']))
+            except ValueError:
+                pass
+            if until is None:
+                return Response({'until': ['Not a valid date']},
+                                status=status.HTTP_400_BAD_REQUEST)
+        created, advanced = process_due_recurrences(until)
+        return Response({'transactions': created, 'recurrences': advanced})
+
 
 class AccountNameView(views.APIView):
     def get(self, request, format=None):
@@ -69,3 +190,119 @@ class ForeignAccountsView(views.APIView):
         serializer = serializers.AccountSerializer(
             Account.objects.filter(account_type=AccountType.FOREIGN), many=True)
         return Response(serializer.data)
+
+
+def _changed_since(since):
+    """
+    Tells whether anything changed after since with a single query of indexed range scans.
+    """
+    querysets = [model.objects.filter(last_modified__gt=since).values('pk')
+                 for model in (Account, Category, Transaction, Split, RecurringTransaction)]
+    querysets.append(Deletion.objects.filter(deleted_at__gt=since).values('pk'))
+    return querysets[0].union(*querysets[1:], all=True).exists()
+
+
+def _cursor(request):
+    """
+    Returns the datetime of the ?cursor= of a request, None if there is none.
+    Raises ValueError if it is not a valid cursor.
+    """
+    if not request.query_params.get('cursor'):
+        return None
+    try:
+        since = export.parse_watermark(request.query_params['cursor'])
+    except ValueError:
+        since = None
+    if since is None:
+        raise ValueError('Not a valid cursor')
+    return since
+
+
+class ChangesView(views.APIView):
+    """
+    Returns what was created, changed or deleted after the cursor of an earlier response,
+    or everything if no cursor is given. Clients apply the deletions first. Changes made
+    shortly before the cursor are returned again, see export.CURSOR_OVERLAP.
+    """
+    def get(self, request, format=None):
+        cursor = export.next_cursor(timezone.now())
+        try:
+            since = _cursor(request)
+        except ValueError as e:
+            return Response({'cursor': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        data = {'cursor': export.format_cursor(cursor), 'accounts': [],
+                'categories': [], 'transactions': [], 'recurrences': [], 'deleted': []}
+        if since is not None and not _changed_since(since):
+            return Response(data)
+
+        accounts = Account.objects.order_by('id')
+        categories = Category.objects.order_by('id')
+        transactions = TransactionViewSet.queryset.order_by('id')
+        recurrences = RecurringTransaction.objects.order_by('id')
+        if since is not None:
+            accounts = accounts.filter(last_modified__gt=since)
+            categories = categories.filter(last_modified__gt=since)
+            # splits changed on their own, e.g. by category rules, resend their transaction
+            transactions = transactions.filter(
+                Q(last_modified__gt=since) |
+                Q(id__in=Split.objects.filter(last_modified__gt=since).values('transaction_id')))
+            recurrences = recurrences.filter(last_modified__gt=since)
+            data['deleted'] = list(export.tombstones(since))
+        data['accounts'] = AccountSerializer(accounts, many=True).data
+        data['categories'] = CategorySerializer(categories, many=True).data
+        data['transactions'] = TransactionSerializer(transactions, many=True).data
+        data['recurrences'] = RecurringTransactionSerializer(recurrences, many=True).data
+        return Response(data)
+
+
+class ChangesExportView(views.APIView):
+    """
+    Streams the transactions and splits changed after the cursor of an earlier response as
+    JSON lines, see export.delta_records. The cursor to pass next time is returned in the
+    X-Cursor header.
+    """
+    def get(self, request, format=None):
+        now = timezone.now()
+        try:
+            since = _cursor(request)
+        except ValueError as e:
+            return Response({'cursor': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(export.delta_chunks(since, now),
+                                         content_type='application/x-ndjson')
+        response['X-Cursor'] = export.format_cursor(export.next_cursor(now))
+        return response
+
+
+class AggregateView(views.APIView):
+    """
+    Groups the splits of personal accounts by the comma separated group_by keys and
+    returns a metric of their amounts per group. Takes the filters of account transactions
+    plus account.
+    """
+    def get(self, request, format=None):
+        group_by = [name.strip() for name in request.query_params.get('group_by', '').split(',')
+                    if name.strip()]
+        unknown = [name for name in group_by if name not in aggregates.GROUPS]
+        if unknown or len(set(group_by)) != len(group_by):
+            return Response({'group_by': ['Can only group by {}'.format(
+                ', '.join(aggregates.GROUPS))]}, status=status.HTTP_400_BAD_REQUEST)
+        metric = request.query_params.get('metric', 'sum')
+        if metric not in aggregates.METRICS:
+            return Response({'metric': ['Metric must be one of {}'.format(
+                ', '.join(aggregates.METRICS))]}, status=status.HTTP_400_BAD_REQUEST)
+        lookups = filters.AggregateFilter().lookups(request)
+        splits = Split.objects.personal().filter(**lookups)
+        results = aggregates.cached_aggregate(
+            splits, group_by, metric, sorted(lookups.items()))
+        amount = DecimalField(max_digits=None, decimal_places=2)
+        data = []
+        for result in results:
+            item = {name: result[name] for name in group_by}
+            for name in ('month', 'week'):
+                if name in item:
+                    item[name] = item[name].isoformat()
+            item['value'] = result['value']
+            if metric != 'count' and item['value'] is not None:
+                item['value'] = amount.to_representation(item['value'])
+            data.append(item)
+        return Response({'group_by': group_by, 'metric': metric, 'results': data})
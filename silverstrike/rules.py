@@ -0,0 +1,171 @@
+import heapq
+import re
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from silverstrike import models
+from silverstrike.lib import BATCH_SIZE
+
+
+# flags of a pattern without inline flags, see _combinable
+_PLAIN_FLAGS = re.compile('').flags
+
+
+def _combinable(pattern):
+    """
+    Whether a pattern keeps its meaning inside the combined regex. Groups would be
+    renumbered and could clash by name, inline flags are only allowed at the start.
+    """
+    regex = re.compile(pattern)
+    return regex.groups == 0 and regex.flags == _PLAIN_FLAGS
+
+
+def _normalize_payee(payee):
+    return (payee or '').strip().lower()
+
+
+def _normalize_iban(iban):
+    return (iban or '').replace(' ', '').upper()
+
+
+class RuleSet(object):
+    """
+    CategoryRules compiled into one matcher.
+
+    Every rule is indexed by its most selective condition: rules with a payee or an IBAN
+    are found with a dictionary lookup, the patterns of all other rules are combined into
+    a single regular expression. Matching a statement therefore costs two lookups and one
+    regex match instead of evaluating every rule. Patterns with groups or inline flags
+    cannot be combined and are searched one by one.
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._regexes = [re.compile(rule.pattern, re.IGNORECASE) if rule.pattern else None
+                         for rule in self.rules]
+        self._payees = defaultdict(list)
+        self._ibans = defaultdict(list)
+        self._patterns = []
+        self._separate = []
+        self._unconditional = []
+        for i, rule in enumerate(self.rules):
+            if rule.payee:
+                self._payees[_normalize_payee(rule.payee)].append(i)
+            elif rule.iban:
+                self._ibans[_normalize_iban(rule.iban)].append(i)
+            elif rule.pattern and _combinable(rule.pattern):
+                self._patterns.append(i)
+            elif rule.pattern:
+                self._separate.append(i)
+            else:
+                self._unconditional.append(i)
+        self._combined = {}
+
+    @classmethod
+    def load(cls):
+        return cls(models.CategoryRule.objects.active())
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _combined_from(self, start):
+        """
+        Returns a regex of the patterns from self._patterns[start] on.
+        Alternatives are tried in order and each one may match anywhere in the text,
+        so the group that matches belongs to the rule with the highest priority.
+        Returns None if the patterns cannot be compiled together.
+        """
+        if start not in self._combined:
+            try:
+                self._combined[start] = re.compile('|'.join(
+                    '.*?(?P<r{}>{})'.format(i, self.rules[i].pattern)
+                    for i in self._patterns[start:]), re.IGNORECASE | re.DOTALL)
+            except re.error:
+                self._combined[start] = None
+        return self._combined[start]
+
+    def _pattern_candidates(self, text):
+        start = 0
+        while start < len(self._patterns):
+            combined = self._combined_from(start)
+            if combined is None:
+                # _matches searches the remaining patterns one by one
+                yield from self._patterns[start:]
+                return
+            match = combined.match(text)
+            if not match:
+                return
+            index = int(match.lastgroup[1:])
+            yield index
+            start = self._patterns.index(index, start) + 1
+
+    def _matches(self, i, payee, iban, text, amount):
+        rule = self.rules[i]
+        if rule.payee and _normalize_payee(rule.payee) != payee:
+            return False
+        if rule.iban and _normalize_iban(rule.iban) != iban:
+            return False
+        if rule.min_amount is not None and amount < rule.min_amount:
+            return False
+        if rule.max_amount is not None and amount > rule.max_amount:
+            return False
+        return not rule.pattern or bool(self._regexes[i].search(text))
+
+    def match(self, payee='', iban='', text='', amount=0):
+        """
+        Returns the first rule matching the statement or None.
+        """
+        payee = _normalize_payee(payee)
+        iban = _normalize_iban(iban)
+        text = text or ''
+        candidates = heapq.merge(
+            self._payees.get(payee, []),
+            self._ibans.get(iban, []) if iban else [],
+            self._pattern_candidates(text),
+            self._separate,
+            self._unconditional)
+        for i in candidates:
+            if self._matches(i, payee, iban, text, amount):
+                return self.rules[i]
+        return None
+
+
+def apply_to_splits(rules, overwrite=False, dry_run=False, chunk_size=2000):
+    """
+    Runs the rules over the personal side of all existing income and expenses.
+    Only empty categories and recurrences are filled unless overwrite is set.
+    Returns the number of splits categorised and of transactions linked to a recurrence.
+    """
+    splits = models.Split.objects.personal().filter(
+        opposing_account__account_type=models.AccountType.FOREIGN)
+    if not overwrite:
+        splits = splits.filter(Q(category=None) | Q(transaction__recurrence=None))
+    categories = defaultdict(list)
+    recurrences = defaultdict(list)
+    values = splits.values_list(
+        'id', 'transaction_id', 'title', 'transaction__notes', 'opposing_account__name',
+        'opposing_account__iban', 'amount', 'category_id', 'transaction__recurrence_id')
+    for (id, transaction_id, title, notes, payee, iban, amount, category_id,
+            recurrence_id) in values.iterator(chunk_size=chunk_size):
+        rule = rules.match(payee, iban, '{}\n{}'.format(title, notes or ''), amount)
+        if rule is None:
+            continue
+        if rule.category_id and rule.category_id != category_id and \
+                (overwrite or category_id is None):
+            categories[rule.category_id].append(id)
+        if rule.recurrence_id and rule.recurrence_id != recurrence_id and \
+                (overwrite or recurrence_id is None):
+            recurrences[rule.recurrence_id].append(transaction_id)
+    if not dry_run:
+        now = timezone.now()
+        for category_id, ids in categories.items():
+            for start in range(0, len(ids), BATCH_SIZE):
+                models.Split.objects.filter(id__in=ids[start:start + BATCH_SIZE]).update(
+                    category_id=category_id, last_modified=now)
+        for recurrence_id, ids in recurrences.items():
+            for start in range(0, len(ids), BATCH_SIZE):
+                models.Transaction.objects.filter(id__in=ids[start:start + BATCH_SIZE]).update(
+                    recurrence_id=recurrence_id, last_modified=now)
+    return (sum(len(ids) for ids in categories.values()),
+            len({id for ids in recurrences.values() for id in ids}))
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from silverstrike.rest.authentication import invalidate_credentials
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_credentials(sender, instance, update_fields=None, **kwargs):
+    # every login stores last_login, which has no effect on the credentials
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        invalidate_credentials()
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token_credentials(sender, instance, **kwargs):
+    invalidate_credentials()
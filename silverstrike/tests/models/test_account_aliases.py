@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from silverstrike.models import AccountAlias, AccountType
+from silverstrike.tests import create_account
+
+
+class AccountAliasTests(TestCase):
+    def setUp(self):
+        self.shop = create_account('Shop', AccountType.FOREIGN)
+        self.other_shop = create_account('Other Shop', AccountType.FOREIGN)
+        AccountAlias.objects.create(kind=AccountAlias.IBAN, value='DE01', account=self.shop)
+        AccountAlias.objects.create(kind=AccountAlias.NAME, value='SHOP GMBH', account=self.shop)
+        AccountAlias.objects.create(kind=AccountAlias.NAME, value='PAYPAL', account=self.shop)
+        AccountAlias.objects.create(kind=AccountAlias.NAME, value='PAYPAL',
+                                    account=self.other_shop)
+
+    def test_suggestions(self):
+        ibans, names = AccountAlias.objects.suggestions(['DE01', 'DE02'], ['SHOP GMBH', 'unknown'])
+        self.assertEqual(ibans, {'DE01': self.shop})
+        self.assertEqual(names, {'SHOP GMBH': self.shop})
+
+    def test_ambiguous_names_are_not_suggested(self):
+        _, names = AccountAlias.objects.suggestions([], ['PAYPAL'])
+        self.assertEqual(names, {})
+
+    def test_suggestions_are_batched(self):
+        values = ['value {}'.format(i) for i in range(1200)] + ['SHOP GMBH']
+        with self.assertNumQueries(3):
+            ibans, names = AccountAlias.objects.suggestions(values, values)
+        self.assertEqual(names, {'SHOP GMBH': self.shop})
+
+    def test_kind_does_not_mix(self):
+        ibans, names = AccountAlias.objects.suggestions(['SHOP GMBH'], ['DE01'])
+        self.assertEqual(ibans, {})
+        self.assertEqual(names, {})
@@ -1,8 +1,10 @@
-from datetime import date
+import itertools
+from datetime import date, timedelta
 
 from django.test import TestCase
 from django.urls import reverse
 
+from silverstrike.lib import last_day_of_month
 from silverstrike.models import Account, AccountType, RecurringTransaction, Transaction
 from silverstrike.tests import create_transaction
 
@@ -115,9 +117,87 @@ class RecurrenceTests(TestCase):
         self.assertEqual(self.recurrence.average_amount, sum([i * 10 for i in range(1, 11)]) / 10)
 
     def test_outstanding_sum(self):
-        # TODO add a test
-        pass
+        self.recurrence.date = last_day_of_month(date.today()) - timedelta(days=14)
+        self.recurrence.interval = RecurringTransaction.WEEKLY
+        self.recurrence.save()
+        RecurringTransaction.objects.create(
+            title='salary', amount=1000, date=self.recurrence.date, src=self.foreign,
+            dst=self.personal, interval=RecurringTransaction.MONTHLY,
+            transaction_type=Transaction.DEPOSIT)
+        RecurringTransaction.objects.create(
+            title='saving', amount=100, date=self.recurrence.date, src=self.personal,
+            dst=self.personal, interval=RecurringTransaction.DAILY,
+            transaction_type=Transaction.TRANSFER)
+        self.assertEqual(RecurringTransaction.outstanding_transaction_sum(), 1000 - 3 * 25)
 
     def test_due_in_month_queryset(self):
         # TODO add a test
         pass
+
+
+class OccurrenceTests(TestCase):
+    starts = [date(2019, 1, 31), date(2020, 2, 29), date(2021, 5, 1), date(2022, 1, 1),
+              date(2022, 10, 29), date(2023, 12, 30)]
+
+    def _recurrences(self):
+        intervals = [i for i, name in RecurringTransaction.RECCURENCE_OPTIONS
+                     if i != RecurringTransaction.DISABLED]
+        weekend_handling = [w for w, name in RecurringTransaction.WEEKEND_SKIPPING]
+        for interval, multiplier, usual_month_day, weekend, start in itertools.product(
+                intervals, [1, 2, 3], [0, 1, 2, 3, 15, 26, 27, 28, 29, 30, 31],
+                weekend_handling, self.starts):
+            yield RecurringTransaction(date=start, interval=interval, multiplier=multiplier,
+                                       usual_month_day=usual_month_day,
+                                       weekend_handling=weekend)
+
+    def _update_dates(self, recurrence, count):
+        # the dates successive update_date calls reach, until they stop advancing
+        dates = [recurrence.date]
+        while len(dates) < count:
+            following = recurrence.update_date(dates[-1])
+            if following <= dates[-1]:
+                break
+            dates.append(following)
+        return dates
+
+    def test_occurrences_match_update_date(self):
+        for recurrence in self._recurrences():
+            expected = self._update_dates(recurrence, 30)
+            occurrences = list(itertools.islice(recurrence.occurrences(), 30))
+            self.assertEqual(occurrences, expected)
+            for k in {0, len(expected) // 2, len(expected) - 1}:
+                self.assertEqual(recurrence.occurrence(k), expected[k])
+
+    def test_occurrences_within_range_match_update_date(self):
+        for recurrence in self._recurrences():
+            expected = self._update_dates(recurrence, 60)
+            for offset in (-3, 40, 400):
+                dstart = recurrence.date + timedelta(days=offset)
+                dend = dstart + timedelta(days=200)
+                if len(expected) == 60 and expected[-1] < dend:
+                    continue
+                self.assertEqual(list(recurrence.occurrences(dstart, dend)),
+                                 [d for d in expected if dstart <= d <= dend])
+
+    def test_far_behind_recurrences_jump_to_range(self):
+        recurrence = RecurringTransaction(date=date(1990, 1, 1), multiplier=1,
+                                          interval=RecurringTransaction.DAILY)
+        self.assertEqual(recurrence.occurrence(10 ** 4), date(2017, 5, 19))
+        self.assertEqual(list(recurrence.occurrences(date(2024, 2, 28), date(2024, 3, 1))),
+                         [date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1)])
+        recurrence.interval = RecurringTransaction.MONTHLY
+        recurrence.usual_month_day = 31
+        self.assertEqual(recurrence.occurrence(12 * 30 + 1), date(2020, 2, 29))
+
+    def test_occurrences_stop_when_dates_do_not_advance(self):
+        # the first of January 2022 is a Saturday, moving it to Friday leaves the month
+        recurrence = RecurringTransaction(
+            date=date(2021, 12, 1), interval=RecurringTransaction.MONTHLY, multiplier=1,
+            usual_month_day=1, weekend_handling=RecurringTransaction.PREVIOUS_WEEKDAY)
+        self.assertEqual(list(recurrence.occurrences()), [date(2021, 12, 1), date(2021, 12, 31)])
+        self.assertIsNone(recurrence.occurrence(2))
+
+    def test_disabled_recurrences_only_occur_once(self):
+        recurrence = RecurringTransaction(date=date(2021, 12, 1),
+                                          interval=RecurringTransaction.DISABLED)
+        self.assertEqual(list(recurrence.occurrences()), [date(2021, 12, 1)])
@@ -4,7 +4,8 @@ from django.contrib.admin.sites import AdminSite
 from django.test import TestCase
 
 from silverstrike.admin import AccountAdmin
-from silverstrike.models import Account, AccountType, RecurringTransaction, Split, Transaction
+from silverstrike.models import (Account, AccountAlias, AccountType, RecurringTransaction,
+                                 Split, Transaction)
 from silverstrike.tests import create_account, create_transaction
 
 
@@ -104,3 +105,11 @@ class AccountAdminTests(TestCase):
         self.modeladmin.merge_accounts(request, Account.objects.foreign().exclude(pk=self.third.pk))
         recurrence.refresh_from_db()
         self.assertEqual(recurrence.dst, self.second)
+
+    def test_merging_account_keeps_aliases(self):
+        AccountAlias.objects.create(kind=AccountAlias.NAME, value='FIRST', account=self.first)
+        AccountAlias.objects.create(kind=AccountAlias.NAME, value='SHARED', account=self.first)
+        AccountAlias.objects.create(kind=AccountAlias.NAME, value='SHARED', account=self.second)
+        self.modeladmin.merge_accounts(request, Account.objects.foreign().exclude(pk=self.third.pk))
+        self.assertEqual(sorted(self.second.aliases.values_list('value', flat=True)),
+                         ['FIRST', 'SHARED'])
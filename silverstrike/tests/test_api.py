@@ -1,11 +1,12 @@
 import json
-from datetime import date
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
 
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.urls import reverse
 
-from silverstrike.models import Account, AccountType, Transaction
+from silverstrike.models import Account, AccountType, Category, Transaction
 from silverstrike.tests import create_transaction
 
 
@@ -44,6 +45,16 @@ class ApiTests(TestCase):
         data = json.loads(response.content.decode('utf-8'))
         self.assertEqual(['2000.00'], data.get('data'))
 
+    async def test_chart_endpoints_are_served_async(self):
+        await self.async_client.aforce_login(await User.objects.aget(username='admin'))
+        response = await self.async_client.get(
+            reverse('api_non_dashboard_balance', args=['2022-01-03', '2022-01-03']))
+        self.assertEqual(['2000.00'], json.loads(response.content.decode('utf-8'))['data'])
+        response = await self.async_client.get(
+            reverse('api_account_balance', args=[self.cash.pk, '2022-01-01', '2022-01-04']))
+        self.assertEqual([0, 0, '1000.00', '1000.00'],
+                         json.loads(response.content.decode('utf-8'))['data'])
+
     def test_get_account_balance_invalid_date(self):
         response = self.client.get(reverse('api_account_balance', args=['1', '2019-01-01', '20']))
         self.assertEqual(response.status_code, 400)
@@ -68,3 +79,87 @@ class ApiTests(TestCase):
         self.assertEqual(response.status_code, 400)
         response = self.client.get(reverse('category_spending', args=['2019-13-01', '2019-01-01']))
         self.assertEqual(response.status_code, 400)
+
+
+class ChartsApiTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(username='admin', email='email@example.com', password='pass')
+        self.client.login(username='admin', password='pass')
+        personal = Account.objects.create(name='Personal', show_on_dashboard=True)
+        savings = Account.objects.create(name='Savings')
+        closed = Account.objects.create(name='Closed', active=False, show_on_dashboard=True)
+        foreign = Account.objects.create(name='Foreign', account_type=AccountType.FOREIGN)
+        food = Category.objects.create(name='Food')
+        rent = Category.objects.create(name='Rent')
+        today = date.today()
+        create_transaction('salary', foreign, personal, Decimal('2500'),
+                           Transaction.DEPOSIT, today - timedelta(days=400))
+        create_transaction('gift', foreign, closed, Decimal('20'),
+                           Transaction.DEPOSIT, today - timedelta(days=200))
+        for days in range(0, 120, 3):
+            create_transaction('groceries', personal, foreign, Decimal('12.34'),
+                               Transaction.WITHDRAW, today - timedelta(days=days), food)
+        for days in range(5, 120, 30):
+            create_transaction('rent', personal, foreign, Decimal('500'),
+                               Transaction.WITHDRAW, today - timedelta(days=days), rent)
+            create_transaction('saving', personal, savings, Decimal('100'),
+                               Transaction.TRANSFER, today - timedelta(days=days))
+            create_transaction('cash', personal, foreign, Decimal('40'),
+                               Transaction.WITHDRAW, today - timedelta(days=days))
+        create_transaction('upcoming', personal, foreign, Decimal('75'),
+                           Transaction.WITHDRAW, today + timedelta(days=3), food)
+        self.ranges = [
+            (today - timedelta(days=90), today),
+            (today - timedelta(days=10), today + timedelta(days=10)),
+            (today - timedelta(days=1000), today),
+            (today + timedelta(days=30), today + timedelta(days=40)),
+        ]
+
+    def _get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode('utf-8'))
+
+    def _numbers(self, data):
+        # SQLite sums decimals as floats, the chart endpoints render them unquantized
+        if isinstance(data, dict):
+            return {key: self._numbers(value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self._numbers(value) for value in data]
+        try:
+            return Decimal(data)
+        except (InvalidOperation, TypeError):
+            return data
+
+    def test_datasets_match_chart_endpoints(self):
+        names = {
+            'accounts_balance': 'api_accounts_balance',
+            'balance': 'api_balance',
+            'non_dashboard_balance': 'api_non_dashboard_balance',
+            'category_spending': 'category_spending',
+        }
+        for dstart, dend in self.ranges:
+            args = [dstart.isoformat(), dend.isoformat()]
+            results = self._get(reverse('api_charts'), dataset=[
+                '{},{},{}'.format(name, *args) for name in names])['results']
+            for result, url_name in zip(results, names.values()):
+                self.assertEqual(self._numbers(result),
+                                 self._numbers(self._get(reverse(url_name, args=args))))
+
+    def test_datasets_of_a_range_share_queries(self):
+        dstart, dend = self.ranges[0]
+        datasets = ['{},{},{}'.format(name, dstart, dend) for name in
+                    ['accounts_balance', 'balance', 'non_dashboard_balance', 'category_spending']]
+        with self.assertNumQueries(5):
+            # the session and user of the request, then the accounts, the balances before
+            # the range and the splits within it
+            results = self._get(reverse('api_charts'), dataset=datasets)['results']
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0]['dataset'][0]['name'], 'Personal')
+        self.assertEqual(results[3]['categories'], ['No category', 'Food', 'Rent'])
+
+    def test_invalid_datasets(self):
+        for dataset in [[], ['balance'], ['unknown,2019-01-01,2019-02-01'],
+                        ['balance,2019-13-01,2019-02-01'], ['balance,2019-01-01,2019-02-01,1']]:
+            response = self.client.get(reverse('api_charts'), {'dataset': dataset})
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,49 @@
+from benchmarks import auth, charts, forecast, importers, rest
+
+from django.test import TestCase, TransactionTestCase
+
+
+class ImporterBenchmarkTests(TestCase):
+    def test_all_rows_are_processed(self):
+        results = importers.run(list(importers.WRITERS), [20])
+        self.assertEqual({r['importer'] for r in results}, set(importers.WRITERS))
+        for result in results:
+            self.assertEqual(result['parsed_rows'], 20, result)
+            self.assertGreater(result['peak_memory'], 0)
+
+
+class RestBenchmarkTests(TestCase):
+    def test_all_serializers_are_measured(self):
+        results = rest.benchmark(20, repeat=1)
+        self.assertEqual([r['serializer'] for r in results], ['transaction', 'split', 'account'])
+        self.assertEqual(results[0]['rows'], 20)
+        self.assertEqual(results[1]['rows'], 40)
+        for result in results:
+            self.assertGreater(result['reader_us_per_row'], 0)
+
+
+class AuthBenchmarkTests(TestCase):
+    def test_both_schemes_are_measured(self):
+        results = auth.benchmark(2)
+        self.assertEqual([r['scheme'] for r in results], ['basic', 'token'])
+        for result in results:
+            self.assertGreater(result['cached_us'], 0)
+
+
+class ForecastBenchmarkTests(TestCase):
+    def test_every_day_is_projected(self):
+        result = forecast.benchmark(20, 3, repeat=1)
+        self.assertEqual(result['recurrences'], 20)
+        self.assertEqual(result['days'], 92)
+        self.assertGreater(result['milliseconds'], 0)
+
+
+class ChartsBenchmarkTests(TransactionTestCase):
+    # the handlers query from other threads, which only see committed rows
+    def test_wsgi_and_asgi_serve_all_requests(self):
+        results = charts.benchmark(20, [1, 4], requests=10, threads=2, latency=0)
+        self.assertEqual([r['concurrency'] for r in results], [1, 4])
+        for result in results:
+            self.assertEqual(result['errors'], 0, result)
+            self.assertGreater(result['wsgi_requests_per_second'], 0)
+            self.assertGreater(result['asgi_requests_per_second'], 0)
@@ -0,0 +1,200 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from silverstrike import export
+from silverstrike.models import AccountType, Category, Deletion, Split, Transaction
+from silverstrike.tests import create_account, create_transaction
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(username='admin', email='email@example.com', password='pass')
+        self.client.login(username='admin', password='pass')
+        self.account = create_account('Checking')
+        self.savings = create_account('Savings')
+        self.shop = create_account('Shop', AccountType.FOREIGN)
+        self.category = Category.objects.create(name='Groceries')
+        for day in range(1, 6):
+            create_transaction('Shopping', self.account, self.shop, day, Transaction.WITHDRAW,
+                               date(2019, 1, day), self.category)
+        create_transaction('Saving', self.account, self.savings, 100, Transaction.TRANSFER,
+                           date(2019, 1, 10))
+        self.expected = ('account;opposing_account;date;amount;category\r\n'
+                         'Checking;Savings;2019-01-10;-100.00;\r\n' +
+                         ''.join('Checking;Shop;2019-01-0{0};-{0}.00;Groceries\r\n'.format(day)
+                                 for day in range(5, 0, -1)))
+
+    def _post(self, **data):
+        return self.client.post(reverse('export'), dict(
+            {'start': '2019-01-01', 'end': '2019-01-31', 'accounts': [self.account.pk]}, **data))
+
+    def test_chunks(self):
+        splits = Split.objects.personal().transfers_once()
+        chunks = list(export.csv_chunks(splits, chunk_size=2))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(''.join(chunks), self.expected)
+
+    def test_view_streams_csv(self):
+        response = self._post()
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(b''.join(response.streaming_content).decode(), self.expected)
+
+    def test_view_gzip(self):
+        response = self._post(compress='on')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=export.csv.gz')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)).decode(),
+                         self.expected)
+
+    def test_command(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'export.csv')
+        call_command('exporttransactions', file=path)
+        with open(path, newline='') as f:
+            self.assertEqual(f.read(), self.expected)
+        call_command('exporttransactions', file=path + '.gz', gzip=True)
+        with gzip.open(path + '.gz', 'rt', newline='') as f:
+            self.assertEqual(f.read(), self.expected)
+
+
+@mock.patch('silverstrike.export.CURSOR_OVERLAP', timedelta(0))
+class DeltaExportTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(username='admin', email='email@example.com', password='pass')
+        self.client.login(username='admin', password='pass')
+        self.account = create_account('Checking')
+        self.shop = create_account('Shop', AccountType.FOREIGN)
+        self.old = create_transaction('Old', self.account, self.shop, 10, Transaction.WITHDRAW)
+        self.deleted = create_transaction('Deleted', self.account, self.shop, 20,
+                                          Transaction.WITHDRAW)
+        self.watermark = timezone.now()
+        self.new = create_transaction('New', self.account, self.shop, 30, Transaction.WITHDRAW)
+        self.deleted_splits = list(self.deleted.splits.values_list('id', flat=True))
+        self.deleted_id = self.deleted.id
+        self.deleted.delete()
+        self.directory = tempfile.mkdtemp()
+
+    def _records(self, lines):
+        return [json.loads(line) for line in lines.splitlines()]
+
+    def _summary(self, records):
+        return sorted((r['model'], r['id'], r.get('deleted', False)) for r in records)
+
+    def test_deletions_are_recorded(self):
+        self.assertEqual(sorted(Deletion.objects.values_list('model', 'object_id')),
+                         sorted([('split', id) for id in self.deleted_splits] +
+                                [('transaction', self.deleted_id)]))
+
+    def _delete_account(self, name, transactions):
+        account = create_account(name, AccountType.FOREIGN)
+        created = [create_transaction(name, self.account, account, 5, Transaction.WITHDRAW)
+                   for _ in range(transactions)]
+        expected = sorted([('account', account.id)] +
+                          [('transaction', t.id) for t in created] +
+                          [('split', id) for t in created
+                           for id in t.splits.values_list('id', flat=True)])
+        Deletion.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            account.delete()
+        self.assertEqual(sorted(Deletion.objects.values_list('model', 'object_id')), expected)
+        return len(queries)
+
+    def test_cascaded_deletions_are_recorded_in_bulk(self):
+        self.assertEqual(self._delete_account('Few', 1), self._delete_account('Many', 10))
+        split = self.new.splits.first()
+        Deletion.objects.all().delete()
+        Split.objects.filter(id=split.id).delete()
+        self.assertEqual(list(Deletion.objects.values_list('model', 'object_id')),
+                         [('split', split.id)])
+
+    def test_changes_since_watermark(self):
+        records = list(export.delta_records(self.watermark, timezone.now()))
+        new_splits = list(self.new.splits.values_list('id', flat=True))
+        self.assertEqual(self._summary(records), sorted(
+            [('split', id, True) for id in self.deleted_splits] +
+            [('split', id, False) for id in new_splits] +
+            [('transaction', self.deleted_id, True), ('transaction', self.new.id, False)]))
+        self.assertTrue(all(r.get('deleted') for r in records[:3]))
+        transaction = next(r for r in records if r == dict(r, model='transaction', id=self.new.id))
+        self.assertEqual(transaction['title'], 'New')
+
+    def test_command_with_watermark_file(self):
+        watermark = os.path.join(self.directory, 'watermark')
+        output = os.path.join(self.directory, 'changes.json')
+        call_command('exporttransactions', since=watermark, file=output, stdout=StringIO())
+        with open(output) as f:
+            self.assertEqual(len(self._records(f.read())), 6 + 3)
+        with open(watermark) as f:
+            first = export.parse_watermark(f.read())
+        self.assertGreater(first, self.watermark)
+
+        self.old.title = 'Changed'
+        self.old.save()
+        call_command('exporttransactions', since=watermark, file=output, stdout=StringIO())
+        with open(output) as f:
+            self.assertEqual(self._summary(self._records(f.read())),
+                             [('transaction', self.old.id, False)])
+        self.assertEqual(sorted(os.listdir(self.directory)), ['changes.json', 'watermark'])
+
+    def test_command_with_timestamp(self):
+        output = os.path.join(self.directory, 'changes.json')
+        call_command('exporttransactions', since=timezone.now().isoformat(), file=output,
+                     stdout=StringIO())
+        with open(output) as f:
+            self.assertEqual(f.read(), '')
+        with self.assertRaises(CommandError):
+            call_command('exporttransactions', since='2019-13-01T00:00:00')
+
+    def test_api(self):
+        response = self.client.get('/rest/changes/export', {'cursor': self.watermark.isoformat()})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = self._records(b''.join(response.streaming_content).decode())
+        self.assertEqual(len(records), 6)
+        self.assertTrue(response['X-Cursor'].endswith('Z'))
+        # pasted into the query string as it is
+        response = self.client.get('/rest/changes/export?cursor=' + response['X-Cursor'])
+        self.assertEqual(b''.join(response.streaming_content), b'')
+        response = self.client.get('/rest/changes/export', {'cursor': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_token_authentication(self):
+        self.client.logout()
+        token = Token.objects.create(user=User.objects.get())
+        response = self.client.get('/rest/changes/export',
+                                   HTTP_AUTHORIZATION='Token {}'.format(token.key))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self._records(b''.join(response.streaming_content).decode())), 6 + 3)
+        self.assertEqual(self.client.get('/rest/changes/export').status_code, 401)
+
+
+class CursorOverlapTests(TestCase):
+    def setUp(self):
+        self.account = create_account('Checking')
+        self.shop = create_account('Shop', AccountType.FOREIGN)
+
+    def test_late_commits_are_delivered(self):
+        now = timezone.now()
+        cursor = export.next_cursor(now)
+        self.assertEqual(cursor, now - export.CURSOR_OVERLAP)
+        # saved before the cursor was taken, but committed after the records were read
+        late = create_transaction('Late', self.account, self.shop, 5, Transaction.WITHDRAW)
+        Transaction.objects.filter(pk=late.pk).update(
+            last_modified=now - export.CURSOR_OVERLAP / 2)
+        records = list(export.delta_records(cursor, timezone.now()))
+        self.assertIn(late.id, [r['id'] for r in records if r['model'] == 'transaction'])
@@ -0,0 +1,112 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from silverstrike import forecast
+from silverstrike.models import Account, AccountType, RecurringTransaction, Split, Transaction
+from silverstrike.tests import create_transaction
+
+
+class ForecastTests(TestCase):
+    today = date(2024, 1, 15)
+
+    def setUp(self):
+        cache.clear()
+        self.checking = Account.objects.create(name='Checking')
+        self.savings = Account.objects.create(name='Savings')
+        self.closed = Account.objects.create(name='Closed', active=False)
+        self.foreign = Account.objects.create(name='Foreign', account_type=AccountType.FOREIGN)
+        create_transaction('salary', self.foreign, self.checking, Decimal('3000'),
+                           Transaction.DEPOSIT, date(2024, 1, 1))
+        create_transaction('future', self.checking, self.foreign, Decimal('12.50'),
+                           Transaction.WITHDRAW, date(2024, 2, 3))
+        create_transaction('too late', self.checking, self.foreign, Decimal('99'),
+                           Transaction.WITHDRAW, date(2025, 1, 1))
+        self._recurrence('salary', self.foreign, self.checking, '2500', date(2024, 1, 31),
+                         RecurringTransaction.MONTHLY, usual_month_day=31,
+                         weekend_handling=RecurringTransaction.PREVIOUS_WEEKDAY)
+        self._recurrence('rent', self.checking, self.foreign, '900', date(2024, 1, 10),
+                         RecurringTransaction.MONTHLY, usual_month_day=1)
+        self._recurrence('coffee', self.checking, self.foreign, '3.20', date(2023, 6, 1),
+                         RecurringTransaction.DAILY, multiplier=2)
+        self._recurrence('saving', self.checking, self.savings, '100', date(2024, 1, 19),
+                         RecurringTransaction.WEEKLY)
+        self._recurrence('insurance', self.checking, self.foreign, '240', date(2024, 3, 16),
+                         RecurringTransaction.QUARTERLY, weekend_handling=RecurringTransaction.SKIP)
+        self._recurrence('old', self.closed, self.foreign, '5', date(2024, 1, 20),
+                         RecurringTransaction.DAILY)
+        self._recurrence('disabled', self.checking, self.foreign, '1000', date(2024, 1, 20),
+                         RecurringTransaction.DISABLED)
+
+    def _recurrence(self, title, src, dst, amount, start, interval, **kwargs):
+        return RecurringTransaction.objects.create(
+            title=title, src=src, dst=dst, amount=Decimal(amount), date=start,
+            interval=interval, transaction_type=Transaction.WITHDRAW, **kwargs)
+
+    def _expected(self, account, dend):
+        # steps through every recurrence with update_date and sums up each day
+        balance = sum(s.amount for s in Split.objects.filter(account=account, date__lte=self.today))
+        changes = {}
+        for split in Split.objects.filter(account=account, date__gt=self.today, date__lte=dend):
+            changes[split.date] = changes.get(split.date, 0) + split.amount
+        for recurrence in RecurringTransaction.objects.exclude(
+                interval=RecurringTransaction.DISABLED):
+            sign = {recurrence.src_id: -1, recurrence.dst_id: 1}.get(account.id)
+            if sign is None:
+                continue
+            day = recurrence.date
+            if day <= self.today:
+                balance += sign * recurrence.amount
+            while day <= dend:
+                if day > self.today:
+                    changes[day] = changes.get(day, 0) + sign * recurrence.amount
+                day = recurrence.update_date(day)
+        balances = []
+        for i in range((dend - self.today).days + 1):
+            balance += changes.get(self.today + timedelta(days=i), 0)
+            balances.append(balance)
+        return balances
+
+    def test_projection_matches_stepping_every_recurrence(self):
+        result = forecast.forecast(12, self.today)
+        self.assertEqual(result['dates'][0], self.today)
+        self.assertEqual(result['dates'][-1], date(2025, 1, 15))
+        self.assertEqual([name for name, balances in result['accounts']], ['Checking', 'Savings'])
+        for account, (name, balances) in zip([self.checking, self.savings], result['accounts']):
+            self.assertEqual(balances, self._expected(account, date(2025, 1, 15)))
+
+    def test_due_recurrences_count_once_on_the_first_day(self):
+        result = forecast.forecast(1, self.today)
+        checking = result['accounts'][0][1]
+        # salary, the overdue rent and one coffee
+        self.assertEqual(checking[0], Decimal('3000') - Decimal('900') - Decimal('3.20'))
+        # coffee every second day
+        self.assertEqual(checking[1] - checking[0], 0)
+        self.assertEqual(checking[2] - checking[1], Decimal('-3.20'))
+
+    def test_forecast_endpoint(self):
+        User.objects.create_superuser(username='admin', email='email@example.com',
+                                      password='pass')
+        self.client.login(username='admin', password='pass')
+        response = self.client.get(reverse('api_forecast', args=[3]))
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['labels'][0], date.today().isoformat())
+        self.assertEqual([d['name'] for d in data['dataset']], ['Checking', 'Savings'])
+        self.assertEqual(len(data['dataset'][0]['data']), len(data['labels']))
+        with self.assertNumQueries(3):
+            # the session and user of the request, then the data version
+            self.client.get(reverse('api_forecast', args=[3]))
+        RecurringTransaction.objects.filter(title='saving').update(
+            amount=200, last_modified=timezone.now() + timedelta(days=1))
+        updated = json.loads(self.client.get(
+            reverse('api_forecast', args=[3])).content.decode('utf-8'))
+        self.assertNotEqual(updated['dataset'][1]['data'], data['dataset'][1]['data'])
+        for months in (0, forecast.MAX_MONTHS + 1):
+            response = self.client.get(reverse('api_forecast', args=[months]))
+            self.assertEqual(response.status_code, 400)
@@ -1,10 +1,15 @@
 import os
+import subprocess
+import sys
+import tempfile
 from datetime import date
-from unittest import skipUnless
+from decimal import Decimal
 
+from django.conf import settings
 from django.test import TestCase
 
 from silverstrike import importers
+from silverstrike.importers import firefly, ofx, parsing, pc_mastercard
 
 
 class ImportTests(TestCase):
@@ -13,20 +18,104 @@ class ImportTests(TestCase):
         self.base_dir = os.path.join(os.path.dirname(__file__), 'fixtures')
 
     def test_firefly_import(self):
-        importers.firefly.import_firefly(os.path.join(self.base_dir, 'firefly.csv'))
+        firefly.import_firefly(os.path.join(self.base_dir, 'firefly.csv'))
 
     def test_pc_mastercard(self):
-        transactions = importers.pc_mastercard.import_transactions(
+        transactions = pc_mastercard.import_transactions(
             os.path.join(self.base_dir, 'president-choice-mastercard.csv'))
         self.assertEqual(len(transactions), 4)
         t = transactions[0]
-        self.assertEqual(t.amount, -40.03)
+        self.assertEqual(t.amount, Decimal('-40.03'))
         self.assertEqual(t.book_date, date(2018, 10, 18))
 
-    @skipUnless(hasattr(importers, 'ofx'), 'ofxparse is not installed')
     def test_ofx(self):
-        transactions = importers.ofx.import_transactions(
+        transactions = ofx.import_transactions(
             os.path.join(self.base_dir, 'ofx.qfx'))
         t = transactions[0]
-        self.assertEqual(t.amount, 34.50)
+        self.assertEqual(t.amount, Decimal('34.50'))
         self.assertEqual(t.book_date, date(2018, 1, 2))
+
+
+OFX_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<?OFX OFXHEADER="200" VERSION="220"?>
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20180301</DTPOSTED><DTUSER>20180228</DTUSER>
+<TRNAMT>-12.50</TRNAMT><FITID>1</FITID><NAME>Caf&#233; &amp; Bar</NAME></STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>2018</DTPOSTED><TRNAMT>-1</TRNAMT><FITID>2</FITID></STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20180302120000</DTPOSTED>
+<TRNAMT>1000,00</TRNAMT><FITID>3</FITID><MEMO>Salary</MEMO></STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+class OfxReaderTests(TestCase):
+    def test_small_chunks(self):
+        fixture = os.path.join(os.path.dirname(__file__), 'fixtures', 'ofx.qfx')
+        with open(fixture) as f:
+            expected = list(ofx.read_transactions(f))
+        for chunk_size in (1, 7, 64):
+            with open(fixture) as f:
+                self.assertEqual(list(ofx.read_transactions(f, chunk_size)), expected)
+        self.assertEqual(len(expected), 7)
+        self.assertEqual(expected[1]['TRNAMT'], '-88.65')
+
+    def test_xml_and_errors_per_transaction(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ofx', encoding='utf-8') as f:
+            f.write(OFX_XML)
+            f.flush()
+            with self.assertLogs('silverstrike.importers.ofx', 'ERROR') as logs:
+                transactions = ofx.import_transactions(f.name)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('(2)', logs.output[0])
+        self.assertEqual(len(transactions), 2)
+        t = transactions[0]
+        self.assertEqual(t.notes, 'Caf\xe9 & Bar')
+        self.assertEqual(t.amount, Decimal('-12.50'))
+        self.assertEqual(t.book_date, date(2018, 3, 1))
+        self.assertEqual(t.transaction_date, date(2018, 2, 28))
+        t = transactions[1]
+        self.assertEqual(t.notes, 'Salary')
+        self.assertEqual(t.amount, Decimal('1000.00'))
+
+
+class ParsingTests(TestCase):
+    def test_german_amount(self):
+        self.assertEqual(parsing.parse_german_amount('1.234,56'), Decimal('1234.56'))
+        self.assertEqual(parsing.parse_german_amount('-0,10'), Decimal('-0.10'))
+        self.assertEqual(parsing.parse_german_amount('1.000.000,01'), Decimal('1000000.01'))
+
+    def test_invalid_amount(self):
+        with self.assertRaises(ValueError):
+            parsing.parse_german_amount('Betrag (EUR)')
+        with self.assertRaises(ValueError):
+            parsing.parse_amount('')
+
+    def test_date(self):
+        self.assertEqual(parsing.parse_date('02.01.2018', '%d.%m.%Y'), date(2018, 1, 2))
+        self.assertEqual(parsing.parse_date('02.01.2018', '%d.%m.%Y'), date(2018, 1, 2))
+        with self.assertRaises(ValueError):
+            parsing.parse_date('Buchungstag', '%d.%m.%Y')
+
+
+class RegistryTests(TestCase):
+    def test_modules_are_imported_on_first_use(self):
+        script = ('import sys; from silverstrike import importers; '
+                  'importers.choices(); assert "silverstrike.importers.dkb" not in sys.modules; '
+                  'importers.get("dkb").load(); assert "silverstrike.importers.dkb" in sys.modules')
+        subprocess.run([sys.executable, '-c', script], check=True, cwd=settings.BASE_DIR)
+
+    def test_get(self):
+        importer = importers.get('pc_mastercard')
+        self.assertEqual(importer.name, 'PC MasterCard')
+        self.assertIs(importer.load(), pc_mastercard)
+        self.assertTrue(importers.get('ofx').streaming)
+        self.assertTrue(importers.get('dkb').iban)
+        with self.assertRaises(KeyError):
+            importers.get('unknown')
+
+    def test_choices_are_stable_ids(self):
+        self.assertIn(('volksbank', 'Volksbank'), importers.choices())
+
+    def test_duplicate_id(self):
+        with self.assertRaises(ValueError):
+            importers.register(importers.Importer('dkb', 'DKB', 'silverstrike.importers.dkb'))
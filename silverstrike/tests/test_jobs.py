@@ -0,0 +1,271 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from silverstrike.importers import parallel
+from silverstrike.models import (Account, AccountAlias, AccountType, Category, ImportBatch,
+                                 ImportFile, ImportJob, Transaction)
+from silverstrike.models.imports import STALE_TIMEOUT
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportJobTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(username='admin', email='email@example.com', password='pass')
+        self.client.login(username='admin', password='pass')
+        self.account = Account.objects.create(name='Checking')
+        self.base_dir = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def _import_file(self, name, importer=None):
+        with open(os.path.join(self.base_dir, name), 'rb') as f:
+            import_file = ImportFile(account=self.account, importer=importer)
+            import_file.file.save(name, File(f))
+        return import_file
+
+    def test_process_view_queues_job(self):
+        import_file = self._import_file('president-choice-mastercard.csv', 'pc_mastercard')
+        response = self.client.post(reverse('import_process', args=[import_file.pk]), {
+            'title-0': 'Groceries', 'account-0': 'Sobeys', 'recurrence-0': '-1',
+            'title-1': 'Market', 'account-1': 'Market', 'recurrence-1': '-1', 'ignore-1': 'on',
+            'title-2': '', 'account-2': '', 'recurrence-2': '-1',
+        })
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, reverse('import_job', args=[job.pk]))
+        self.assertEqual(job.status, ImportJob.PENDING)
+        self.assertEqual(json.loads(job.data), [
+            {'file': str(import_file.pk), 'row': 0, 'title': 'Groceries', 'account': 'Sobeys',
+             'recurrence': -1, 'category': -1}])
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_runjobs_commits_selected_rows(self):
+        import_file = self._import_file('president-choice-mastercard.csv', 'pc_mastercard')
+        category = Category.objects.create(name='Groceries')
+        job = ImportJob.objects.create(file=import_file, kind=ImportJob.STATEMENTS, data=json.dumps([
+            {'row': 0, 'title': 'Groceries', 'account': 'Sobeys', 'recurrence': -1,
+             'category': category.id}]))
+        call_command('runjobs', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.rows_parsed, 4)
+        self.assertEqual(job.rows_committed, 1)
+        self.assertEqual(job.rows_skipped, 3)
+        self.assertIsNotNone(job.finished_at)
+        transaction = Transaction.objects.get()
+        self.assertEqual(transaction.title, 'Groceries')
+        self.assertEqual(transaction.transaction_type, Transaction.WITHDRAW)
+        self.assertEqual(set(transaction.splits.values_list('category', flat=True)), {category.id})
+        self.assertEqual(list(transaction.dst.aliases.values_list('kind', 'value')),
+                         [(AccountAlias.NAME, '**** ****')])
+
+    def test_preview_suggests_accounts(self):
+        sobeys = Account.objects.create(name='Sobeys', account_type=AccountType.FOREIGN)
+        AccountAlias.objects.create(kind=AccountAlias.NAME, value='**** ****', account=sobeys)
+        import_file = self._import_file('president-choice-mastercard.csv', 'pc_mastercard')
+        response = self.client.get(reverse('import_process', args=[import_file.pk]))
+        self.assertTrue(all(d.suggested_account == sobeys for d in response.context['data']))
+
+    def test_firefly_job(self):
+        with open(os.path.join(self.base_dir, 'firefly.csv'), 'rb') as f:
+            response = self.client.post(reverse('import_firefly'), {'file': f})
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, reverse('import_job', args=[job.pk]))
+        self.assertEqual(Transaction.objects.count(), 0)
+        call_command('runjobs', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.rows_committed, Transaction.objects.count())
+        self.assertEqual(job.rows_parsed, job.rows_committed + job.rows_skipped)
+
+    def test_failed_job(self):
+        import_file = self._import_file('firefly.csv', 'dkb')
+        job = ImportJob.objects.create(file=import_file, kind=ImportJob.STATEMENTS)
+        import_file.file.delete(save=False)
+        with self.assertLogs('silverstrike.jobs', 'ERROR'):
+            call_command('runjobs', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertTrue(job.error)
+
+    def test_claim_is_exclusive(self):
+        import_file = self._import_file('firefly.csv')
+        job = ImportJob.objects.create(file=import_file, kind=ImportJob.FIREFLY)
+        self.assertEqual(ImportJob.objects.claim(), job)
+        self.assertIsNone(ImportJob.objects.claim())
+
+    def test_posting_again_reuses_the_job(self):
+        import_file = self._import_file('president-choice-mastercard.csv', 'pc_mastercard')
+        rows = {'title-0': 'Groceries', 'account-0': 'Sobeys', 'recurrence-0': '-1'}
+        first = self.client.post(reverse('import_process', args=[import_file.pk]), rows)
+        job = ImportJob.objects.get()
+        call_command('runjobs', once=True, stdout=StringIO())
+        second = self.client.post(reverse('import_process', args=[import_file.pk]), rows)
+        self.assertEqual(first.url, second.url)
+        self.assertEqual(ImportJob.objects.get(), job)
+        call_command('runjobs', once=True, stdout=StringIO())
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_failed_job_continues_after_committed_rows(self):
+        import_file = self._import_file('president-choice-mastercard.csv', 'pc_mastercard')
+        job = ImportJob.objects.create(
+            file=import_file, kind=ImportJob.STATEMENTS, status=ImportJob.FAILED,
+            started_at=timezone.now(), rows_done=1, rows_committed=1, error='interrupted')
+        rows = {}
+        for i in range(3):
+            rows.update({'title-{}'.format(i): 'Groceries', 'account-{}'.format(i): 'Sobeys',
+                         'recurrence-{}'.format(i): '-1'})
+        response = self.client.post(reverse('import_process', args=[import_file.pk]), rows)
+        self.assertRedirects(response, reverse('import_job', args=[job.pk]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (ImportJob.PENDING, ''))
+        with mock.patch('silverstrike.jobs.CHUNK_SIZE', 1):
+            call_command('runjobs', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        # the first row was committed before the failure
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual((job.rows_done, job.rows_committed, job.rows_skipped), (4, 3, 1))
+
+    def test_stale_jobs_are_claimed_again(self):
+        import_file = self._import_file('firefly.csv')
+        job = ImportJob.objects.create(file=import_file, kind=ImportJob.FIREFLY,
+                                       status=ImportJob.RUNNING, heartbeat_at=timezone.now())
+        self.assertIsNone(ImportJob.objects.claim())
+        ImportJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - STALE_TIMEOUT - timedelta(seconds=1))
+        self.assertEqual(ImportJob.objects.claim(), job)
+        self.assertIsNone(ImportJob.objects.claim())
+
+    def test_interrupted_firefly_job_is_not_run_again(self):
+        import_file = self._import_file('firefly.csv')
+        ImportJob.objects.create(file=import_file, kind=ImportJob.FIREFLY,
+                                 status=ImportJob.RUNNING, started_at=timezone.now())
+        with self.assertLogs('silverstrike.jobs', 'ERROR'):
+            call_command('runjobs', once=True, stdout=StringIO())
+        self.assertEqual(ImportJob.objects.get().status, ImportJob.FAILED)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_progress_endpoint(self):
+        import_file = self._import_file('firefly.csv')
+        job = ImportJob.objects.create(file=import_file, kind=ImportJob.FIREFLY)
+        job.report_progress(10, 8, 2)
+        response = self.client.get(reverse('api_import_progress', args=[job.pk]))
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertFalse(data['finished'])
+        self.assertEqual(data['rows_parsed'], 10)
+        self.assertEqual(data['rows_committed'], 8)
+        self.assertEqual(data['rows_skipped'], 2)
+        response = self.client.get(reverse('import_job', args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+MASTERCARD_HEADER = '"Merchant Name","Card Used For Transaction","Date","Time","Amount"\n'
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportBatchTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(username='admin', email='email@example.com', password='pass')
+        self.client.login(username='admin', password='pass')
+        self.checking = Account.objects.create(name='Checking')
+        self.credit_card = Account.objects.create(name='Credit Card')
+        self.base_dir = os.path.join(os.path.dirname(__file__), 'fixtures')
+        self.batch = ImportBatch.objects.create()
+        self.checking_file = self._import_file(self.checking, [
+            '"Card payment","****","10/20/2018","06:46 PM","200.00"',
+            '"SOBEYS QPS","****","10/18/2018","06:46 PM","40.03"',
+        ])
+        self.card_file = self._import_file(self.credit_card, [
+            '"Payment","****","10/20/2018","06:46 PM","-200.00"',
+            '"9TH AVE. MARKET","****","10/17/2018","02:46 PM","9.99"',
+            '"9TH AVE. MARKET","****","10/17/2018","02:46 PM","9.99"',
+        ])
+
+    def _import_file(self, account, lines):
+        import_file = ImportFile(account=account, importer='pc_mastercard', batch=self.batch)
+        import_file.file.save('statement.csv', ContentFile(MASTERCARD_HEADER + '\n'.join(lines)))
+        return import_file
+
+    def test_parse_files_keeps_order(self):
+        paths = [os.path.join(self.base_dir, 'president-choice-mastercard.csv'),
+                 self.card_file.file.path]
+        parsed = parallel.parse_files([('pc_mastercard', path) for path in paths], max_workers=2)
+        self.assertEqual([len(statements) for statements in parsed], [4, 3])
+        self.assertEqual(parsed[0][0].amount, Decimal('-40.03'))
+
+    def test_parse_files_in_process_inside_daemons(self):
+        paths = [os.path.join(self.base_dir, 'president-choice-mastercard.csv'),
+                 self.card_file.file.path]
+        with mock.patch('multiprocessing.current_process') as current_process, \
+                mock.patch.object(parallel, 'ProcessPoolExecutor') as executor:
+            current_process.return_value.daemon = True
+            parsed = parallel.parse_files([('pc_mastercard', path) for path in paths])
+        executor.assert_not_called()
+        self.assertEqual([len(statements) for statements in parsed], [4, 3])
+
+    def test_upload_creates_batch(self):
+        with open(os.path.join(self.base_dir, 'president-choice-mastercard.csv'), 'rb') as first, \
+                open(os.path.join(self.base_dir, 'president-choice-mastercard.csv'), 'rb') as second:
+            response = self.client.post(reverse('import_batch_upload'), {
+                'form-TOTAL_FORMS': '3', 'form-INITIAL_FORMS': '0',
+                'form-0-file': first, 'form-0-account': self.checking.pk, 'form-0-importer': 'pc_mastercard',
+                'form-1-file': second, 'form-1-account': self.credit_card.pk, 'form-1-importer': 'pc_mastercard',
+                'form-2-importer': '',
+            })
+        batch = ImportBatch.objects.latest('created_at')
+        self.assertRedirects(response, reverse('import_batch_process', args=[batch.pk]),
+                             fetch_redirect_response=False)
+        self.assertEqual(batch.files.count(), 2)
+
+    def test_preview_detects_cross_file_duplicates(self):
+        response = self.client.get(reverse('import_batch_process', args=[self.batch.pk]))
+        data = response.context['data']
+        self.assertEqual(len(data), 5)
+        self.assertEqual([d.book_date for d in data], sorted(d.book_date for d in data))
+        ignored = [d for d in data if getattr(d, 'ignore', False)]
+        self.assertEqual(len(ignored), 1)
+        # the card payment shows up as a deposit on the card and a withdrawal on checking
+        payment = next(d for d in data if d.import_file == self.checking_file and d.amount == -200)
+        self.assertEqual(payment.suggested_account, self.credit_card)
+        self.assertIn(next(d for d in data if d.amount == 200), ignored)
+
+    def test_identical_rows_of_one_file_are_kept(self):
+        overlapping = self._import_file(self.credit_card, [
+            '"9TH AVE. MARKET","****","10/17/2018","02:46 PM","9.99"',
+        ])
+        response = self.client.get(reverse('import_batch_process', args=[self.batch.pk]))
+        market = [d for d in response.context['data'] if d.amount == Decimal('-9.99')]
+        self.assertEqual([d.import_file for d in market],
+                         [self.card_file, self.card_file, overlapping])
+        self.assertEqual([getattr(d, 'ignore', False) for d in market], [False, False, True])
+
+    def test_batch_job_commits_all_files(self):
+        response = self.client.post(reverse('import_batch_process', args=[self.batch.pk]), {
+            'title-0': 'Market', 'account-0': 'Market', 'recurrence-0': '-1',
+            'file-0': str(self.card_file.pk), 'row-0': '1',
+            'title-1': 'Groceries', 'account-1': 'Sobeys', 'recurrence-1': '-1',
+            'file-1': str(self.checking_file.pk), 'row-1': '1',
+            'title-2': 'Card payment', 'account-2': 'Credit Card', 'recurrence-2': '-1',
+            'file-2': str(self.checking_file.pk), 'row-2': '0',
+        })
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, reverse('import_job', args=[job.pk]))
+        self.assertEqual(job.batch, self.batch)
+        call_command('runjobs', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.rows_parsed, 5)
+        self.assertEqual(job.rows_committed, 3)
+        self.assertEqual(Transaction.objects.filter(transaction_type=Transaction.TRANSFER).count(), 1)
+        self.assertEqual(self.credit_card.balance, Decimal('190.01'))
@@ -0,0 +1,71 @@
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from silverstrike import ledger
+from silverstrike.models import (Account, AccountAlias, AccountType, Budget, Category,
+                                 RecurringTransaction, Split, Transaction)
+from silverstrike.tests import create_account, create_transaction
+
+
+def _snapshot():
+    return {model._meta.model_name: list(model.objects.order_by('pk').values())
+            for model in ledger.LEDGER_MODELS}
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        checking = create_account('Checking')
+        shop = create_account('Shop', AccountType.FOREIGN)
+        AccountAlias.objects.create(kind=AccountAlias.IBAN, value='DE123', account=shop)
+        groceries = Category.objects.create(name='Groceries')
+        Budget.objects.create(category=groceries, month=date(2019, 1, 1), amount='100.50')
+        recurrence = RecurringTransaction.objects.create(
+            title='Rent', amount=800, date=date(2019, 1, 1), src=checking, dst=shop,
+            interval=RecurringTransaction.MONTHLY, transaction_type=Transaction.WITHDRAW)
+        for day in range(1, 6):
+            t = create_transaction('Shopping', checking, shop, Decimal('12.34'), Transaction.WITHDRAW,
+                                   date(2019, 1, day), groceries)
+        t.recurrence = recurrence
+        t.notes = 'Ünïcode "notes"\nwith a new line'
+        t.save()
+        self.directory = tempfile.mkdtemp()
+
+    def _round_trip(self, name):
+        path = os.path.join(self.directory, name)
+        before = _snapshot()
+        call_command('dumpledger', path, stdout=StringIO())
+        for model in reversed(ledger.LEDGER_MODELS):
+            model.objects.all().delete()
+        Account.objects.create(name='System Account', account_type=AccountType.SYSTEM)
+        output = StringIO()
+        call_command('loadledger', path, stdout=output)
+        self.assertIn('Restored 23 rows', output.getvalue())
+        self.assertEqual(_snapshot(), before)
+        # new rows do not collide with the restored primary keys
+        create_transaction('After restore', Account.objects.get(name='Checking'),
+                           Account.objects.get(name='Shop'), 1, Transaction.WITHDRAW)
+
+    def test_round_trip(self):
+        self._round_trip('ledger.jsonl')
+
+    def test_round_trip_gzip(self):
+        self._round_trip('ledger.jsonl.gz')
+
+    def test_load_needs_empty_database(self):
+        path = os.path.join(self.directory, 'ledger.jsonl')
+        call_command('dumpledger', path, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('loadledger', path, stdout=StringIO())
+        self.assertEqual(Split.objects.count(), 10)
+
+    def test_chunks(self):
+        lines = ''.join(ledger.dump_lines(chunk_size=3)).splitlines()
+        # header, one line per model and 23 rows
+        self.assertEqual(len(lines), 1 + len(ledger.LEDGER_MODELS) + 23)
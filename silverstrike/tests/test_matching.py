@@ -0,0 +1,99 @@
+import json
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from silverstrike.matching import merge_join
+from silverstrike.models import AccountAlias, AccountType, ImportFile, ImportJob, Split, Transaction
+from silverstrike.tests import create_account, create_transaction
+
+
+class MergeJoinTests(TestCase):
+    def test_window(self):
+        statements = [(Decimal('-10'), date(2018, 1, 5), date(2018, 1, 5), 'statement')]
+        self.assertEqual(merge_join(statements, [(Decimal('-10'), date(2018, 1, 2), 'split')]),
+                         [('statement', 'split')])
+        self.assertEqual(merge_join(statements, [(Decimal('-10'), date(2018, 1, 1), 'split')]), [])
+        self.assertEqual(merge_join(statements, [(Decimal('-10'), date(2018, 1, 1), 'split')],
+                                    window=4), [('statement', 'split')])
+        self.assertEqual(merge_join(statements, [(Decimal('-11'), date(2018, 1, 5), 'split')]), [])
+
+    def test_booking_and_value_date(self):
+        statements = [(Decimal('5'), date(2018, 1, 1), date(2018, 1, 10), 'statement')]
+        splits = [(Decimal('5'), date(2018, 1, 10), 'split')]
+        self.assertEqual(merge_join(statements, splits, window=0), [('statement', 'split')])
+
+    def test_every_split_is_matched_once(self):
+        statements = [
+            (Decimal('-3'), date(2018, 1, 1), date(2018, 1, 1), 'a'),
+            (Decimal('-3'), date(2018, 1, 2), date(2018, 1, 4), 'b'),
+            (Decimal('-3'), date(2018, 1, 2), date(2018, 1, 2), 'c'),
+            (Decimal('7'), date(2018, 1, 2), date(2018, 1, 2), 'd'),
+        ]
+        splits = [
+            (Decimal('-3'), date(2018, 1, 4), 'x'),
+            (Decimal('-3'), date(2018, 1, 1), 'y'),
+            (Decimal('1'), date(2018, 1, 2), 'z'),
+        ]
+        pairs = merge_join(statements, splits, window=0)
+        # a greedy match in input order would give x to b and leave c without a split
+        self.assertEqual(sorted(pairs), [('a', 'y'), ('b', 'x')])
+        pairs = merge_join(statements, splits, window=1)
+        self.assertEqual(len(pairs), 2)
+        self.assertEqual(len({split for _, split in pairs}), 2)
+
+
+MASTERCARD_HEADER = '"Merchant Name","Card Used For Transaction","Date","Time","Amount"\n'
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportMatchTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(username='admin', email='email@example.com', password='pass')
+        self.client.login(username='admin', password='pass')
+        self.card = create_account('Credit Card')
+        self.shop = create_account('Sobeys', AccountType.FOREIGN)
+        # entered by hand two days before the bank booked it
+        self.transaction = create_transaction('Groceries', self.card, self.shop, Decimal('40.03'),
+                                              Transaction.WITHDRAW, date(2018, 10, 16))
+        self.import_file = ImportFile(account=self.card, importer='pc_mastercard')
+        self.import_file.file.save('statement.csv', ContentFile(MASTERCARD_HEADER + '\n'.join([
+            '"SOBEYS QPS","****","10/18/2018","06:46 PM","40.03"',
+            '"ESSO","****","10/18/2018","09:20 AM","46.38"',
+        ])))
+
+    def test_preview_proposes_matches(self):
+        split = Split.objects.get(account=self.card)
+        response = self.client.get(reverse('import_process', args=[self.import_file.pk]))
+        self.assertEqual([getattr(d, 'match', None) for d in response.context['data']],
+                         [split, None])
+        self.assertContains(response, 'name="match-0" value="{}" checked'.format(split.id))
+        response = self.client.get(reverse('import_process', args=[self.import_file.pk]),
+                                   {'window': '1'})
+        self.assertEqual([getattr(d, 'match', None) for d in response.context['data']],
+                         [None, None])
+
+    def test_confirmed_match_is_linked(self):
+        split = Split.objects.get(account=self.card)
+        self.client.post(reverse('import_process', args=[self.import_file.pk]), {
+            'title-0': '', 'account-0': '', 'recurrence-0': '-1', 'match-0': str(split.id),
+            'title-1': 'Fuel', 'account-1': 'Esso', 'recurrence-1': '-1',
+        })
+        job = ImportJob.objects.get()
+        self.assertEqual(json.loads(job.data)[0], {'file': str(self.import_file.pk), 'row': 0,
+                                                   'match': split.id})
+        call_command('runjobs', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.rows_committed, 2)
+        self.assertEqual(Transaction.objects.count(), 2)
+        split.refresh_from_db()
+        self.assertEqual(split.date, date(2018, 10, 18))
+        self.assertEqual(list(self.shop.aliases.values_list('kind', 'value')),
+                         [(AccountAlias.NAME, '****')])
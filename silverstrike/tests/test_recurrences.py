@@ -0,0 +1,108 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+
+from silverstrike.models import (Account, AccountType, Category, RecurringTransaction, Split,
+                                 Transaction)
+from silverstrike.recurrences import process_due_recurrences
+
+
+class ProcessRecurrencesTests(TestCase):
+    until = date(2024, 3, 31)
+
+    def setUp(self):
+        self.checking = Account.objects.create(name='Checking')
+        self.savings = Account.objects.create(name='Savings')
+        self.foreign = Account.objects.create(name='Foreign', account_type=AccountType.FOREIGN)
+        self.category = Category.objects.create(name='Home')
+        self.rent = self._recurrence('rent', self.checking, self.foreign, '900', date(2024, 1, 1),
+                                     RecurringTransaction.MONTHLY, Transaction.WITHDRAW,
+                                     usual_month_day=1, category=self.category)
+        self.saving = self._recurrence('saving', self.checking, self.savings, '50',
+                                       date(2024, 3, 15), RecurringTransaction.WEEKLY,
+                                       Transaction.TRANSFER)
+        self.future = self._recurrence('future', self.foreign, self.checking, '10',
+                                       date(2024, 4, 1), RecurringTransaction.MONTHLY,
+                                       Transaction.DEPOSIT)
+        self.disabled = self._recurrence('disabled', self.checking, self.foreign, '5',
+                                         date(2024, 1, 1), RecurringTransaction.DISABLED,
+                                         Transaction.WITHDRAW)
+
+    def _recurrence(self, title, src, dst, amount, start, interval, transaction_type, **kwargs):
+        return RecurringTransaction.objects.create(
+            title=title, src=src, dst=dst, amount=Decimal(amount), date=start,
+            interval=interval, transaction_type=transaction_type, **kwargs)
+
+    def test_due_occurrences_are_entered(self):
+        # the due recurrences, entered ones, both bulk inserts and the bulk update, all
+        # inside one savepoint
+        with self.assertNumQueries(7):
+            self.assertEqual(process_due_recurrences(self.until), (6, 2))
+        rent = Transaction.objects.filter(recurrence=self.rent).order_by('date')
+        self.assertEqual([t.date for t in rent],
+                         [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)])
+        self.assertEqual([t.date for t in Transaction.objects.filter(recurrence=self.saving)],
+                         [date(2024, 3, 29), date(2024, 3, 22), date(2024, 3, 15)])
+        transaction = rent[0]
+        self.assertEqual((transaction.title, transaction.src, transaction.dst, transaction.amount,
+                          transaction.transaction_type),
+                         ('rent', self.checking, self.foreign, 900, Transaction.WITHDRAW))
+        splits = transaction.splits.order_by('amount')
+        self.assertEqual([(s.account, s.opposing_account, s.amount, s.date, s.category)
+                          for s in splits],
+                         [(self.checking, self.foreign, -900, date(2024, 1, 1), self.category),
+                          (self.foreign, self.checking, 900, date(2024, 1, 1), self.category)])
+        self.assertEqual(Split.objects.count(), 12)
+        for recurrence, expected in ((self.rent, date(2024, 4, 1)),
+                                     (self.saving, date(2024, 4, 5)),
+                                     (self.future, date(2024, 4, 1)),
+                                     (self.disabled, date(2024, 1, 1))):
+            recurrence.refresh_from_db()
+            self.assertEqual(recurrence.date, expected)
+        self.assertGreater(self.rent.last_modified, self.future.last_modified)
+
+    def test_running_again_creates_nothing(self):
+        process_due_recurrences(self.until)
+        self.assertEqual(process_due_recurrences(self.until), (0, 0))
+        self.assertEqual(Transaction.objects.count(), 6)
+
+    def test_entered_occurrences_are_left_out(self):
+        Transaction.objects.create(title='rent', date=date(2024, 2, 1), src=self.checking,
+                                   dst=self.foreign, amount=900, recurrence=self.rent,
+                                   transaction_type=Transaction.WITHDRAW)
+        self.assertEqual(process_due_recurrences(self.until), (5, 2))
+        self.assertEqual(Transaction.objects.filter(recurrence=self.rent).count(), 3)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_recurrences_are_locked(self):
+        with CaptureQueriesContext(connection) as queries:
+            process_due_recurrences(self.until)
+        locking = [q['sql'] for q in queries if 'FOR UPDATE' in q['sql']]
+        self.assertEqual(len(locking), 1)
+        self.assertIn(RecurringTransaction._meta.db_table, locking[0])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('processrecurrences', '--until', '2024-03-31', stdout=out)
+        self.assertIn('Created 6 transaction(s) and advanced 2 recurrence(s)', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('processrecurrences', '--until', '2024-02-30')
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin'))
+        response = client.post('/rest/recurrences/process/', {'until': '2024-03-31'},
+                               format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'transactions': 6, 'recurrences': 2})
+        response = client.post('/rest/recurrences/process/', {'until': 'soon'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Transaction.objects.count(), 6)
@@ -0,0 +1,546 @@
+import base64
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from silverstrike.models import (Account, AccountType, Category, RecurringTransaction, Split,
+                                 Transaction)
+from silverstrike.rest import views
+from silverstrike.rest.authentication import CachedTokenAuthentication, invalidate_credentials
+from silverstrike.rest.pagination import AmountPagination
+from silverstrike.rest.serializers import AccountSerializer, SplitSerializer, TransactionSerializer
+from silverstrike.tests import create_transaction
+
+
+def _transaction(src, dst, amount, title='Groceries', category=None):
+    split = {'title': title, 'date': '2022-01-02', 'category': category}
+    return {
+        'title': title,
+        'date': '2022-01-02',
+        'transaction_type': Transaction.WITHDRAW,
+        'splits': [
+            dict(split, account=src.id, opposing_account=dst.id, amount=str(-amount)),
+            dict(split, account=dst.id, opposing_account=src.id, amount=str(amount)),
+        ]
+    }
+
+
+class BulkTransactionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin'))
+        self.personal = Account.objects.create(name='Personal')
+        self.foreign = Account.objects.create(name='Foreign', account_type=AccountType.FOREIGN)
+        self.category = Category.objects.create(name='Food')
+
+    def test_bulk_create(self):
+        data = [_transaction(self.personal, self.foreign, i + 1, 'Groceries {}'.format(i),
+                             self.category.id) for i in range(50)]
+        with self.assertNumQueries(7):
+            response = self.client.post('/rest/transactions/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        results = response.json()['results']
+        self.assertEqual(len(results), 50)
+        self.assertEqual(Transaction.objects.count(), 50)
+        self.assertEqual(Split.objects.count(), 100)
+        for i, result in enumerate(results):
+            transaction = Transaction.objects.get(id=result['id'])
+            self.assertEqual(transaction.title, 'Groceries {}'.format(i))
+            self.assertEqual(transaction.src, self.personal)
+            self.assertEqual(transaction.dst, self.foreign)
+            self.assertEqual(transaction.amount, i + 1)
+            self.assertEqual(sorted(transaction.splits.values_list('id', flat=True)),
+                             result['splits'])
+        self.assertEqual(Split.objects.filter(category=self.category).count(), 100)
+
+    def test_invalid_item_creates_nothing(self):
+        unbalanced = _transaction(self.personal, self.foreign, 5)
+        unbalanced['splits'][1]['amount'] = '4'
+        data = [_transaction(self.personal, self.foreign, 1), unbalanced,
+                _transaction(self.personal, self.foreign, 3)]
+        response = self.client.post('/rest/transactions/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual(results[0], {'errors': {}})
+        self.assertIn('non_field_errors', results[1]['errors'])
+        self.assertEqual(results[2], {'errors': {}})
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(Split.objects.exists())
+
+    def test_rejects_non_list_and_too_many(self):
+        response = self.client.post('/rest/transactions/bulk/',
+                                    _transaction(self.personal, self.foreign, 1), format='json')
+        self.assertEqual(response.status_code, 400)
+        data = [_transaction(self.personal, self.foreign, 1)] * (views.BULK_LIMIT + 1)
+        response = self.client.post('/rest/transactions/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_single_create_fills_in_accounts(self):
+        response = self.client.post('/rest/transactions/',
+                                    _transaction(self.personal, self.foreign, 7), format='json')
+        self.assertEqual(response.status_code, 201)
+        transaction = Transaction.objects.get()
+        self.assertEqual(transaction.src, self.personal)
+        self.assertEqual(transaction.dst, self.foreign)
+        self.assertEqual(transaction.amount, Decimal(7))
+        self.assertEqual(transaction.splits.count(), 2)
+
+
+class TransactionUpdateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin'))
+        self.personal = Account.objects.create(name='Personal')
+        self.payees = [Account.objects.create(name='Payee {}'.format(i),
+                                              account_type=AccountType.FOREIGN)
+                       for i in range(10)]
+        self.category = Category.objects.create(name='Food')
+
+    def _create(self, payees):
+        data = _transaction(self.personal, payees[0], 1)
+        data['splits'] = [split for payee in payees
+                          for split in _transaction(self.personal, payee, 1)['splits']]
+        response = self.client.post('/rest/transactions/', data, format='json')
+        return response.json()
+
+    def _update(self, data):
+        for split in data['splits']:
+            split['title'] = 'Changed'
+            split['category'] = self.category.id
+        return self.client.put('/rest/transactions/{}/'.format(data['id']), data,
+                               format='json')
+
+    def test_update_costs_constant_queries(self):
+        small = self._create(self.payees[:1])
+        large = self._create(self.payees)
+        self.assertEqual(len(large['splits']), 20)
+        with self.assertNumQueries(13) as small_queries:
+            self._update(small)
+        with self.assertNumQueries(len(small_queries)):
+            response = self._update(large)
+        self.assertEqual(response.status_code, 200)
+        splits = Split.objects.filter(transaction_id=large['id'])
+        self.assertEqual(splits.filter(title='Changed', category=self.category).count(), 20)
+
+    def test_missing_splits_are_deleted_and_new_ones_created(self):
+        data = self._create(self.payees[:2])
+        kept = data['splits'][:2]
+        new = _transaction(self.personal, self.payees[5], 3)['splits']
+        data['splits'] = kept + new
+        response = self.client.put('/rest/transactions/{}/'.format(data['id']), data,
+                                   format='json')
+        self.assertEqual(response.status_code, 200)
+        transaction = Transaction.objects.get(id=data['id'])
+        self.assertEqual(transaction.splits.count(), 4)
+        self.assertTrue(transaction.splits.filter(id=kept[0]['id']).exists())
+        self.assertEqual(transaction.splits.filter(account=self.payees[1]).count(), 0)
+        self.assertEqual(transaction.splits.filter(account=self.payees[5]).count(), 1)
+        self.assertEqual(transaction.amount, 4)
+
+    def test_partial_update(self):
+        data = self._create(self.payees[:1])
+        url = '/rest/transactions/{}/'.format(data['id'])
+        outgoing, incoming = data['splits']
+        response = self.client.patch(url, {'splits': [{'id': outgoing['id'], 'amount': '-12'},
+                                                      {'id': incoming['id'], 'amount': '12'}]},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        transaction = Transaction.objects.get(id=data['id'])
+        self.assertEqual((transaction.src, transaction.dst, transaction.amount),
+                         (self.personal, self.payees[0], 12))
+        self.assertEqual(sorted(s.amount for s in transaction.splits.all()), [-12, 12])
+        response = self.client.patch(url, {'splits': [{'id': outgoing['id'], 'amount': '-5'},
+                                                      {'id': incoming['id']}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(url, {'title': 'Changed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        transaction.refresh_from_db()
+        self.assertEqual((transaction.title, transaction.amount), ('Changed', 12))
+
+    def test_rejects_splits_of_other_transactions(self):
+        data = self._create(self.payees[:1])
+        other = self._create(self.payees[1:2])
+        data['splits'][0]['id'] = other['splits'][0]['id']
+        data['title'] = 'Changed'
+        response = self.client.put('/rest/transactions/{}/'.format(data['id']), data,
+                                   format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('splits', response.json())
+        self.assertEqual(Transaction.objects.get(id=data['id']).title, 'Groceries')
+        self.assertEqual(Split.objects.count(), 4)
+
+
+class QueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin'))
+        self.personal = Account.objects.create(name='Personal')
+        self.foreign = Account.objects.create(name='Foreign', account_type=AccountType.FOREIGN)
+
+    def _create(self, count):
+        for i in range(count):
+            create_transaction('Transaction {}'.format(i), self.personal, self.foreign,
+                               Decimal(i + 1), Transaction.WITHDRAW)
+
+    def test_transaction_list_queries_do_not_grow_with_page(self):
+        self._create(1)
+        with self.assertNumQueries(3):
+            response = self.client.get('/rest/transactions/')
+        self.assertEqual(len(response.json()['results']), 1)
+        self._create(24)
+        with self.assertNumQueries(3):
+            response = self.client.get('/rest/transactions/')
+        results = response.json()['results']
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(len(result['splits']) == 2 for result in results))
+
+    def test_account_transactions_are_ordered(self):
+        self._create(25)
+        seen = []
+        for page in (1, 2, 3):
+            with self.assertNumQueries(3):
+                response = self.client.get('/rest/accounts/{}/transactions/?page={}'.format(
+                    self.personal.id, page))
+            seen.extend(split['id'] for split in response.json()['results'])
+        expected = Split.objects.filter(account=self.personal).order_by('-date', '-id')
+        self.assertEqual(seen, list(expected.values_list('id', flat=True)))
+
+    def test_other_lists_use_constant_queries(self):
+        for i in range(12):
+            Account.objects.create(name='Account {}'.format(i))
+            Category.objects.create(name='Category {}'.format(i))
+            RecurringTransaction.objects.create(
+                title='Rent {}'.format(i), amount=800, date=date(2019, 1, 1),
+                src=self.personal, dst=self.foreign, interval=RecurringTransaction.MONTHLY,
+                transaction_type=Transaction.WITHDRAW)
+        # categories aren't paginated, the others count the rows first
+        for url, queries in (('/rest/accounts/', 2), ('/rest/categories/', 1),
+                             ('/rest/recurrences/', 2)):
+            with self.assertNumQueries(queries):
+                self.client.get(url)
+
+
+@mock.patch('silverstrike.export.CURSOR_OVERLAP', timedelta(0))
+class ChangesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin'))
+        self.personal = Account.objects.create(name='Personal')
+        self.foreign = Account.objects.create(name='Foreign', account_type=AccountType.FOREIGN)
+        self.category = Category.objects.create(name='Food')
+        self.first = create_transaction('First', self.personal, self.foreign, Decimal(1),
+                                        Transaction.WITHDRAW)
+        self.second = create_transaction('Second', self.personal, self.foreign, Decimal(2),
+                                         Transaction.WITHDRAW)
+
+    def test_full_sync(self):
+        data = self.client.get('/rest/changes').json()
+        self.assertTrue(data['cursor'].endswith('Z'))
+        self.assertEqual([a['name'] for a in data['accounts']],
+                         list(Account.objects.order_by('id').values_list('name', flat=True)))
+        self.assertEqual([c['name'] for c in data['categories']], ['Food'])
+        self.assertEqual([t['id'] for t in data['transactions']], [self.first.id, self.second.id])
+        self.assertEqual(len(data['transactions'][0]['splits']), 2)
+        self.assertEqual(data['deleted'], [])
+
+    def test_in_sync_costs_one_query(self):
+        cursor = self.client.get('/rest/changes').json()['cursor']
+        with self.assertNumQueries(1):
+            data = self.client.get('/rest/changes', {'cursor': cursor}).json()
+        self.assertGreaterEqual(data['cursor'], cursor)
+        for key in ('accounts', 'categories', 'transactions', 'recurrences', 'deleted'):
+            self.assertEqual(data[key], [])
+
+    def test_delta(self):
+        cursor = self.client.get('/rest/changes').json()['cursor']
+        self.category.name = 'Groceries'
+        self.category.save()
+        # changed through a bulk update that only touches the split
+        Split.objects.filter(transaction=self.first).update(category=self.category,
+                                                            last_modified=timezone.now())
+        second_id = self.second.id
+        self.second.delete()
+        data = self.client.get('/rest/changes', {'cursor': cursor}).json()
+        self.assertEqual(data['accounts'], [])
+        self.assertEqual([c['name'] for c in data['categories']], ['Groceries'])
+        self.assertEqual([t['id'] for t in data['transactions']], [self.first.id])
+        self.assertEqual({s['category'] for s in data['transactions'][0]['splits']},
+                         {self.category.id})
+        self.assertIn({'model': 'transaction', 'id': second_id}, data['deleted'])
+        self.assertEqual(len([d for d in data['deleted'] if d['model'] == 'split']), 2)
+
+        data = self.client.get('/rest/changes', {'cursor': data['cursor']}).json()
+        self.assertEqual(data['deleted'], [])
+        self.assertEqual(data['transactions'], [])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/rest/changes', {'cursor': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_overlaps_open_transactions(self):
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (Account, Category, Transaction, Split):
+            model.objects.update(last_modified=hour_ago)
+        with mock.patch('silverstrike.export.CURSOR_OVERLAP', timedelta(minutes=5)):
+            taken = timezone.now()
+            cursor = self.client.get('/rest/changes').json()['cursor']
+            # saved by a database transaction that was still open when the cursor was taken
+            Transaction.objects.filter(pk=self.first.pk).update(
+                last_modified=taken - timedelta(minutes=1))
+            data = self.client.get('/rest/changes', {'cursor': cursor}).json()
+        self.assertEqual([t['id'] for t in data['transactions']], [self.first.id])
+
+
+class FilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin'))
+        self.personal = Account.objects.create(name='Personal')
+        self.shop = Account.objects.create(name='Shop', account_type=AccountType.FOREIGN)
+        self.employer = Account.objects.create(name='Employer', account_type=AccountType.FOREIGN)
+        self.food = Category.objects.create(name='Food')
+        for day in range(1, 21):
+            create_transaction('Shopping {}'.format(day), self.personal, self.shop,
+                               Decimal(day), Transaction.WITHDRAW, date(2022, 1, day),
+                               self.food if day % 2 else None)
+        self.salary = create_transaction('Salary', self.employer, self.personal, Decimal(1000),
+                                         Transaction.DEPOSIT, date(2022, 1, 15))
+
+    def _get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_transaction_filters(self):
+        data = self._get('/rest/transactions/', date_from='2022-01-05', date_to='2022-01-09',
+                         transaction_type=Transaction.WITHDRAW)
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(data['total'], '35.00')
+        self.assertEqual(self._get('/rest/transactions/', category=self.food.id)['count'], 10)
+        self.assertEqual(self._get('/rest/transactions/', account=self.employer.id)['count'], 1)
+        self.assertEqual(self._get('/rest/transactions/',
+                                   opposing_account=self.shop.id)['count'], 20)
+        data = self._get('/rest/transactions/', amount_min='18', amount_max='1000')
+        self.assertEqual(data['count'], 4)
+
+    def test_ordering_page_size_and_totals(self):
+        data = self._get('/rest/transactions/', ordering='-amount', page_size=3)
+        self.assertEqual([t['title'] for t in data['results']],
+                         ['Salary', 'Shopping 20', 'Shopping 19'])
+        self.assertEqual(data['count'], 21)
+        self.assertEqual(data['total'], '1210.00')
+        self.assertEqual(data['page_total'], '1039.00')
+        with mock.patch.object(AmountPagination, 'max_page_size', 5):
+            data = self._get('/rest/transactions/', page_size=10000)
+        self.assertEqual(len(data['results']), 5)
+
+    def test_account_transactions(self):
+        url = '/rest/accounts/{}/transactions/'.format(self.personal.id)
+        data = self._get(url, category=self.food.id, ordering='amount', page_size=2)
+        self.assertEqual(data['count'], 10)
+        self.assertEqual([s['amount'] for s in data['results']], ['-19.00', '-17.00'])
+        self.assertEqual(data['total'], '-100.00')
+        self.assertEqual(data['page_total'], '-36.00')
+        data = self._get(url, transaction_type=Transaction.DEPOSIT)
+        self.assertEqual(data['total'], '1000.00')
+
+    def test_invalid_parameters(self):
+        for params in ({'date_from': 'soon'}, {'category': 'food'}, {'ordering': 'notes'},
+                       {'transaction_type': 9}):
+            response = self.client.get('/rest/transactions/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(list(params)[0], response.json())
+
+
+class ValuesReaderTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin'))
+        self.personal = Account.objects.create(name='Personal', iban='DE1234')
+        self.foreign = Account.objects.create(name='Foreign', account_type=AccountType.FOREIGN)
+        self.food = Category.objects.create(name='Food')
+        for i in range(12):
+            create_transaction('Transaction {}'.format(i), self.personal, self.foreign,
+                               Decimal('1.5') * (i + 1), Transaction.WITHDRAW,
+                               date(2022, 1, i + 1), self.food if i % 2 else None)
+
+    def _assert_same(self, reader, serializer_class, queryset):
+        rows = queryset.values(*reader.columns(reader.names))
+        self.assertEqual(reader.read(rows, reader.names),
+                         [dict(item) for item in serializer_class(queryset, many=True).data])
+
+    def test_same_representation_as_serializers(self):
+        self._assert_same(views.ValuesReader(TransactionSerializer), TransactionSerializer,
+                          views.TransactionViewSet.queryset)
+        self._assert_same(views.ValuesReader(AccountSerializer), AccountSerializer,
+                          Account.objects.order_by('id'))
+        self._assert_same(views.ValuesReader(SplitSerializer), SplitSerializer,
+                          Split.objects.order_by('id'))
+
+    def test_sparse_fieldsets(self):
+        data = self.client.get('/rest/transactions/', {'fields': 'id,title'}).json()
+        self.assertEqual(data['count'], 12)
+        self.assertEqual(data['results'][0], {'id': Transaction.objects.get(
+            title='Transaction 11').id, 'title': 'Transaction 11'})
+        self.assertEqual(data['page_total'], '112.50')
+        data = self.client.get('/rest/accounts/', {'fields': 'name'}).json()
+        self.assertIn({'name': 'Personal'}, data['results'])
+        data = self.client.get('/rest/accounts/{}/transactions/'.format(self.personal.id),
+                               {'fields': 'amount,category', 'page_size': 1}).json()
+        self.assertEqual(data['results'], [{'amount': '-18.00', 'category': self.food.id}])
+        with self.assertNumQueries(3):
+            data = self.client.get('/rest/transactions/', {'fields': 'splits'}).json()
+        self.assertEqual(len(data['results'][0]['splits']), 2)
+
+    def test_unknown_fields(self):
+        response = self.client.get('/rest/transactions/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json())
+
+
+class AggregateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin'))
+        self.personal = Account.objects.create(name='Personal')
+        self.shop = Account.objects.create(name='Shop', account_type=AccountType.FOREIGN)
+        self.employer = Account.objects.create(name='Employer', account_type=AccountType.FOREIGN)
+        self.food = Category.objects.create(name='Food')
+        for month in (1, 2):
+            for day in (1, 10, 20):
+                create_transaction('Shopping', self.personal, self.shop, Decimal(day),
+                                   Transaction.WITHDRAW, date(2022, month, day), self.food)
+            create_transaction('Salary', self.employer, self.personal, Decimal(1000),
+                               Transaction.DEPOSIT, date(2022, month, 28))
+
+    def _get(self, **params):
+        response = self.client.get('/rest/aggregate', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def test_group_by_month_and_category(self):
+        self.assertEqual(self._get(group_by='month,category'), [
+            {'month': '2022-01-01', 'category': None, 'value': '1000.00'},
+            {'month': '2022-01-01', 'category': self.food.id, 'value': '-31.00'},
+            {'month': '2022-02-01', 'category': None, 'value': '1000.00'},
+            {'month': '2022-02-01', 'category': self.food.id, 'value': '-31.00'},
+        ])
+
+    def test_metrics_and_filters(self):
+        self.assertEqual(self._get(group_by='transaction_type', metric='count'), [
+            {'transaction_type': Transaction.DEPOSIT, 'value': 2},
+            {'transaction_type': Transaction.WITHDRAW, 'value': 6},
+        ])
+        self.assertEqual(self._get(metric='avg', category=self.food.id), [{'value': '-10.33'}])
+        self.assertEqual(self._get(group_by='opposing_account', metric='min',
+                                   date_from='2022-02-01'), [
+            {'opposing_account': self.shop.id, 'value': '-20.00'},
+            {'opposing_account': self.employer.id, 'value': '1000.00'},
+        ])
+        self.assertEqual(self._get(group_by='week', metric='max', date_to='2022-01-05'),
+                         [{'week': '2021-12-27', 'value': '-1.00'}])
+        self.assertEqual(self._get(date_from='2023-01-01'), [{'value': None}])
+
+    def test_results_are_cached_until_data_changes(self):
+        self.assertEqual(self._get(), [{'value': '1938.00'}])
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get(), [{'value': '1938.00'}])
+        create_transaction('Shopping', self.personal, self.shop, Decimal(38),
+                           Transaction.WITHDRAW, date(2022, 3, 1))
+        self.assertEqual(self._get(), [{'value': '1900.00'}])
+        Transaction.objects.filter(title='Salary').delete()
+        self.assertEqual(self._get(), [{'value': '-100.00'}])
+
+    def test_invalid_parameters(self):
+        for params in ({'group_by': 'title'}, {'group_by': 'month,month'}, {'metric': 'median'},
+                       {'date_from': 'soon'}):
+            response = self.client.get('/rest/aggregate', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(list(params)[0], response.json())
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='admin', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def _basic(self, password='secret'):
+        return 'Basic ' + base64.b64encode('admin:{}'.format(password).encode()).decode()
+
+    def _status(self, header):
+        return self.client.get('/rest/categories/', HTTP_AUTHORIZATION=header).status_code
+
+    def _check_password(self):
+        return mock.patch.object(User, 'check_password', autospec=True,
+                                 side_effect=User.check_password)
+
+    def test_password_is_hashed_once(self):
+        with self._check_password() as check_password:
+            for _ in range(3):
+                self.assertEqual(self._status(self._basic()), 200)
+        self.assertEqual(check_password.call_count, 1)
+
+    def test_failures_are_not_cached(self):
+        with self._check_password() as check_password:
+            self.assertEqual(self._status(self._basic('wrong')), 401)
+            checks = check_password.call_count
+            self.assertEqual(self._status(self._basic('wrong')), 401)
+        self.assertGreater(checks, 0)
+        self.assertEqual(check_password.call_count, 2 * checks)
+
+    def test_token_is_looked_up_once(self):
+        request = Request(APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION='Token ' + self.token.key))
+        self.assertEqual(CachedTokenAuthentication().authenticate(request),
+                         (self.user, self.token))
+        with self.assertNumQueries(0):
+            user, token = CachedTokenAuthentication().authenticate(request)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+
+    def test_changing_credentials_invalidates_cache(self):
+        token = 'Token ' + self.token.key
+        self.assertEqual(self._status(self._basic()), 200)
+        self.assertEqual(self._status(token), 200)
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(self._status(self._basic()), 401)
+        self.assertEqual(self._status(self._basic('changed')), 200)
+        self.token.delete()
+        self.assertEqual(self._status(token), 401)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._status(self._basic('changed')), 401)
+
+    def test_changes_during_check_are_not_cached(self):
+        original = User.check_password
+
+        def check_password(user, password):
+            invalidate_credentials()
+            return original(user, password)
+
+        with mock.patch.object(User, 'check_password', autospec=True,
+                               side_effect=check_password) as patched:
+            self.assertEqual(self._status(self._basic()), 200)
+            self.assertEqual(self._status(self._basic()), 200)
+        self.assertEqual(patched.call_count, 2)
+
+    def test_login_keeps_cache(self):
+        self.assertEqual(self._status(self._basic()), 200)
+        self.assertTrue(self.client.login(username='admin', password='secret'))
+        self.client.logout()
+        with self._check_password() as check_password:
+            self.assertEqual(self._status(self._basic()), 200)
+        self.assertEqual(check_password.call_count, 0)
@@ -0,0 +1,154 @@
+import os
+import re
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from silverstrike.models import (AccountType, Category, CategoryRule, ImportFile,
+                                 RecurringTransaction, Split, Transaction)
+from silverstrike.rules import RuleSet
+from silverstrike.tests import create_account, create_transaction
+
+
+class RuleSetTests(TestCase):
+    def setUp(self):
+        self.groceries = Category.objects.create(name='Groceries')
+        self.fuel = Category.objects.create(name='Fuel')
+        self.other = Category.objects.create(name='Other')
+
+    def test_payee_and_iban(self):
+        payee = CategoryRule.objects.create(payee='Sobeys', category=self.groceries)
+        iban = CategoryRule.objects.create(iban='DE12 3456', category=self.fuel)
+        rules = RuleSet.load()
+        self.assertEqual(rules.match(payee='  SOBEYS '), payee)
+        self.assertEqual(rules.match(payee='Esso', iban='de123456'), iban)
+        self.assertIsNone(rules.match(payee='Esso'))
+
+    def test_patterns_follow_priority(self):
+        fuel = CategoryRule.objects.create(pattern='esso|shell', category=self.fuel, priority=1)
+        other = CategoryRule.objects.create(pattern='card', category=self.other, priority=2)
+        CategoryRule.objects.create(pattern='esso', category=self.groceries, active=False)
+        rules = RuleSet.load()
+        self.assertEqual(rules.match(text='card payment ESSO'), fuel)
+        self.assertEqual(rules.match(text='card payment'), other)
+        self.assertIsNone(rules.match(text='transfer'))
+
+    def test_all_conditions_have_to_match(self):
+        big = CategoryRule.objects.create(pattern='market', max_amount=Decimal('-100'),
+                                          category=self.other)
+        small = CategoryRule.objects.create(pattern='market', min_amount=Decimal('-100'),
+                                            category=self.groceries)
+        payee = CategoryRule.objects.create(payee='Market', pattern='fuel', category=self.fuel,
+                                            priority=1)
+        rules = RuleSet.load()
+        self.assertEqual(rules.match(text='9th ave. market', amount=Decimal('-250')), big)
+        self.assertEqual(rules.match(text='9th ave. market', amount=Decimal('-9.99')), small)
+        self.assertEqual(rules.match(payee='market', text='market fuel', amount=-20), small)
+        self.assertEqual(rules.match(payee='market', text='fuel', amount=-20), payee)
+
+    def test_amount_only_rule(self):
+        rule = CategoryRule.objects.create(min_amount=1000, category=self.other)
+        rules = RuleSet.load()
+        self.assertEqual(rules.match(amount=Decimal('2500')), rule)
+        self.assertIsNone(rules.match(amount=Decimal('10')))
+
+    def test_patterns_that_cannot_be_combined(self):
+        for patterns, text in ((['(?i)rent', 'food'], 'RENT'),
+                               (['(a)\\1', 'b'], 'xaa'),
+                               (['(?P<x>a)', '(?P<x>b)'], 'b')):
+            CategoryRule.objects.all().delete()
+            rules = [CategoryRule.objects.create(pattern=pattern, category=self.other,
+                                                 priority=i)
+                     for i, pattern in enumerate(patterns)]
+            for rule in rules:
+                rule.full_clean()
+            ruleset = RuleSet.load()
+            expected = next(rule for rule in rules if re.search(rule.pattern, text, re.I))
+            self.assertEqual(ruleset.match(text=text), expected, patterns)
+            self.assertIsNone(ruleset.match(text='nothing'), patterns)
+
+    def test_falls_back_to_single_patterns(self):
+        first = CategoryRule.objects.create(pattern='(?P<x>a)', category=self.other, priority=1)
+        second = CategoryRule.objects.create(pattern='(?P<x>b)', category=self.fuel, priority=2)
+        with mock.patch('silverstrike.rules._combinable', return_value=True):
+            rules = RuleSet.load()
+        self.assertEqual(rules.match(text='b'), second)
+        self.assertEqual(rules.match(text='ba'), first)
+        self.assertIsNone(rules.match(text='c'))
+
+    def test_clean(self):
+        with self.assertRaises(ValidationError):
+            CategoryRule(pattern='(', category=self.other).full_clean()
+        with self.assertRaises(ValidationError):
+            CategoryRule(pattern='esso').full_clean()
+        with self.assertRaises(ValidationError):
+            CategoryRule(min_amount=10, max_amount=5, category=self.other).full_clean()
+
+
+class ApplyRulesCommandTests(TestCase):
+    def setUp(self):
+        self.checking = create_account('Checking')
+        self.shop = create_account('Sobeys', AccountType.FOREIGN)
+        self.landlord = create_account('Landlord', AccountType.FOREIGN)
+        self.groceries = Category.objects.create(name='Groceries')
+        self.rent = Category.objects.create(name='Rent')
+        self.recurrence = RecurringTransaction.objects.create(
+            title='Rent', amount=800, date=date.today(), src=self.checking, dst=self.landlord,
+            interval=RecurringTransaction.MONTHLY, transaction_type=Transaction.WITHDRAW)
+        CategoryRule.objects.create(payee='sobeys', category=self.groceries)
+        CategoryRule.objects.create(pattern='^rent', category=self.rent, recurrence=self.recurrence)
+        self.shopping = create_transaction('Shopping', self.checking, self.shop, 20,
+                                           Transaction.WITHDRAW)
+        self.rent_payment = create_transaction('Rent May', self.checking, self.landlord, 800,
+                                               Transaction.WITHDRAW)
+        self.categorised = create_transaction('Shopping', self.checking, self.shop, 30,
+                                              Transaction.WITHDRAW, category=self.rent)
+
+    def _personal_split(self, transaction):
+        return Split.objects.get(transaction=transaction, account=self.checking)
+
+    def test_applyrules(self):
+        output = StringIO()
+        call_command('applyrules', stdout=output)
+        self.assertIn('Categorised 2 split(s) and linked 1 transaction(s)', output.getvalue())
+        self.assertEqual(self._personal_split(self.shopping).category, self.groceries)
+        self.assertEqual(self._personal_split(self.rent_payment).category, self.rent)
+        self.assertEqual(self._personal_split(self.categorised).category, self.rent)
+        self.rent_payment.refresh_from_db()
+        self.assertEqual(self.rent_payment.recurrence, self.recurrence)
+
+    def test_overwrite(self):
+        call_command('applyrules', overwrite=True, stdout=StringIO())
+        self.assertEqual(self._personal_split(self.categorised).category, self.groceries)
+
+    def test_dry_run(self):
+        output = StringIO()
+        call_command('applyrules', dry_run=True, stdout=output)
+        self.assertIn('Would categorise 2 split(s)', output.getvalue())
+        self.assertEqual(Split.objects.exclude(category=None).count(), 2)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportRulesTests(TestCase):
+    def test_preview_suggests_categories(self):
+        User.objects.create_superuser(username='admin', email='email@example.com', password='pass')
+        self.client.login(username='admin', password='pass')
+        fuel = Category.objects.create(name='Fuel')
+        CategoryRule.objects.create(pattern='^esso', category=fuel)
+        path = os.path.join(os.path.dirname(__file__), 'fixtures', 'president-choice-mastercard.csv')
+        with open(path, 'rb') as f:
+            import_file = ImportFile(account=create_account('Credit card'), importer='pc_mastercard')
+            import_file.file.save('statement.csv', File(f))
+        response = self.client.get(reverse('import_process', args=[import_file.pk]))
+        self.assertEqual([getattr(d, 'suggested_category', None) for d in response.context['data']],
+                         [None, None, fuel.id, None])
+        self.assertContains(response, '<option value="{}" selected>Fuel</option>'.format(fuel.id))
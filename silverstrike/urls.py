@@ -122,6 +122,10 @@ urlpatterns = [
          api.get_accounts_balance, name='api_accounts_balance'),
     path('api/category_spending/<dstart>/<dend>/',
          api.category_spending, name='category_spending'),
+    path('api/charts/', api.get_charts, name='api_charts'),
+    path('api/forecast/<int:months>/', api.get_forecast, name='api_forecast'),
+    path('api/import/<uuid:uuid>/progress/',
+         api.get_import_progress, name='api_import_progress'),
     path('api/update_current_recurrences/',
          recurrence_views.ReccurrenceSetNextOccurence.as_view(),
          name='update_current_recurrences'),
@@ -134,6 +138,11 @@ urlpatterns = [
     path('import/upload/', import_views.ImportUploadView.as_view(), name='import_upload'),
     path('import/process/<uuid:uuid>/',
          import_views.ImportProcessView.as_view(), name='import_process'),
+    path('import/upload/batch/',
+         import_views.ImportBatchUploadView.as_view(), name='import_batch_upload'),
+    path('import/process/batch/<uuid:uuid>/',
+         import_views.ImportBatchProcessView.as_view(), name='import_batch_process'),
+    path('import/jobs/<uuid:pk>/', import_views.ImportJobView.as_view(), name='import_job'),
 
     path('import/firefly/', import_views.ImportFireflyView.as_view(), name='import_firefly'),
 
@@ -143,6 +152,9 @@ urlpatterns = [
     path('rest/recurrence_names', rest_views.RecurrenceNameView.as_view()),
     path('rest/accounts/personal', rest_views.PersonalAccountsView.as_view()),
     path('rest/accounts/foreign', rest_views.ForeignAccountsView.as_view()),
+    path('rest/changes', rest_views.ChangesView.as_view()),
+    path('rest/changes/export', rest_views.ChangesExportView.as_view()),
+    path('rest/aggregate', rest_views.AggregateView.as_view()),
     path('rest/', include(router.urls)),
     path('api-token-auth/', drf_views.obtain_auth_token),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
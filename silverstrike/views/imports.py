@@ -1,31 +1,18 @@
-import csv
 import json
-from datetime import date
+from collections import defaultdict
 
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.views import generic
 
+from silverstrike import export
 from silverstrike import forms
-from silverstrike import importers
+from silverstrike import matching
 from silverstrike import models
-
-
-def _update_account(account, data):
-    ibans = json.loads(account.import_ibans)
-    names = json.loads(account.import_names)
-    save = False
-    if data.iban and data.iban not in ibans:
-        ibans.append(data.iban)
-        account.import_ibans = json.dumps(ibans)
-        save = True
-    if data.account and data.account not in names:
-        names.append(data.account)
-        account.import_names = json.dumps(names)
-        save = True
-    if save:
-        account.save()
+from silverstrike.importers import parallel
+from silverstrike.rules import RuleSet
 
 
 class ImportView(LoginRequiredMixin, generic.TemplateView):
@@ -43,127 +30,138 @@ class ImportUploadView(LoginRequiredMixin, generic.edit.CreateView):
             reverse('import_process', args=[self.object.pk]))
 
 
+class ImportBatchUploadView(LoginRequiredMixin, generic.FormView):
+    form_class = forms.ImportBatchUploadFormSet
+    template_name = 'silverstrike/import_batch_upload.html'
+
+    def form_valid(self, formset):
+        batch = models.ImportBatch.objects.create()
+        for form in formset:
+            if form.has_changed():
+                form.instance.batch = batch
+                form.save()
+        return HttpResponseRedirect(reverse('import_batch_process', args=[batch.pk]))
+
+
+def _suggest_accounts(data):
+    iban_accounts, names = models.AccountAlias.objects.suggestions(
+        (datum.iban for datum in data if datum.iban),
+        (datum.account for datum in data if datum.account))
+    for datum in data:
+        if datum.iban and datum.iban in iban_accounts:
+            datum.suggested_account = iban_accounts[datum.iban]
+        elif datum.account in names:
+            datum.suggested_account = names[datum.account]
+
+
+def _flag_cross_file_duplicates(data):
+    """
+    Statements of the same account that show up in several uploaded files are only kept from
+    the first file.
+    A withdrawal in one file that matches a deposit of another uploaded account on the
+    same day is a transfer between them, only the withdrawal is kept and pointed at the
+    other account.
+    """
+    first_files = {}
+    deposits = defaultdict(list)
+    for datum in data:
+        key = (datum.import_file.account_id, datum.book_date, datum.amount, datum.notes)
+        # identical rows of one file are separate statements, e.g. two coffees on one day
+        if first_files.setdefault(key, datum.import_file.pk) != datum.import_file.pk:
+            datum.ignore = True
+            continue
+        if datum.amount > 0:
+            deposits[(datum.book_date, datum.amount)].append(datum)
+    for datum in data:
+        if datum.amount >= 0 or getattr(datum, 'ignore', False):
+            continue
+        for other in deposits[(datum.book_date, -datum.amount)]:
+            if other.import_file.account_id != datum.import_file.account_id and \
+                    not getattr(other, 'ignore', False):
+                other.ignore = True
+                datum.suggested_account = other.import_file.account
+                break
+
+
+def _apply_rules(data):
+    rules = RuleSet.load()
+    if not rules:
+        return
+    for datum in data:
+        rule = rules.match(datum.account, datum.iban, datum.notes, datum.amount)
+        if rule:
+            datum.suggested_category = rule.category_id
+            datum.suggested_recurrence = rule.recurrence_id
+
+
 class ImportProcessView(LoginRequiredMixin, generic.TemplateView):
     template_name = 'silverstrike/import_configure_upload.html'
 
+    def get_files(self):
+        return [models.ImportFile.objects.get(uuid=self.kwargs['uuid'])]
+
+    def create_job(self, rows):
+        return models.ImportJob.objects.queue_statements(json.dumps(rows), file_id=self.kwargs['uuid'])
+
     def get_context_data(self, **kwargs):
         context = super(ImportProcessView, self).get_context_data(**kwargs)
-        file = models.ImportFile.objects.get(uuid=self.kwargs['uuid'])
-        importer = file.importer
-        iban_accounts = dict()
-        names = dict()
-        for a in models.Account.objects.all():
-            try:
-                for iban in json.loads(a.import_ibans):
-                    iban_accounts[iban] = a
-            except json.decoder.JSONDecodeError:
-                pass
-            try:
-                for name in json.loads(a.import_names):
-                    if name in names and names[name] != a:
-                        del names[name]
-                        continue
-                    names[name] = a
-            except json.decoder.JSONDecodeError:
-                pass
-        context['data'] = importers.IMPORTERS[importer].import_transactions(file.file.path)
-        max_date = date(1970, 1, 1)
-        min_date = date(3000, 1, 1)
-        for datum in context['data']:
-            if datum.book_date < min_date:
-                min_date = datum.book_date
-            if datum.book_date > max_date:
-                max_date = datum.book_date
-            if datum.iban and datum.iban in iban_accounts:
-                datum.suggested_account = iban_accounts[datum.iban]
-            elif datum.account in names:
-                datum.suggested_account = names[datum.account]
-
-        # duplicate detection
-        transactions = set()
-        for t in models.Transaction.objects.date_range(min_date, max_date):
-            if t.is_transfer:
-                transactions.add('{}-{}-{}'.format(t.src_id, t.date, t.amount))
-                transactions.add('{}-{}-{}'.format(t.dst_id, t.date, t.amount))
-            elif t.is_deposit:
-                transactions.add('{}-{}-{}'.format(t.src_id, t.date, t.amount))
-            elif t.is_withdraw:
-                transactions.add('{}-{}-{}'.format(t.dst_id, t.date, t.amount))
-        for datum in context['data']:
-            if hasattr(datum, 'suggested_account') and '{}-{}-{:.2f}'.format(
-                    datum.suggested_account.id, datum.book_date, abs(datum.amount)) in transactions:
-                datum.ignore = True
+        files = self.get_files()
+        parsed = parallel.parse_files((f.importer, f.file.path) for f in files)
+        data = []
+        for file, statements in zip(files, parsed):
+            for row, datum in enumerate(statements):
+                datum.import_file = file
+                datum.row = row
+                data.append(datum)
+        if len(files) > 1:
+            data.sort(key=lambda datum: datum.book_date)
+        _suggest_accounts(data)
+        if len(files) > 1:
+            _flag_cross_file_duplicates(data)
+        try:
+            window = max(0, int(self.request.GET.get('window', matching.DEFAULT_WINDOW)))
+        except ValueError:
+            window = matching.DEFAULT_WINDOW
+        matching.find_matches(data, window)
+        _apply_rules(data)
+        context['data'] = data
+        context['files'] = files
+        context['window'] = window
+        context['categories'] = models.Category.objects.filter(active=True)
 
         context['recurrences'] = models.RecurringTransaction.objects.exclude(
             interval=models.RecurringTransaction.DISABLED).order_by('title')
         return context
 
     def post(self, request, *args, **kwargs):
-        file = models.ImportFile.objects.get(uuid=self.kwargs['uuid'])
-        importer = file.importer
-        data = importers.IMPORTERS[importer].import_transactions(file.file.path)
-        for i in range(len(data)):
+        rows = []
+        i = 0
+        while 'title-{}'.format(i) in request.POST:
             title = request.POST.get('title-{}'.format(i), '')
             account = request.POST.get('account-{}'.format(i), '')
             recurrence = int(request.POST.get('recurrence-{}'.format(i), '-1'))
+            category = int(request.POST.get('category-{}'.format(i), '-1'))
             ignore = request.POST.get('ignore-{}'.format(i), '')
-            book_date = data[i].book_date
-            date = data[i].transaction_date
-            if not (title and account) or ignore:
-                continue
-            amount = float(data[i].amount)
-            if amount == 0:
-                continue
-            account, _ = models.Account.objects.get_or_create(
-                name=account,
-                defaults={'account_type': models.AccountType.FOREIGN})
-            _update_account(account, data[i])
-            if not account.iban and hasattr(data[i], 'iban'):
-                account.iban = data[i].iban
-                account.save()
-            transaction = models.Transaction()
-            if account.account_type == models.AccountType.PERSONAL:
-                transaction.transaction_type = models.Transaction.TRANSFER
-                if amount < 0:
-                    transaction.src_id = file.account_id
-                    transaction.dst = account
-                else:
-                    transaction.src = account
-                    transaction.dst_id = file.account_id
-            elif account.account_type == models.AccountType.FOREIGN:
-                if amount < 0:
-                    transaction.transaction_type = models.Transaction.WITHDRAW
-                    transaction.src_id = file.account_id
-                    transaction.dst = account
-                else:
-                    transaction.transaction_type = models.Transaction.DEPOSIT
-                    transaction.dst_id = file.account_id
-                    transaction.src = account
-            transaction.title = title
-            transaction.date = date
-            transaction.amount = abs(amount)
-
-            if recurrence > 0:
-                transaction.recurrence_id = recurrence
-            transaction.save()
-
-            models.Split.objects.create(
-                title=title,
-                amount=amount,
-                date=book_date,
-                transaction=transaction,
-                account_id=file.account_id,
-                opposing_account=account
-                )
-            models.Split.objects.create(
-                title=title,
-                amount=-amount,
-                date=date,
-                transaction=transaction,
-                account=account,
-                opposing_account_id=file.account_id
-                )
-        return HttpResponseRedirect('/')
+            match = request.POST.get('match-{}'.format(i), '')
+            row = {'file': request.POST.get('file-{}'.format(i), str(self.kwargs['uuid'])),
+                   'row': int(request.POST.get('row-{}'.format(i), i))}
+            if match and not ignore:
+                rows.append(dict(row, match=int(match)))
+            elif title and account and not ignore:
+                rows.append(dict(row, title=title, account=account, recurrence=recurrence,
+                                 category=category))
+            i += 1
+        job = self.create_job(rows)
+        return HttpResponseRedirect(job.get_absolute_url())
+
+
+class ImportBatchProcessView(ImportProcessView):
+    def get_files(self):
+        batch = get_object_or_404(models.ImportBatch, pk=self.kwargs['uuid'])
+        return list(batch.files.order_by('created_at'))
+
+    def create_job(self, rows):
+        return models.ImportJob.objects.queue_statements(json.dumps(rows), batch_id=self.kwargs['uuid'])
 
 
 class ImportFireflyView(LoginRequiredMixin, generic.edit.CreateView):
@@ -173,8 +171,13 @@ class ImportFireflyView(LoginRequiredMixin, generic.edit.CreateView):
 
     def form_valid(self, form):
         self.object = form.save()
-        importers.firefly.import_firefly(self.object.file.path)
-        return HttpResponseRedirect(reverse('index'))
+        job = models.ImportJob.objects.create(file=self.object, kind=models.ImportJob.FIREFLY)
+        return HttpResponseRedirect(job.get_absolute_url())
+
+
+class ImportJobView(LoginRequiredMixin, generic.DetailView):
+    model = models.ImportJob
+    context_object_name = 'job'
 
 
 class ExportView(LoginRequiredMixin, generic.edit.FormView):
@@ -182,23 +185,15 @@ class ExportView(LoginRequiredMixin, generic.edit.FormView):
     form_class = forms.ExportForm
 
     def form_valid(self, form):
-        response = HttpResponse(content_type='text/csv')
-
         splits = models.Split.objects.date_range(
             form.cleaned_data['start'], form.cleaned_data['end']).transfers_once()
         splits = splits.filter(account__in=form.cleaned_data['accounts'])
-        csv_writer = csv.writer(response, delimiter=';')
-        headers = [
-            'account',
-            'opposing_account',
-            'date',
-            'amount',
-            'category'
-            ]
-        csv_writer.writerow(headers)
-        for split in splits.values_list('account__name', 'opposing_account__name',
-                                        'date', 'amount', 'category__name'):
-            csv_writer.writerow(split)
-
-        response['Content-Disposition'] = 'attachment; filename=export.csv'
+        chunks = export.csv_chunks(splits)
+        if form.cleaned_data['compress']:
+            response = StreamingHttpResponse(export.gzip_chunks(chunks),
+                                             content_type='application/gzip')
+            response['Content-Disposition'] = 'attachment; filename=export.csv.gz'
+        else:
+            response = StreamingHttpResponse(chunks, content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename=export.csv'
         return response
@@ -1,9 +1,11 @@
-from datetime import date
+from datetime import date, timedelta
 
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import models
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
 from django.views import generic
 
 from silverstrike.forms import DepositForm, RecurringTransactionForm, TransferForm, WithdrawForm
@@ -20,15 +22,16 @@ class RecurrenceCreateView(LoginRequiredMixin, generic.edit.CreateView):
 class ReccurrenceSetNextOccurence(LoginRequiredMixin, generic.View):
 
     def post(self, request, *args, **kwargs):
-        for r in RecurringTransaction.objects.due_in_month():
+        changed = []
+        now = timezone.now()
+        for r in RecurringTransaction.objects.due_in_month().annotate(
+                last_entered=models.Max('recurrences__date')).filter(last_entered__isnull=False):
             old = r.date
-            t = r.recurrences.first()
-            if not t:
-                continue
-            while t.date >= r.date:
-                r.date = r.update_date()
+            r.date = next(r.occurrences(dstart=r.last_entered + timedelta(days=1)), r.date)
             if old != r.date:
-                r.save()
+                r.last_modified = now
+                changed.append(r)
+        RecurringTransaction.objects.bulk_update(changed, ['date', 'last_modified'])
         return HttpResponseRedirect(reverse('recurrences'))
 
 